@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 from sqlalchemy import engine_from_config, pool
 from logging.config import fileConfig
@@ -8,6 +9,9 @@ from alembic import context
 # Carrega variáveis do .env
 load_dotenv()
 
+# Permite que as revisões leiam app.core.config (ex.: configuração do full-text search)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
 # Monta a URL do banco de dados com base nas variáveis
 db_url = (
     f"postgresql+psycopg2://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
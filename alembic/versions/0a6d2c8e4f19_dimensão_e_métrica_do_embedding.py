@@ -0,0 +1,33 @@
+"""Dimensão e métrica do embedding
+
+Revision ID: 0a6d2c8e4f19
+Revises: f17c3a9e0b54
+Create Date: 2025-08-29 09:18:44.205337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.services import vector_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6d2c8e4f19'
+down_revision: Union[str, None] = 'f17c3a9e0b54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # Coluna e índice gerados de EMBEDDING_DIM, EMBEDDING_METRIC e VECTOR_INDEX.
+    # Para mudar depois, gere uma nova revisão chamando vector_index.schema_sql
+    # com os novos valores.
+    for stmt in vector_index.schema_sql(settings.embedding_dim, settings.embedding_metric, settings.vector_index):
+        op.execute(stmt)
+
+def downgrade():
+    # volta ao esquema inicial: VECTOR(1536) com HNSW L2
+    for stmt in vector_index.schema_sql(1536, "l2", "full"):
+        op.execute(stmt)
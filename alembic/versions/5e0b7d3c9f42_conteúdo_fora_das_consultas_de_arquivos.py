@@ -0,0 +1,47 @@
+"""Conteúdo fora das consultas de arquivos
+
+Revision ID: 5e0b7d3c9f42
+Revises: d48b2f9a6c13
+Create Date: 2025-08-18 11:12:40.804315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0b7d3c9f42'
+down_revision: Union[str, None] = 'd48b2f9a6c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # content passa a ser opcional: com blob store externo a linha guarda só a referência (sha256)
+    op.execute("""
+        ALTER TABLE files
+            ALTER COLUMN content DROP NOT NULL,
+            ADD COLUMN sha256 TEXT,
+            ADD COLUMN size_bytes BIGINT,
+            ADD COLUMN blob_key TEXT;
+    """)
+
+    # EXTERNAL = TOAST sem compressão: substring() lê só os blocos pedidos (download com Range)
+    op.execute("ALTER TABLE files ALTER COLUMN content SET STORAGE EXTERNAL;")
+
+    op.execute("""
+        UPDATE files
+        SET sha256 = encode(sha256(content), 'hex'),
+            size_bytes = octet_length(content)
+        WHERE content IS NOT NULL;
+    """)
+
+def downgrade():
+    op.execute("ALTER TABLE files ALTER COLUMN content SET STORAGE EXTENDED;")
+    op.execute("""
+        ALTER TABLE files
+            DROP COLUMN blob_key,
+            DROP COLUMN size_bytes,
+            DROP COLUMN sha256;
+    """)
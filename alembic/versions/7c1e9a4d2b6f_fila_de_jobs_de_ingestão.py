@@ -0,0 +1,49 @@
+"""Fila de jobs de ingestão
+
+Revision ID: 7c1e9a4d2b6f
+Revises: 496bb2e410ee
+Create Date: 2025-08-12 10:21:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e9a4d2b6f'
+down_revision: Union[str, None] = '496bb2e410ee'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # Fila de ingestão consumida pelos workers (SELECT ... FOR UPDATE SKIP LOCKED)
+    op.execute("""
+        CREATE TABLE ingestion_jobs (
+            id SERIAL PRIMARY KEY,
+            file_id INT NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INT NOT NULL DEFAULT 0,
+            pages_parsed INT NOT NULL DEFAULT 0,
+            chunks_embedded INT NOT NULL DEFAULT 0,
+            rows_written INT NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT NOW(),
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+    """)
+
+    op.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_file_id ON ingestion_jobs (file_id);")
+
+    # Índice parcial: os workers só varrem jobs pendentes
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_pending
+        ON ingestion_jobs (id) WHERE status IN ('queued', 'running');
+    """)
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_ingestion_jobs_pending;")
+    op.execute("DROP INDEX IF EXISTS idx_ingestion_jobs_file_id;")
+    op.execute("DROP TABLE IF EXISTS ingestion_jobs;")
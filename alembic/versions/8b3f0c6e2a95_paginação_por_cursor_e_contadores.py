@@ -0,0 +1,85 @@
+"""Paginação por cursor e contadores
+
+Revision ID: 8b3f0c6e2a95
+Revises: c5d91e3a7f28
+Create Date: 2025-09-04 16:22:09.731845
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3f0c6e2a95'
+down_revision: Union[str, None] = 'c5d91e3a7f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # keyset: ORDER BY created_at DESC, id DESC com (created_at, id) < cursor (varredura reversa do índice)
+    op.execute("CREATE INDEX idx_files_created_at_id ON files (created_at, id);")
+
+    # agregados por arquivo, gravados na ingestão: a listagem não toca em chunks
+    op.execute("ALTER TABLE files ADD COLUMN page_count INT, ADD COLUMN chunk_count INT;")
+    op.execute("""
+        UPDATE files f SET
+            page_count = (SELECT count(*) FROM pages p WHERE p.file_id = f.id),
+            chunk_count = (
+                SELECT count(*) FROM chunks c
+                WHERE c.file_id = f.id
+                  AND c.index_version = (SELECT active_version FROM corpus_state WHERE id = 1)
+            );
+    """)
+    # arquivos anteriores à tabela pages: maior página com chunks
+    op.execute("""
+        UPDATE files f SET page_count = (SELECT max(c.page_number) FROM chunks c WHERE c.file_id = f.id)
+        WHERE f.page_count = 0 AND EXISTS (SELECT 1 FROM chunks c WHERE c.file_id = f.id);
+    """)
+
+    # total de linhas mantido por triggers de statement (tabelas de transição): sem count(*) por requisição
+    op.execute("""
+        CREATE TABLE row_counts (
+            table_name TEXT PRIMARY KEY,
+            n BIGINT NOT NULL DEFAULT 0
+        );
+    """)
+    op.execute("INSERT INTO row_counts (table_name, n) SELECT 'files', count(*) FROM files;")
+    op.execute("""
+        CREATE FUNCTION row_counts_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE row_counts SET n = n + (SELECT count(*) FROM new_rows) WHERE table_name = TG_TABLE_NAME;
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE row_counts SET n = n - (SELECT count(*) FROM old_rows) WHERE table_name = TG_TABLE_NAME;
+            ELSE
+                UPDATE row_counts SET n = 0 WHERE table_name = TG_TABLE_NAME;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+    """)
+    op.execute("""
+        CREATE TRIGGER files_row_count_insert AFTER INSERT ON files
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION row_counts_update();
+    """)
+    op.execute("""
+        CREATE TRIGGER files_row_count_delete AFTER DELETE ON files
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION row_counts_update();
+    """)
+    op.execute("""
+        CREATE TRIGGER files_row_count_truncate AFTER TRUNCATE ON files
+        FOR EACH STATEMENT EXECUTE FUNCTION row_counts_update();
+    """)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS files_row_count_truncate ON files;")
+    op.execute("DROP TRIGGER IF EXISTS files_row_count_delete ON files;")
+    op.execute("DROP TRIGGER IF EXISTS files_row_count_insert ON files;")
+    op.execute("DROP FUNCTION IF EXISTS row_counts_update();")
+    op.execute("DROP TABLE IF EXISTS row_counts;")
+    op.execute("ALTER TABLE files DROP COLUMN IF EXISTS chunk_count, DROP COLUMN IF EXISTS page_count;")
+    op.execute("DROP INDEX IF EXISTS idx_files_created_at_id;")
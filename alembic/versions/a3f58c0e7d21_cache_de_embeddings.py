@@ -0,0 +1,34 @@
+"""Cache de embeddings
+
+Revision ID: a3f58c0e7d21
+Revises: 7c1e9a4d2b6f
+Create Date: 2025-08-14 09:47:02.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f58c0e7d21'
+down_revision: Union[str, None] = '7c1e9a4d2b6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # Chave: sha256(modelo, dimensões, texto normalizado). Sem dimensão fixa na coluna,
+    # assim o cache convive com troca de modelo.
+    op.execute("""
+        CREATE TABLE embedding_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            dimensions INT NOT NULL,
+            embedding VECTOR NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW()
+        );
+    """)
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS embedding_cache;")
@@ -0,0 +1,35 @@
+"""Geração do corpus por deltas
+
+Revision ID: a8e4c2f7b190
+Revises: f2c6a9d3e8b1
+Create Date: 2025-09-10 14:31:07.552840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8e4c2f7b190'
+down_revision: Union[str, None] = 'f2c6a9d3e8b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # A ingestão deixa de fazer UPDATE em corpus_state (a linha ficava travada até o
+    # commit e serializava todas as ingestões): cada uma insere um delta em
+    # row_count_deltas, consolidado pelo mesmo processo do contador de arquivos.
+    # Geração = corpus_state.generation + contador 'corpus_generation'.
+    op.execute("INSERT INTO row_counts (table_name, n) VALUES ('corpus_generation', 0) ON CONFLICT DO NOTHING;")
+
+def downgrade():
+    op.execute("""
+        UPDATE corpus_state SET generation = generation
+            + (SELECT n FROM row_counts WHERE table_name = 'corpus_generation')
+            + COALESCE((SELECT sum(delta) FROM row_count_deltas WHERE table_name = 'corpus_generation'), 0)
+        WHERE id = 1;
+    """)
+    op.execute("DELETE FROM row_count_deltas WHERE table_name = 'corpus_generation';")
+    op.execute("DELETE FROM row_counts WHERE table_name = 'corpus_generation';")
@@ -0,0 +1,38 @@
+"""Deduplicação de uploads
+
+Revision ID: b91d4e27a5c8
+Revises: 5e0b7d3c9f42
+Create Date: 2025-08-19 16:40:05.937112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b91d4e27a5c8'
+down_revision: Union[str, None] = '5e0b7d3c9f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # Busca do upload por hash (não é UNIQUE: a base pode ter duplicatas anteriores)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (sha256);")
+
+    # Arquivos ingeridos antes da fila ganham um job concluído: um upload repetido
+    # deles também é respondido com o job existente
+    op.execute("""
+        INSERT INTO ingestion_jobs (file_id, status, pages_parsed, chunks_embedded, rows_written, created_at, finished_at)
+        SELECT f.id, 'done',
+               COALESCE(MAX(c.page_number), 0), COUNT(c.id), COUNT(c.id),
+               f.created_at, f.created_at
+        FROM files f
+        LEFT JOIN chunks c ON c.file_id = f.id
+        WHERE NOT EXISTS (SELECT 1 FROM ingestion_jobs j WHERE j.file_id = f.id)
+        GROUP BY f.id, f.created_at;
+    """)
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_files_sha256;")
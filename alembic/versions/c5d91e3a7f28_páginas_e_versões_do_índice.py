@@ -0,0 +1,85 @@
+"""Páginas e versões do índice
+
+Revision ID: c5d91e3a7f28
+Revises: 0a6d2c8e4f19
+Create Date: 2025-09-02 10:41:27.518264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.services.embedder import embedding_model_id
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d91e3a7f28'
+down_revision: Union[str, None] = '0a6d2c8e4f19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # Texto extraído de cada página: re-chunking e re-embedding sem reabrir o PDF
+    op.execute("""
+        CREATE TABLE pages (
+            file_id INT NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+            page_number INT NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (file_id, page_number)
+        );
+    """)
+
+    # Cada versão = (modelo de embedding, parâmetros de chunking). A versão em
+    # construção também é o job de reindexação (checkpoint em last_file_id).
+    op.execute("""
+        CREATE TABLE index_versions (
+            id SERIAL PRIMARY KEY,
+            embedding_model TEXT NOT NULL,
+            chunk_max_tokens INT NOT NULL,
+            chunk_overlap_tokens INT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'building',
+            attempts INT NOT NULL DEFAULT 0,
+            files_done INT NOT NULL DEFAULT 0,
+            last_file_id INT NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT NOW(),
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+    """)
+    # no máximo uma versão em construção
+    op.execute("CREATE UNIQUE INDEX idx_index_versions_building ON index_versions ((status)) WHERE status = 'building';")
+
+    # versão 1: os chunks que já existem
+    op.execute(
+        sa.text("""
+            INSERT INTO index_versions (id, embedding_model, chunk_max_tokens, chunk_overlap_tokens, status, finished_at)
+            VALUES (1, :model, :max_tokens, :overlap, 'active', NOW());
+        """).bindparams(
+            model=embedding_model_id(),
+            max_tokens=settings.chunk_max_tokens,
+            overlap=settings.chunk_overlap_tokens,
+        )
+    )
+    op.execute("SELECT setval(pg_get_serial_sequence('index_versions', 'id'), 1);")
+
+    op.execute("""
+        ALTER TABLE chunks
+            ADD COLUMN index_version INT NOT NULL DEFAULT 1 REFERENCES index_versions(id),
+            ADD COLUMN embedding_model TEXT;
+    """)
+    op.execute("UPDATE chunks SET embedding_model = (SELECT embedding_model FROM index_versions WHERE id = 1);")
+    op.execute("CREATE INDEX idx_chunks_version_file ON chunks (index_version, file_id);")
+
+    # a busca lê active_version junto com generation
+    op.execute("ALTER TABLE corpus_state ADD COLUMN active_version INT NOT NULL DEFAULT 1 REFERENCES index_versions(id);")
+
+def downgrade():
+    op.execute("ALTER TABLE corpus_state DROP COLUMN IF EXISTS active_version;")
+    op.execute("DELETE FROM chunks WHERE index_version <> 1;")
+    op.execute("DROP INDEX IF EXISTS idx_chunks_version_file;")
+    op.execute("ALTER TABLE chunks DROP COLUMN IF EXISTS embedding_model, DROP COLUMN IF EXISTS index_version;")
+    op.execute("DROP TABLE IF EXISTS index_versions;")
+    op.execute("DROP TABLE IF EXISTS pages;")
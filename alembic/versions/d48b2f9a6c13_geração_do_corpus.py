@@ -0,0 +1,31 @@
+"""Geração do corpus
+
+Revision ID: d48b2f9a6c13
+Revises: a3f58c0e7d21
+Create Date: 2025-08-15 14:03:51.230877
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd48b2f9a6c13'
+down_revision: Union[str, None] = 'a3f58c0e7d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # Linha única; a ingestão incrementa generation e invalida o cache de resultados da busca
+    op.execute("""
+        CREATE TABLE corpus_state (
+            id INT PRIMARY KEY CHECK (id = 1),
+            generation BIGINT NOT NULL DEFAULT 0
+        );
+    """)
+    op.execute("INSERT INTO corpus_state (id, generation) VALUES (1, 0);")
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS corpus_state;")
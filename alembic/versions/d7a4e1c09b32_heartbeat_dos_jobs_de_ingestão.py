@@ -0,0 +1,26 @@
+"""Heartbeat dos jobs de ingestão
+
+Revision ID: d7a4e1c09b32
+Revises: 8b3f0c6e2a95
+Create Date: 2025-09-09 11:05:42.318270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a4e1c09b32'
+down_revision: Union[str, None] = '8b3f0c6e2a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # atualizado pelo worker enquanto o job roda: só job sem heartbeat recente é retomado
+    op.execute("ALTER TABLE ingestion_jobs ADD COLUMN heartbeat_at TIMESTAMP;")
+    op.execute("UPDATE ingestion_jobs SET heartbeat_at = started_at WHERE status = 'running';")
+
+def downgrade():
+    op.execute("ALTER TABLE ingestion_jobs DROP COLUMN IF EXISTS heartbeat_at;")
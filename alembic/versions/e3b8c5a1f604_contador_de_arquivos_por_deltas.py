@@ -0,0 +1,70 @@
+"""Contador de arquivos por deltas
+
+Revision ID: e3b8c5a1f604
+Revises: d7a4e1c09b32
+Create Date: 2025-09-09 15:48:20.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b8c5a1f604'
+down_revision: Union[str, None] = 'd7a4e1c09b32'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # Triggers passam a inserir deltas em vez de atualizar a linha única de row_counts:
+    # o UPDATE travava essa linha até o commit e serializava todos os uploads (e uma
+    # transação longa, como um lote da carga em massa, bloqueava os demais).
+    # O total é row_counts.n + soma dos deltas; services/row_counts.py consolida periodicamente.
+    op.execute("""
+        CREATE TABLE row_count_deltas (
+            id BIGSERIAL PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            delta BIGINT NOT NULL
+        );
+    """)
+    op.execute("CREATE INDEX idx_row_count_deltas_table ON row_count_deltas (table_name);")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION row_counts_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO row_count_deltas (table_name, delta) SELECT TG_TABLE_NAME, count(*) FROM new_rows;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO row_count_deltas (table_name, delta) SELECT TG_TABLE_NAME, -count(*) FROM old_rows;
+            ELSE
+                DELETE FROM row_count_deltas WHERE table_name = TG_TABLE_NAME;
+                UPDATE row_counts SET n = 0 WHERE table_name = TG_TABLE_NAME;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+    """)
+
+def downgrade():
+    op.execute("""
+        WITH d AS (DELETE FROM row_count_deltas RETURNING table_name, delta)
+        UPDATE row_counts r SET n = r.n + s.total
+        FROM (SELECT table_name, sum(delta) AS total FROM d GROUP BY table_name) s
+        WHERE r.table_name = s.table_name;
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION row_counts_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE row_counts SET n = n + (SELECT count(*) FROM new_rows) WHERE table_name = TG_TABLE_NAME;
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE row_counts SET n = n - (SELECT count(*) FROM old_rows) WHERE table_name = TG_TABLE_NAME;
+            ELSE
+                UPDATE row_counts SET n = 0 WHERE table_name = TG_TABLE_NAME;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+    """)
+    op.execute("DROP TABLE IF EXISTS row_count_deltas;")
@@ -0,0 +1,37 @@
+"""Busca full-text em chunks
+
+Revision ID: e62a8f1b3d07
+Revises: b91d4e27a5c8
+Create Date: 2025-08-22 10:05:18.442961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e62a8f1b3d07'
+down_revision: Union[str, None] = 'b91d4e27a5c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # Coluna gerada com a mesma configuração usada na consulta (FTS_CONFIG)
+    op.execute(f"""
+        ALTER TABLE chunks
+        ADD COLUMN text_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('{settings.fts_config}'::regconfig, text_cleaned)) STORED;
+    """)
+
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chunks_text_tsv
+        ON chunks USING gin (text_tsv);
+    """)
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_chunks_text_tsv;")
+    op.execute("ALTER TABLE chunks DROP COLUMN IF EXISTS text_tsv;")
@@ -0,0 +1,36 @@
+"""Índice vetorial quantizado
+
+Revision ID: f17c3a9e0b54
+Revises: e62a8f1b3d07
+Create Date: 2025-08-26 15:32:09.671048
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.services import vector_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f17c3a9e0b54'
+down_revision: Union[str, None] = 'e62a8f1b3d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # VECTOR_INDEX=halfvec|binary: cria o índice de expressão quantizado e remove o HNSW
+    # de precisão total (é ele que não cabe mais em shared_buffers). A coluna continua
+    # vector completo, usada na reordenação dos candidatos.
+    mode = settings.vector_index
+    if mode == "full":
+        return
+    op.execute(vector_index.create_index_sql(mode, settings.embedding_dim))
+    op.execute(vector_index.drop_index_sql("full"))
+
+def downgrade():
+    op.execute(vector_index.create_index_sql("full", settings.embedding_dim))
+    op.execute(vector_index.drop_index_sql("halfvec"))
+    op.execute(vector_index.drop_index_sql("binary"))
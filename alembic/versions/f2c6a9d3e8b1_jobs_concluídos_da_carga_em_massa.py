@@ -0,0 +1,36 @@
+"""Jobs concluídos da carga em massa
+
+Revision ID: f2c6a9d3e8b1
+Revises: e3b8c5a1f604
+Create Date: 2025-09-10 10:12:44.318905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6a9d3e8b1'
+down_revision: Union[str, None] = 'e3b8c5a1f604'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade():
+    # Arquivos gravados pela carga em massa (app.cli) antes de ela criar jobs: mesmo
+    # preenchimento da b91d4e27a5c8, para um upload repetido não reprocessar o arquivo
+    op.execute("""
+        INSERT INTO ingestion_jobs (file_id, status, pages_parsed, chunks_embedded, rows_written, created_at, finished_at)
+        SELECT f.id, 'done',
+               COALESCE(f.page_count, 0), COUNT(c.id), COUNT(c.id),
+               f.created_at, f.created_at
+        FROM files f
+        LEFT JOIN chunks c ON c.file_id = f.id
+        WHERE NOT EXISTS (SELECT 1 FROM ingestion_jobs j WHERE j.file_id = f.id)
+        GROUP BY f.id, f.page_count, f.created_at;
+    """)
+
+def downgrade():
+    # os jobs preenchidos não se distinguem dos demais: nada a desfazer
+    pass
@@ -0,0 +1,333 @@
+"""Carga em massa de PDFs direto no banco, sem passar pela API.
+
+    python -m app.cli ingest ./pdfs
+    python -m app.cli ingest ./pdfs --workers 8 --batch-chunks 8192 --retry-failed
+
+Usa as mesmas etapas da ingestão (chunking por versão do índice, embeddings com
+cache, COPY) em lotes grandes: os PDFs são extraídos num pool de processos
+enquanto o lote anterior é embedado e gravado; os embeddings são calculados antes
+e cada lote é gravado numa transação curta. O progresso fica num manifesto SQLite (caminho, sha256, status) dentro do próprio
+diretório; uma execução interrompida retoma de onde parou. Conteúdo já presente
+no banco (mesmo sha256) não é reprocessado. Cada arquivo gravado ganha um job
+concluído: um upload posterior do mesmo conteúdo é respondido sem reprocessar.
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db import SessionLocal, engine
+from app.models import File, IngestionJob
+from app.services.chunker import TextChunk
+from app.services.embedder import close_embedder
+from app.services.embedding_cache import embed_cached
+from app.services.ingestion import (
+    PageText, chunk_for_version, find_duplicate, live_versions, settle_versions, store_pages, store_pdf, write_chunks,
+)
+from app.services.metrics import observe, start_request_timings, timed
+from app.services.pdf import extract_file, get_pdf_executor, shutdown_pdf_executor
+from app.services.query_cache import bump_generation
+from app.services.tokenizer import estimate_tokens
+from app.services.uploads import HashedUpload
+
+MANIFEST_NAME = ".rag-manifest.sqlite"
+MIME = "application/pdf"
+
+@dataclass
+class Doc:
+    path: str          # relativo ao diretório da carga (chave do manifesto)
+    abspath: str
+    size: int
+    mtime_ns: int
+    sha256: str | None = None
+    pages: List[PageText] = field(default_factory=list)   # liberadas depois da gravação do lote
+    page_count: int = 0
+    status: str = "pending"
+    file_id: int | None = None
+    chunks: int = 0
+    error: str | None = None
+
+class Manifest:
+    """Estado por arquivo: pending -> done | duplicate | failed."""
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS manifest (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT,
+                status TEXT NOT NULL,
+                file_id INTEGER,
+                pages INTEGER,
+                chunks INTEGER,
+                error TEXT,
+                updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        self.db.commit()
+
+    def known(self) -> Dict[str, tuple[int, int, str]]:
+        # path -> (size, mtime_ns, status)
+        return {r[0]: r[1:] for r in self.db.execute("SELECT path, size, mtime_ns, status FROM manifest")}
+
+    def record(self, docs: List[Doc]) -> None:
+        self.db.executemany(
+            """
+            INSERT INTO manifest (path, size, mtime_ns, sha256, status, file_id, pages, chunks, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                size = excluded.size, mtime_ns = excluded.mtime_ns, sha256 = excluded.sha256,
+                status = excluded.status, file_id = excluded.file_id, pages = excluded.pages,
+                chunks = excluded.chunks, error = excluded.error, updated_at = CURRENT_TIMESTAMP
+            """,
+            [
+                (d.path, d.size, d.mtime_ns, d.sha256, d.status, d.file_id, d.page_count, d.chunks, d.error)
+                for d in docs
+            ],
+        )
+        self.db.commit()
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.db.execute("SELECT status, count(*) FROM manifest GROUP BY status"))
+
+    def close(self) -> None:
+        self.db.close()
+
+def scan(root: str, manifest: Manifest, retry_failed: bool) -> tuple[List[Doc], int]:
+    """PDFs do diretório (recursivo, em ordem) que ainda precisam ser carregados, e quantos foram pulados."""
+    known = manifest.known()
+    skip = {"done", "duplicate"} | ({"failed"} if not retry_failed else set())
+    docs: List[Doc] = []
+    skipped = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if not name.lower().endswith(".pdf"):
+                continue
+            abspath = os.path.join(dirpath, name)
+            st = os.stat(abspath)
+            path = os.path.relpath(abspath, root)
+            prev = known.get(path)
+            # arquivo alterado no disco (tamanho ou mtime) volta a ser carregado
+            if prev is not None and prev[:2] == (st.st_size, st.st_mtime_ns) and prev[2] in skip:
+                skipped += 1
+                continue
+            docs.append(Doc(path=path, abspath=abspath, size=st.st_size, mtime_ns=st.st_mtime_ns))
+    return docs, skipped
+
+async def parse_docs(docs: List[Doc], window: int) -> AsyncIterator[Doc]:
+    """Extrai os PDFs no pool de processos, com até `window` arquivos em andamento, entregando em ordem."""
+    loop = asyncio.get_running_loop()
+    executor = get_pdf_executor()
+    in_flight: deque = deque()
+
+    async def collect(doc: Doc, fut: asyncio.Future) -> Doc:
+        try:
+            doc.sha256, doc.size, texts, seconds = await fut
+            doc.pages = list(enumerate(texts, start=1))
+            doc.page_count = len(texts)
+            observe("pdf_parse", seconds)
+        except Exception as e:
+            doc.status, doc.error = "failed", f"{type(e).__name__}: {e}"
+        return doc
+
+    for doc in docs:
+        in_flight.append((doc, loop.run_in_executor(executor, extract_file, doc.abspath)))
+        if len(in_flight) >= window:
+            yield await collect(*in_flight.popleft())
+    while in_flight:
+        yield await collect(*in_flight.popleft())
+
+async def batches(docs: AsyncIterator[Doc], max_docs: int, max_chunks: int) -> AsyncIterator[List[Doc]]:
+    # tamanho do lote estimado pelos tokens das páginas; o chunking de verdade acontece na gravação
+    batch: List[Doc] = []
+    size = 0
+    async for doc in docs:
+        batch.append(doc)
+        size += sum(estimate_tokens(txt) for _, txt in doc.pages) // max(1, settings.chunk_max_tokens)
+        if len(batch) >= max_docs or size >= max_chunks:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+async def _known_hashes(docs: List[Doc]) -> Dict[str, File]:
+    # pré-checagem sem lock: evita embedar o que já está no banco (find_duplicate confirma na gravação)
+    async with SessionLocal() as session:
+        rows = await session.scalars(select(File).where(File.sha256.in_([d.sha256 for d in docs])))
+        return {f.sha256: f for f in rows}
+
+async def write_batch(docs: List[Doc]) -> None:
+    """Embeda o lote fora de qualquer transação de escrita e grava tudo numa transação curta.
+
+    Nenhum lock (linhas, advisory lock do sha256, corpus_state) fica preso durante as
+    chamadas ao provedor de embeddings: a transação só faz os INSERTs/COPY.
+    """
+    known = await _known_hashes(docs)
+    fresh: List[Doc] = []
+    for doc in docs:
+        existing = known.get(doc.sha256)
+        if existing is not None:
+            doc.status, doc.file_id, doc.chunks = "duplicate", existing.id, existing.chunk_count
+        else:
+            fresh.append(doc)
+    if not fresh:
+        return
+
+    # 1) chunks e embeddings de cada versão viva; um embed_cached por versão para o lote
+    #    inteiro (o embedder fatia pelos limites do provedor); a sessão só lê o cache
+    async with SessionLocal() as session:
+        versions = await live_versions(session)
+    chunks_by_doc: Dict[int, List[List[TextChunk]]] = {}
+    embeds_by_doc: Dict[int, List[List[List[float]]]] = {}
+    for v in versions:
+        chunks_by_doc[v.id] = [chunk_for_version(d.pages, v) for d in fresh]
+        flat = [c for chunks in chunks_by_doc[v.id] for c in chunks]
+        embeds: List[List[float]] = []
+        if flat:
+            async with SessionLocal() as session:
+                embeds = await embed_cached(
+                    session, [c.text for c in flat], model=v.embedding_model, token_counts=[c.token_count for c in flat],
+                )
+        embeds_by_doc[v.id], i = [], 0
+        for chunks in chunks_by_doc[v.id]:
+            embeds_by_doc[v.id].append(embeds[i:i + len(chunks)])
+            i += len(chunks)
+
+    # 2) transação curta: arquivos, páginas e COPY dos chunks já embedados
+    written: List[Doc] = []
+    async with SessionLocal() as session:
+        for doc in fresh:
+            existing = await find_duplicate(session, doc.sha256)
+            if existing is not None:
+                # outra carga/upload gravou o mesmo conteúdo depois da pré-checagem
+                doc.status, doc.file_id, doc.chunks = "duplicate", existing.id, existing.chunk_count
+                continue
+            with timed("blob_store"), open(doc.abspath, "rb") as fh:
+                f = await store_pdf(session, os.path.basename(doc.path), MIME, HashedUpload(fh, doc.sha256, doc.size))
+            doc.file_id = f.id
+            await store_pages(session, f.id, doc.pages)
+            written.append(doc)
+
+        chunks: Dict[int, Dict[int, List[TextChunk]]] = {}
+        with timed("db_write"):
+            for v in versions:
+                chunks[v.id] = {}
+                for n, doc in enumerate(fresh):
+                    if doc.status != "duplicate":
+                        chunks[v.id][doc.file_id] = chunks_by_doc[v.id][n]
+                        await write_chunks(session, doc.file_id, chunks_by_doc[v.id][n], embeds_by_doc[v.id][n], v)
+        if written:
+            # versões criadas ou trocadas desde o passo 1 são acertadas aqui (raro: embeda dentro da transação)
+            await bump_generation(session)
+            pages_by_file = {d.file_id: d.pages for d in written}
+            await settle_versions(session, pages_by_file, chunks)
+            active = next(v for v in await live_versions(session) if v.status == "active")
+            for doc in written:
+                doc.chunks = len(chunks[active.id][doc.file_id])
+                # job concluído, como na ingestão pela API: um upload repetido do mesmo
+                # conteúdo encontra o job e não reenfileira parse e embeddings
+                rows = sum(len(by_file.get(doc.file_id, ())) for by_file in chunks.values())
+                session.add(IngestionJob(
+                    file_id=doc.file_id, status="done", attempts=1,
+                    pages_parsed=len(doc.pages), chunks_embedded=rows, rows_written=rows,
+                    started_at=func.now(), finished_at=func.now(),
+                ))
+        with timed("db_commit"):
+            await session.commit()
+    for doc in written:
+        doc.status = "done"
+
+def print_summary(
+    totals: Dict[str, float], timings: Dict[str, List[float]], elapsed: float, workers: int, counts: Dict[str, int],
+) -> None:
+    docs, pages, chunks = int(totals["docs"]), int(totals["pages"]), int(totals["chunks"])
+    rate = lambda n: n / elapsed if elapsed > 0 else 0.0
+    print(f"\n{docs} PDFs, {pages} páginas, {chunks} chunks em {elapsed:.1f}s")
+    print(f"  {rate(docs):.2f} docs/s  {rate(pages):.1f} páginas/s  {rate(chunks):.1f} chunks/s")
+    print(f"  duplicados: {int(totals['duplicate'])}  falhas: {int(totals['failed'])}")
+    print("\nTempo por etapa (pdf_parse somado entre os %d processos):" % workers)
+    for stage, (seconds, count) in sorted(timings.items(), key=lambda kv: -kv[1][0]):
+        print(f"  {stage:<20} {seconds:9.2f}s  x{count}")
+    print("\nManifesto: " + ", ".join(f"{status}={n}" for status, n in sorted(counts.items())))
+
+async def ingest(args: argparse.Namespace) -> int:
+    root = os.path.abspath(args.directory)
+    if not os.path.isdir(root):
+        print(f"Diretório não encontrado: {root}", file=sys.stderr)
+        return 2
+    manifest = Manifest(args.manifest or os.path.join(root, MANIFEST_NAME))
+    docs, skipped = scan(root, manifest, args.retry_failed)
+    print(f"{len(docs)} PDFs a carregar ({skipped} já no manifesto)")
+
+    # mesmo acumulador do Server-Timing: cada timed() das etapas soma aqui
+    timings, _ = start_request_timings()
+    totals = dict.fromkeys(("docs", "pages", "chunks", "duplicate", "failed"), 0)
+    workers = settings.pdf_workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    try:
+        async for batch in batches(parse_docs(docs, window=workers * 4), args.batch_docs, args.batch_chunks):
+            parsed = [d for d in batch if d.status != "failed"]
+            if parsed:
+                try:
+                    await write_batch(parsed)
+                except Exception as e:
+                    # o lote volta inteiro (uma transação); os arquivos ficam para --retry-failed
+                    for d in parsed:
+                        d.status, d.error, d.file_id = "failed", f"{type(e).__name__}: {e}", None
+            manifest.record(batch)
+
+            for d in batch:
+                totals[d.status if d.status in ("duplicate", "failed") else "docs"] += 1
+                if d.status == "done":
+                    totals["pages"] += d.page_count
+                    totals["chunks"] += d.chunks
+                # o texto já foi gravado; não acumula na memória até o fim da carga
+                d.pages = []
+            done = sum(totals[k] for k in ("docs", "duplicate", "failed"))
+            elapsed = time.perf_counter() - started
+            print(f"  {done}/{len(docs)}  {totals['docs'] / elapsed:.2f} docs/s  {totals['chunks'] / elapsed:.1f} chunks/s")
+    finally:
+        # interrompida ou não, os lotes já gravados estão no manifesto e não são refeitos
+        shutdown_pdf_executor()
+        await close_embedder()
+        await engine.dispose()
+
+    print_summary(totals, timings, time.perf_counter() - started, workers, manifest.counts())
+    manifest.close()
+    return 1 if totals["failed"] else 0
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Ferramentas de linha de comando do RAG.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="Carrega todos os PDFs de um diretório (recursivo)")
+    p.add_argument("directory")
+    p.add_argument("--manifest", help=f"Arquivo SQLite de progresso (padrão: <diretório>/{MANIFEST_NAME})")
+    p.add_argument("--workers", type=int, help="Processos de extração (padrão: PDF_WORKERS ou núcleos)")
+    # cada lote é uma transação; find_duplicate segura um advisory lock por arquivo até o commit
+    p.add_argument("--batch-docs", type=int, default=64, help="Máximo de PDFs por lote/transação")
+    p.add_argument("--batch-chunks", type=int, default=4096, help="Chunks (estimados) por lote de embeddings")
+    p.add_argument("--retry-failed", action="store_true", help="Tenta de novo os arquivos marcados como falha")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        settings.pdf_workers = args.workers
+    if args.command == "ingest":
+        return asyncio.run(ingest(args))
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,13 +7,122 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = "rag"
     POSTGRES_DB_HOST: str = "localhost"
     POSTGRES_DB_PORT: int = 5432
+    # réplica para busca/listagem (DSN SQLAlchemy completa; vazio = primário)
+    database_read_url: str | None = None
 
-    # Embeddings
+    # Pools de conexão: escrita (ingestão, jobs) e leitura (busca, listagem)
+    db_pool_size: int = 10
+    db_max_overflow: int = 5
+    db_read_pool_size: int = 10
+    db_read_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+    # statements preparados em cache por conexão (0 com pgbouncer em modo transaction)
+    db_statement_cache_size: int = 256
+
+    # Embeddings ("openai" ou "local": hashing em CPU, sem rede)
     embeddings_provider: str = "openai"
     openai_api_key: str | None = None
     openai_embedding_model: str = "text-embedding-3-small"
     embedding_dim: int = 1536
+    # "l2", "cosine" ou "ip" (produto interno; use com vetores normalizados)
+    embedding_metric: str = "l2"
+    normalize_embeddings: bool = True
+    openai_base_url: str = "https://api.openai.com/v1"
+    embed_batch_max_items: int = 2048
+    embed_batch_max_tokens: int = 100_000
+    embed_max_concurrency: int = 4
+    embed_max_retries: int = 5
+    embed_max_retry_after_s: float = 60
+    embed_micro_batch_ms: float = 5
+    embed_micro_batch_max_inputs: int = 16
+    embedding_cache_enabled: bool = True
+    embedding_cache_memory_size: int = 10_000
+
+    # Busca híbrida (full-text + vetorial, fundidas por RRF)
+    fts_config: str = "portuguese"
+    hybrid_candidates: int = 50
+    rrf_k: int = 60
+
+    # Índice vetorial: "full", "halfvec" ou "binary" (ver services/vector_index.py)
+    vector_index: str = "full"
+    rerank_candidates: int = 100
+
+    # Busca vetorial com filtros
+    hnsw_ef_search: int | None = None
+    hnsw_max_scan_tuples: int = 20_000
+    exact_scan_max_rows: int = 20_000
+
+    # Cache da busca (0 desliga)
+    query_embedding_cache_size: int = 4096
+    query_embedding_cache_ttl: float = 3600
+    search_result_cache_size: int = 2048
     max_upload_mb: int = 25
+    upload_chunk_bytes: int = 1024 * 1024
+    # POST /files/upload/batch: arquivos por requisição, corpo total e uploads gravados em paralelo
+    upload_batch_max_files: int = 50
+    upload_batch_max_mb: int = 500
+    upload_batch_concurrency: int = 4
+
+    # Geração de respostas ("openai": qualquer API /chat/completions; "local": stand-in sem rede)
+    llm_provider: str = "openai"
+    openai_model: str = "gpt-4o-mini"
+    llm_base_url: str | None = None
+    llm_max_connections: int = 16
+
+    # Montagem do contexto do /answer (tokens estimados; MMR reordena por diversidade)
+    context_token_budget: int = 3000
+    context_mmr: bool = False
+    context_mmr_lambda: float = 0.7
+
+    # Armazenamento do PDF bruto: "db" (BYTEA em files.content), "fs" ou "s3"
+    blob_store: str = "db"
+    blob_dir: str = "./data/blobs"
+    s3_bucket: str = "rag-files"
+    s3_endpoint_url: str | None = None
+    s3_region: str | None = None
+    s3_access_key: str | None = None
+    s3_secret_key: str | None = None
+
+    # Chunking por tokens (codificação do tiktoken; vazio = estimativa por caracteres)
+    tokenizer_encoding: str = "cl100k_base"
+    chunk_max_tokens: int = 256
+    chunk_overlap_tokens: int = 48
+
+    # Consolidação dos deltas do contador de arquivos (row_count_deltas -> row_counts)
+    row_counts_compact_s: float = 60
+
+    # Reindexação (arquivos por lote/checkpoint)
+    reindex_batch_files: int = 20
+
+    # Observabilidade: header Server-Timing e profiler por amostragem (0 = desligado; requer pyinstrument)
+    server_timing: bool = True
+    profile_slow_ms: int = 0
+    profile_sample_rate: float = 1.0
+    profile_interval_s: float = 0.001
+    profile_dir: str = "./data/profiles"
+
+    # Aquecimento na subida (GET /ready responde 503 até terminar); pg_prewarm requer a extensão
+    warmup_enabled: bool = True
+    warmup_prewarm_index: bool = False
+    warmup_query: str = "aquecimento"
+
+    # Extração de PDF (0 = os.cpu_count())
+    pdf_workers: int = 0
+    pdf_pages_per_task: int = 16
+
+    # Escrita de chunks: COPY binário (True) ou ORM (False)
+    bulk_insert: bool = True
+
+    # Fila de ingestão
+    ingest_workers: int = 2
+    ingest_poll_interval: float = 2.0
+    ingest_job_timeout_s: int = 1800
+    # job "running" sem heartbeat há mais que isso (worker morto) volta para a fila
+    ingest_heartbeat_s: float = 15
+    ingest_heartbeat_timeout_s: int = 120
+    ingest_max_attempts: int = 3
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -1,9 +1,57 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from typing import Any, Dict
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from app.core.config import settings
 
-engine = create_async_engine(settings.database_url, pool_pre_ping=True)
+def _connect_args(read_only: bool) -> Dict[str, Any]:
+    args: Dict[str, Any] = {
+        # statements preparados reaproveitados por conexão (0 desliga: pgbouncer em modo transaction)
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+        "statement_cache_size": settings.db_statement_cache_size,
+    }
+    if read_only:
+        # escrita por engano na sessão de leitura falha também quando a DSN é a do primário
+        args["server_settings"] = {"default_transaction_read_only": "on"}
+    return args
+
+def _make_engine(url: str, pool_size: int, max_overflow: int, read_only: bool = False) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=_connect_args(read_only),
+    )
+
+# escrita (ingestão, jobs, reindexação) e leitura (busca, listagem) com pools separados;
+# sem DATABASE_READ_URL a leitura vai para o primário, mas ainda em pool próprio
+engine = _make_engine(settings.database_url, settings.db_pool_size, settings.db_max_overflow)
+read_engine = _make_engine(
+    settings.database_read_url or settings.database_url,
+    settings.db_read_pool_size,
+    settings.db_read_max_overflow,
+    read_only=True,
+)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession)
 
 async def get_session() -> AsyncSession:
     async with SessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_read_session() -> AsyncSession:
+    async with ReadSessionLocal() as session:
+        yield session
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    stats = {}
+    for name, eng in (("write", engine), ("read", read_engine)):
+        pool = eng.pool
+        stats[name] = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+    return stats
@@ -1,10 +1,63 @@
-from fastapi import FastAPI
-from app.routers import files, search
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from app.middleware import TimingMiddleware, UploadSizeLimitMiddleware
+from app.routers import answer, files, jobs, reindex, search
+from app.services.jobs import start_workers, stop_workers
+from app.services.reindex import start_reindexer, stop_reindexer
+from app.services.pdf import shutdown_pdf_executor
+from app.services.embedder import close_embedder
+from app.services.llm import close_llm
+from app.services.tokenizer import get_tokenizer
+from app.services.warmup import start_warmup, stop_warmup
+from app.services.row_counts import start_compactor, stop_compactor
+from app.db import pool_stats
+from app.services import embedding_cache, metrics, query_cache, warmup
 
-app = FastAPI(title="PDF Vector Search API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # carrega a codificação do tokenizer uma vez, fora do event loop
+    await asyncio.to_thread(get_tokenizer)
+    # pools, clientes e índice aquecidos em segundo plano; /ready sinaliza o fim
+    start_warmup()
+    start_workers()
+    start_reindexer()
+    start_compactor()
+    yield
+    await stop_compactor()
+    await stop_warmup()
+    await stop_reindexer()
+    await stop_workers()
+    shutdown_pdf_executor()
+    await close_embedder()
+    await close_llm()
+
+app = FastAPI(title="PDF Vector Search API", version="0.1.0", lifespan=lifespan)
+app.add_middleware(UploadSizeLimitMiddleware)
+# externo: mede também as recusas do limite de upload
+app.add_middleware(TimingMiddleware)
 app.include_router(files.router)
+app.include_router(jobs.router)
 app.include_router(search.router)
+app.include_router(answer.router)
+app.include_router(reindex.router)
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {
+        "status": "ok",
+        "embedding_cache": embedding_cache.stats.as_dict(),
+        "query_cache": query_cache.stats.as_dict(),
+        "db_pools": pool_stats(),
+    }
+
+@app.get("/ready")
+def ready():
+    # /health diz que o processo está vivo; /ready, que já pode receber tráfego
+    return JSONResponse(warmup.state.as_dict(), status_code=200 if warmup.state.ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.services.metrics import REQUEST_SECONDS, reset_request_timings, server_timing_header, start_request_timings
+
+logger = logging.getLogger(__name__)
+
+class UploadSizeLimitMiddleware:
+    """Recusa uploads acima de MAX_UPLOAD_MB enquanto o corpo ainda está chegando.
+
+    Sem isso o Starlette lê (e grava em disco) o multipart inteiro antes do handler
+    rodar. Content-Length acima do limite é recusado antes de ler qualquer byte; corpos
+    sem Content-Length (chunked) são contados e interrompidos ao passar do limite.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefix: str = "/files/upload"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_body_bytes(scope["path"])
+        detail = self.too_large_detail(scope["path"])
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            await self._reject(send, detail)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException atravessa o parser de formulário do FastAPI e vira 413
+                    raise HTTPException(413, detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def max_body_bytes(self, path: str) -> int:
+        # folga para o envelope multipart (boundaries e headers das partes)
+        if path.endswith("/batch"):
+            return settings.upload_batch_max_mb * 1024 * 1024 + settings.upload_batch_max_files * 64 * 1024
+        return settings.max_upload_mb * 1024 * 1024 + 64 * 1024
+
+    def too_large_detail(self, path: str) -> str:
+        if path.endswith("/batch"):
+            return f"Lote acima de {settings.upload_batch_max_mb}MB."
+        return f"Arquivo acima de {settings.max_upload_mb}MB."
+
+    async def _reject(self, send: Send, detail: str) -> None:
+        body = json.dumps({"detail": detail}, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class TimingMiddleware:
+    """Server-Timing com as etapas da requisição, histograma por rota e profiler opcional.
+
+    As etapas cronometradas com metrics.timed() durante a requisição são somadas
+    num dict guardado numa ContextVar e viram o header Server-Timing na hora em
+    que a resposta começa. Com PROFILE_SLOW_MS > 0 (e pyinstrument instalado),
+    uma fração PROFILE_SAMPLE_RATE das requisições roda sob o profiler por
+    amostragem; as que passarem do limite têm o relatório HTML salvo em PROFILE_DIR.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._profiler_missing = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings, token = start_request_timings()
+        profiler = self._start_profiler()
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                route = scope.get("route")
+                REQUEST_SECONDS.labels(
+                    scope["method"], getattr(route, "path", "unmatched"), message["status"],
+                ).observe(elapsed)
+                if settings.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing_header(timings, elapsed).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            reset_request_timings(token)
+            if profiler is not None:
+                await self._finish_profiler(profiler, scope, time.perf_counter() - start)
+
+    def _start_profiler(self):
+        if settings.profile_slow_ms <= 0 or self._profiler_missing or random.random() >= settings.profile_sample_rate:
+            return None
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            self._profiler_missing = True
+            logger.warning("PROFILE_SLOW_MS ativo, mas o pyinstrument não está instalado (pip install pyinstrument)")
+            return None
+        profiler = Profiler(interval=settings.profile_interval_s, async_mode="enabled")
+        profiler.start()
+        return profiler
+
+    async def _finish_profiler(self, profiler, scope: Scope, elapsed: float) -> None:
+        profiler.stop()
+        ms = elapsed * 1000
+        if ms < settings.profile_slow_ms:
+            return
+        slug = scope["path"].strip("/").replace("/", "_") or "root"
+        path = os.path.join(settings.profile_dir, f"{int(time.time())}-{scope['method']}-{slug}-{ms:.0f}ms.html")
+
+        def write() -> None:
+            os.makedirs(settings.profile_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(profiler.output_html())
+
+        await asyncio.to_thread(write)
+        logger.info("Requisição lenta (%.0f ms): perfil salvo em %s", ms, path)
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import Integer, Text, LargeBinary, ForeignKey, text as sqltext, TIMESTAMP
+from sqlalchemy import Integer, BigInteger, Text, LargeBinary, ForeignKey, text as sqltext, TIMESTAMP
 from pgvector.sqlalchemy import Vector
+from app.core.config import settings
 
 class Base(DeclarativeBase):
     pass
@@ -11,7 +12,14 @@ class File(Base):
     filename: Mapped[str] = mapped_column(Text, nullable=False)
     mime_type: Mapped[str] = mapped_column(Text, nullable=False, server_default="application/pdf")
     created_at: Mapped[str] = mapped_column(TIMESTAMP, server_default=sqltext("NOW()"))
-    content: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    # PDF bruto: deferred (nunca vem em select(File)); NULL quando está num blob store externo
+    content: Mapped[bytes | None] = mapped_column(LargeBinary, deferred=True)
+    sha256: Mapped[str | None] = mapped_column(Text)
+    size_bytes: Mapped[int | None] = mapped_column(BigInteger)
+    blob_key: Mapped[str | None] = mapped_column(Text)
+    # agregados gravados na ingestão (NULL até o arquivo ser processado)
+    page_count: Mapped[int | None] = mapped_column(Integer)
+    chunk_count: Mapped[int | None] = mapped_column(Integer)
 
     chunks: Mapped[list["Chunk"]] = relationship(back_populates="file", cascade="all, delete-orphan")
 
@@ -22,7 +30,55 @@ class Chunk(Base):
     page_number: Mapped[int] = mapped_column(Integer, nullable=False)
     chunk_index: Mapped[int] = mapped_column(Integer, nullable=False)
     text_cleaned: Mapped[str] = mapped_column(Text, nullable=False)
-    embedding: Mapped[list[float] | None] = mapped_column(Vector(1536))
+    embedding: Mapped[list[float] | None] = mapped_column(Vector(settings.embedding_dim))
     token_count: Mapped[int | None] = mapped_column(Integer)
+    # versão do índice a que o chunk pertence (a busca só lê a ativa)
+    index_version: Mapped[int] = mapped_column(ForeignKey("index_versions.id"), nullable=False, server_default="1")
+    embedding_model: Mapped[str | None] = mapped_column(Text)
 
-    file = relationship("File", back_populates="chunks")
\ No newline at end of file
+    file = relationship("File", back_populates="chunks")
+
+class Page(Base):
+    __tablename__ = "pages"
+    file_id: Mapped[int] = mapped_column(ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    page_number: Mapped[int] = mapped_column(Integer, primary_key=True)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+
+class IndexVersion(Base):
+    __tablename__ = "index_versions"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    embedding_model: Mapped[str] = mapped_column(Text, nullable=False)
+    chunk_max_tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    chunk_overlap_tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    # building -> active -> retired; failed se a reindexação esgotar as tentativas
+    status: Mapped[str] = mapped_column(Text, nullable=False, server_default="building")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    files_done: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    last_file_id: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[str] = mapped_column(TIMESTAMP, server_default=sqltext("NOW()"))
+    heartbeat_at: Mapped[str | None] = mapped_column(TIMESTAMP)
+    finished_at: Mapped[str | None] = mapped_column(TIMESTAMP)
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    file_id: Mapped[int] = mapped_column(ForeignKey("files.id", ondelete="CASCADE"), index=True)
+    status: Mapped[str] = mapped_column(Text, nullable=False, server_default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    pages_parsed: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    chunks_embedded: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    rows_written: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[str] = mapped_column(TIMESTAMP, server_default=sqltext("NOW()"))
+    started_at: Mapped[str | None] = mapped_column(TIMESTAMP)
+    finished_at: Mapped[str | None] = mapped_column(TIMESTAMP)
+    heartbeat_at: Mapped[str | None] = mapped_column(TIMESTAMP)
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    key: Mapped[str] = mapped_column(Text, primary_key=True)
+    model: Mapped[str] = mapped_column(Text, nullable=False)
+    dimensions: Mapped[int] = mapped_column(Integer, nullable=False)
+    embedding: Mapped[list[float]] = mapped_column(Vector(), nullable=False)
+    created_at: Mapped[str] = mapped_column(TIMESTAMP, server_default=sqltext("NOW()"))
@@ -0,0 +1,76 @@
+import json
+import time
+from typing import Any
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.db import ReadSessionLocal
+from app.schemas import AnswerRequest
+from app.services.search import SearchFilters, semantic_search
+from app.services.context import assemble_context
+from app.services.tokenizer import count_tokens
+from app.services.prompt import build_prompt
+from app.services.llm import get_llm
+from app.services.metrics import observe, timed
+from app.routers.search import _naive_utc
+
+router = APIRouter(prefix="/answer", tags=["answer"])
+
+def sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("")
+async def answer(body: AnswerRequest):
+    """Recuperação + geração num só processo, via Server-Sent Events.
+
+    Eventos: `hits` (trechos do contexto, já fundidos e dentro do orçamento de
+    tokens; sempre primeiro), `token` (pedaços da resposta), `error` e `done`.
+    """
+    # provedor sem configuração (ex.: sem OPENAI_API_KEY): falha antes da busca, com status claro
+    try:
+        llm = get_llm()
+    except RuntimeError as e:
+        raise HTTPException(503, f"Geração indisponível: {e}")
+    filters = SearchFilters(
+        file_ids=tuple(sorted(set(body.file_id))),
+        created_from=_naive_utc(body.created_from),
+        created_to=_naive_utc(body.created_to),
+        page_from=body.page_from,
+        page_to=body.page_to,
+    )
+    # sessão própria, devolvida ao pool antes do streaming: uma dependência (Depends)
+    # só fecharia no fim da geração, prendendo a conexão durante toda a resposta do LLM
+    async with ReadSessionLocal() as session:
+        result = await semantic_search(session, body.question, k=body.k, mode=body.mode, filters=filters)
+        with timed("context_assembly"):
+            context = await assemble_context(
+                session, result.hits, qvec=result.qvec,
+                reserved=count_tokens(build_prompt(body.question, [])),
+            )
+    spans = [s.as_dict() for s in context.spans]
+    prompt = build_prompt(body.question, spans)
+
+    async def events():
+        yield sse("hits", {
+            "mode": result.mode,
+            "plan": result.plan,
+            "context_tokens": context.tokens,
+            "hits": spans,
+        })
+        # o header Server-Timing já saiu: a geração só vai para os histogramas
+        start, first = time.perf_counter(), True
+        try:
+            async for token in llm.stream(prompt):
+                if first:
+                    observe("llm_first_token", time.perf_counter() - start, server_timing=False)
+                    first = False
+                yield sse("token", {"text": token})
+        except Exception as e:
+            yield sse("error", {"detail": str(e)})
+        observe("llm_stream", time.perf_counter() - start, server_timing=False)
+        yield sse("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,38 +1,244 @@
-from fastapi import APIRouter, UploadFile, File as F, HTTPException, Depends
+import asyncio
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import List
+from urllib.parse import quote
+from fastapi import APIRouter, UploadFile, File as F, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
-from app.db import get_session
-from app.models import File
-from app.schemas import FileOut, FileListOut
+from sqlalchemy import select, func, desc, tuple_
+from app.db import SessionLocal, get_read_session, get_session
+from app.models import File, IngestionJob
+from app.schemas import FileOut, FileListOut, JobOut
 from app.core.config import settings
-from app.services.ingestion import ingest_pdf
+from app.services.ingestion import find_duplicate, store_pdf
+from app.services.uploads import HashedUpload, UploadTooLarge, hash_upload, spool_upload
+from app.services.metrics import timed
+from app.services.jobs import enqueue_job, notify_workers
+from app.services.blobstore import BlobStoreNotConfigured, iter_content, store_for
+from app.services.row_counts import row_count
+from app.routers.jobs import job_out
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/files", tags=["files"])
 
-@router.post("/upload", response_model=FileOut, status_code=201)
+def _check_type(upload: UploadFile) -> None:
+    if upload.content_type != "application/pdf":
+        raise HTTPException(400, "Apenas PDFs são aceitos.")
+
+async def _accept_hashed(session: AsyncSession, filename: str, content_type: str, hashed: HashedUpload) -> tuple[JobOut, bool]:
+    """Deduplica, grava o PDF e enfileira a ingestão. Devolve (job, criado)."""
+    # conteúdo já conhecido: devolve o job existente, sem parse nem embeddings
+    # (só reenfileira se a última ingestão desse arquivo falhou)
+    existing = await find_duplicate(session, hashed.sha256)
+    if existing is not None:
+        job = await session.scalar(
+            select(IngestionJob).where(IngestionJob.file_id == existing.id).order_by(desc(IngestionJob.id)).limit(1)
+        )
+        if job is not None and job.status != "failed":
+            return job_out(job), False
+
+    # a ingestão (parse, chunking, embeddings) roda nos workers da fila
+    with timed("blob_store"):
+        f = existing or await store_pdf(session, filename, content_type, hashed)
+    job = await enqueue_job(session, f.id)
+    with timed("db_commit"):
+        await session.commit()
+    notify_workers()
+    return job_out(job), True
+
+async def _accept_upload(session: AsyncSession, upload: UploadFile) -> tuple[JobOut, bool]:
+    """Valida, deduplica, grava o PDF e enfileira a ingestão. Devolve (job, criado)."""
+    _check_type(upload)
+    try:
+        with timed("upload_hash"):
+            hashed = await hash_upload(upload, settings.max_upload_mb * 1024 * 1024)
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
+    return await _accept_hashed(session, upload.filename, upload.content_type, hashed)
+
+@router.post("/upload", response_model=JobOut, status_code=202)
 async def upload_pdf(
+    response: Response,
     upload: UploadFile = F(..., description="PDF para indexar"),
     session: AsyncSession = Depends(get_session),
 ):
-    if upload.content_type != "application/pdf":
-        raise HTTPException(400, "Apenas PDFs são aceitos.")
-    data = await upload.read()
-    if len(data) / (1024 * 1024) > settings.max_upload_mb:
-        raise HTTPException(413, f"Arquivo acima de {settings.max_upload_mb}MB.")
+    job, created = await _accept_upload(session, upload)
+    if not created:
+        response.status_code = 200
+    return job
+
+@router.post("/upload/batch")
+async def upload_batch(uploads: List[UploadFile] = F(..., description="PDFs para indexar")):
+    """Vários PDFs num só multipart; resposta NDJSON, uma linha por arquivo na ordem em que terminam.
+
+    Cada linha traz `index` (posição no formulário), `filename`, `status` (202 criado,
+    200 já conhecido, 4xx recusado) e `job` ou `error`. Até UPLOAD_BATCH_CONCURRENCY
+    arquivos são gravados ao mesmo tempo, cada um na sua sessão; a ingestão segue nos
+    workers da fila (acompanhe por GET /jobs/{id}).
+    """
+    if len(uploads) > settings.upload_batch_max_files:
+        raise HTTPException(400, f"Máximo de {settings.upload_batch_max_files} arquivos por lote.")
+    # o conteúdo é copiado antes de devolver a resposta: dependendo da versão do
+    # Starlette o formulário multipart é fechado assim que o handler retorna
+    spooled: list[HashedUpload | HTTPException] = []
     try:
-        f = await ingest_pdf(session, upload.filename, upload.content_type, data)
-    except ValueError as e:
-        raise HTTPException(400, str(e))
-    return FileOut(id=f.id, filename=f.filename, mime_type=f.mime_type, created_at=str(f.created_at))
+        for upload in uploads:
+            try:
+                _check_type(upload)
+                with timed("upload_hash"):
+                    spooled.append(await spool_upload(upload, settings.max_upload_mb * 1024 * 1024))
+            except UploadTooLarge as e:
+                spooled.append(HTTPException(413, str(e)))
+            except HTTPException as e:
+                spooled.append(e)
+    except BaseException:
+        _close_spooled(spooled)
+        raise
+    sem = asyncio.Semaphore(settings.upload_batch_concurrency)
+
+    async def accept(index: int, upload: UploadFile, hashed: HashedUpload | HTTPException) -> dict:
+        line = {"index": index, "filename": upload.filename}
+        if isinstance(hashed, HTTPException):
+            return {**line, "status": hashed.status_code, "error": hashed.detail}
+        async with sem:
+            async with SessionLocal() as session:
+                try:
+                    job, created = await _accept_hashed(session, upload.filename, upload.content_type, hashed)
+                except HTTPException as e:
+                    await session.rollback()
+                    return {**line, "status": e.status_code, "error": e.detail}
+                except Exception as e:
+                    # falha de um arquivo (banco, armazenamento) não interrompe o lote
+                    logger.exception("Upload em lote: falha em %s", upload.filename)
+                    await session.rollback()
+                    return {**line, "status": 500, "error": f"{type(e).__name__}: {e}"}
+        return {**line, "status": 202 if created else 200, "job": job.model_dump()}
+
+    async def lines():
+        tasks = [asyncio.create_task(accept(i, u, h)) for i, (u, h) in enumerate(zip(uploads, spooled))]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done, ensure_ascii=False) + "\n"
+        finally:
+            # cliente desconectou: não deixa gravações órfãs rodando
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            _close_spooled(spooled)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _close_spooled(spooled: list[HashedUpload | HTTPException]) -> None:
+    for h in spooled:
+        if isinstance(h, HashedUpload):
+            h.file.close()
+
+def _encode_cursor(created_at: datetime, file_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{file_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, _, file_id = raw.partition("|")
+        return datetime.fromisoformat(created_at), int(file_id)
+    except ValueError:
+        raise HTTPException(400, "Cursor inválido.")
 
 @router.get("", response_model=FileListOut)
 async def list_files(
+    session: AsyncSession = Depends(get_read_session),
+    limit: int = Query(20, ge=1, le=200),
+    cursor: str | None = None,
+):
+    # total mantido por trigger (row_counts + deltas): sem count(*) por requisição
+    total = await row_count(session, "files")
+    # projeção enxuta: a listagem nunca toca no PDF bruto nem em chunks.
+    # Keyset em (created_at, id): custo constante em qualquer página (índice idx_files_created_at_id)
+    q = (
+        select(
+            File.id, File.filename, File.mime_type, File.created_at,
+            File.size_bytes, File.page_count, File.chunk_count,
+        )
+        .order_by(desc(File.created_at), desc(File.id))
+        .limit(limit + 1)
+    )
+    if cursor:
+        q = q.where(tuple_(File.created_at, File.id) < tuple_(*_decode_cursor(cursor)))
+    rows = (await session.execute(q)).all()
+    page, more = rows[:limit], len(rows) > limit
+    items = [
+        FileOut(
+            id=f.id,
+            filename=f.filename,
+            mime_type=f.mime_type,
+            created_at=str(f.created_at),
+            size_bytes=f.size_bytes,
+            page_count=f.page_count,
+            chunk_count=f.chunk_count,
+        )
+        for f in page
+    ]
+    next_cursor = _encode_cursor(page[-1].created_at, page[-1].id) if more else None
+    return FileListOut(items=items, total=total, next_cursor=next_cursor)
+
+def _parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    # suporta um único intervalo: "bytes=ini-fim", "bytes=ini-" e "bytes=-sufixo"
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_s:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+        else:
+            start, end = max(0, size - int(end_s)), size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end:
+        raise HTTPException(416, "Intervalo inválido.", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+@router.get("/{file_id}/content")
+async def download_file(
+    file_id: int,
+    range_header: str | None = Header(None, alias="Range"),
     session: AsyncSession = Depends(get_session),
-    limit: int = 20,
-    offset: int = 0,
 ):
-    total = await session.scalar(select(func.count()).select_from(File))
-    q = select(File).order_by(desc(File.created_at)).limit(limit).offset(offset)
-    rows = (await session.execute(q)).scalars().all()
-    items = [FileOut(id=f.id, filename=f.filename, mime_type=f.mime_type, created_at=str(f.created_at)) for f in rows]
-    return FileListOut(items=items, total=int(total or 0))
\ No newline at end of file
+    q = select(File.id, File.filename, File.mime_type, File.size_bytes, File.blob_key).where(File.id == file_id)
+    f = (await session.execute(q)).first()
+    if f is None:
+        raise HTTPException(404, "Arquivo não encontrado.")
+    if f.blob_key:
+        # falha antes de começar a resposta, não no meio do stream
+        try:
+            store_for(f.blob_key)
+        except BlobStoreNotConfigured as e:
+            raise HTTPException(500, str(e))
+    size = f.size_bytes
+    if size is None:
+        size = await session.scalar(select(func.octet_length(File.content)).where(File.id == file_id)) or 0
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(f.filename)}",
+    }
+    byte_range = _parse_range(range_header, size) if size else None
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    return StreamingResponse(
+        iter_content(f.id, f.blob_key, start, end),
+        status_code=status,
+        media_type=f.mime_type,
+        headers=headers,
+    )
\ No newline at end of file
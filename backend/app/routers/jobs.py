@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_session
+from app.models import IngestionJob
+from app.schemas import JobOut
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+def job_out(job: IngestionJob) -> JobOut:
+    return JobOut(
+        id=job.id,
+        file_id=job.file_id,
+        status=job.status,
+        attempts=job.attempts,
+        pages_parsed=job.pages_parsed,
+        chunks_embedded=job.chunks_embedded,
+        rows_written=job.rows_written,
+        error=job.error,
+        created_at=str(job.created_at),
+        started_at=str(job.started_at) if job.started_at else None,
+        finished_at=str(job.finished_at) if job.finished_at else None,
+    )
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(job_id: int, session: AsyncSession = Depends(get_session)):
+    job = await session.get(IngestionJob, job_id)
+    if job is None:
+        raise HTTPException(404, "Job não encontrado.")
+    return job_out(job)
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_session
+from app.models import IndexVersion
+from app.schemas import IndexVersionOut, ReindexRequest
+from app.core.config import settings
+from app.services.embedder import embedding_model_id
+from app.services.reindex import ReindexConflict, create_version, notify_reindexer
+
+router = APIRouter(prefix="/reindex", tags=["reindex"])
+
+def version_out(v: IndexVersion) -> IndexVersionOut:
+    return IndexVersionOut(
+        id=v.id,
+        embedding_model=v.embedding_model,
+        chunk_max_tokens=v.chunk_max_tokens,
+        chunk_overlap_tokens=v.chunk_overlap_tokens,
+        status=v.status,
+        attempts=v.attempts,
+        files_done=v.files_done,
+        last_file_id=v.last_file_id,
+        error=v.error,
+        created_at=str(v.created_at),
+        finished_at=str(v.finished_at) if v.finished_at else None,
+    )
+
+@router.post("", response_model=IndexVersionOut, status_code=202)
+async def reindex(body: ReindexRequest, session: AsyncSession = Depends(get_session)):
+    """Reconstrói chunks e/ou embeddings a partir do texto já extraído; a busca segue na versão atual até o fim."""
+    max_tokens = body.chunk_max_tokens or settings.chunk_max_tokens
+    overlap = settings.chunk_overlap_tokens if body.chunk_overlap_tokens is None else body.chunk_overlap_tokens
+    if overlap >= max_tokens:
+        raise HTTPException(400, "chunk_overlap_tokens deve ser menor que chunk_max_tokens.")
+    try:
+        v = await create_version(session, body.embedding_model or embedding_model_id(), max_tokens, overlap)
+    except ReindexConflict as e:
+        raise HTTPException(409, str(e))
+    await session.commit()
+    await session.refresh(v)
+    notify_reindexer()
+    return version_out(v)
+
+@router.get("/{version_id}", response_model=IndexVersionOut)
+async def get_reindex(version_id: int, session: AsyncSession = Depends(get_session)):
+    v = await session.get(IndexVersion, version_id)
+    if v is None:
+        raise HTTPException(404, "Versão do índice não encontrada.")
+    return version_out(v)
@@ -1,17 +1,73 @@
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime, timezone
+from typing import List, Literal
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_session
-from app.schemas import SearchResponse, SearchHit
-from app.services.search import semantic_search
+from app.db import get_read_session
+from app.schemas import SearchResponse, SearchHit, BatchSearchRequest, BatchSearchResponse
+from app.services.search import BatchQuery, SearchFilters, batch_search, semantic_search
 
 router = APIRouter(prefix="/search", tags=["search"])
 
+def _naive_utc(dt: datetime | None) -> datetime | None:
+    # files.created_at é TIMESTAMP sem fuso (NOW() do servidor, UTC no container)
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
 @router.get("", response_model=SearchResponse)
 async def search(
+    response: Response,
     q: str = Query(..., min_length=2),
     k: int = Query(5, ge=1, le=50),
-    session: AsyncSession = Depends(get_session),
+    mode: Literal["vector", "text", "hybrid"] = Query("vector", description="vector (HNSW), text (full-text) ou hybrid (RRF)"),
+    vector_k: int | None = Query(None, ge=1, le=500, description="Candidatos da busca vetorial"),
+    text_k: int | None = Query(None, ge=1, le=500, description="Candidatos da busca full-text"),
+    file_id: List[int] = Query([], description="Restringe a estes arquivos"),
+    created_from: datetime | None = Query(None, description="Arquivos criados a partir de"),
+    created_to: datetime | None = Query(None, description="Arquivos criados até"),
+    page_from: int | None = Query(None, ge=1),
+    page_to: int | None = Query(None, ge=1),
+    ef_search: int | None = Query(None, ge=1, le=1000, description="hnsw.ef_search desta consulta"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    filters = SearchFilters(
+        file_ids=tuple(sorted(set(file_id))),
+        created_from=_naive_utc(created_from),
+        created_to=_naive_utc(created_to),
+        page_from=page_from,
+        page_to=page_to,
+    )
+    result = await semantic_search(
+        session, q, k=k, mode=mode, vector_k=vector_k, text_k=text_k, filters=filters, ef_search=ef_search
+    )
+    if "embedding" in result.cache:
+        response.headers["X-Cache-Embedding"] = result.cache["embedding"]
+    response.headers["X-Cache-Results"] = result.cache.get("results", "miss")
+    hits = [SearchHit(**h) for h in result.hits]
+    return SearchResponse(query=q, mode=result.mode, plan=result.plan, hits=hits)
+
+
+@router.post("/batch", response_model=BatchSearchResponse)
+async def search_batch(
+    body: BatchSearchRequest,
+    session: AsyncSession = Depends(get_read_session),
 ):
-    hits_raw = await semantic_search(session, q, k=k)
-    hits = [SearchHit(**h) for h in hits_raw]
-    return SearchResponse(query=q, hits=hits)
\ No newline at end of file
+    queries = [
+        BatchQuery(
+            query=item.q,
+            k=item.k,
+            filters=SearchFilters(
+                file_ids=tuple(sorted(set(item.file_id))),
+                created_from=_naive_utc(item.created_from),
+                created_to=_naive_utc(item.created_to),
+                page_from=item.page_from,
+                page_to=item.page_to,
+            ),
+        )
+        for item in body.queries
+    ]
+    results = await batch_search(session, queries, ef_search=body.ef_search)
+    return BatchSearchResponse(results=[
+        SearchResponse(query=bq.query, mode=r.mode, plan=r.plan, hits=[SearchHit(**h) for h in r.hits])
+        for bq, r in zip(queries, results)
+    ])
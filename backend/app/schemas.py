@@ -1,15 +1,53 @@
-from pydantic import BaseModel
-from typing import List
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Literal
 
 class FileOut(BaseModel):
     id: int
     filename: str
     mime_type: str
     created_at: str
+    size_bytes: int | None = None
+    page_count: int | None = None
+    chunk_count: int | None = None
 
 class FileListOut(BaseModel):
     items: list[FileOut]
     total: int
+    # cursor da próxima página (None na última)
+    next_cursor: str | None = None
+
+class JobOut(BaseModel):
+    id: int
+    file_id: int
+    status: str
+    attempts: int
+    pages_parsed: int
+    chunks_embedded: int
+    rows_written: int
+    error: str | None = None
+    created_at: str
+    started_at: str | None = None
+    finished_at: str | None = None
+
+class ReindexRequest(BaseModel):
+    # omitidos: valores atuais da configuração
+    embedding_model: str | None = None
+    chunk_max_tokens: int | None = Field(None, ge=16, le=8192)
+    chunk_overlap_tokens: int | None = Field(None, ge=0)
+
+class IndexVersionOut(BaseModel):
+    id: int
+    embedding_model: str
+    chunk_max_tokens: int
+    chunk_overlap_tokens: int
+    status: str
+    attempts: int
+    files_done: int
+    last_file_id: int
+    error: str | None = None
+    created_at: str
+    finished_at: str | None = None
 
 class SearchHit(BaseModel):
     chunk_id: int
@@ -21,4 +59,35 @@ class SearchHit(BaseModel):
 
 class SearchResponse(BaseModel):
     query: str
-    hits: List[SearchHit]
\ No newline at end of file
+    # vector: score = distância da EMBEDDING_METRIC (menor é melhor; ip = produto interno negativo)
+    # text: ts_rank_cd; hybrid: RRF (maior é melhor)
+    mode: str = "vector"
+    # plano da busca vetorial: hnsw, hnsw_iterative ou exact
+    plan: str | None = None
+    hits: List[SearchHit]
+
+class BatchSearchQuery(BaseModel):
+    q: str = Field(..., min_length=2)
+    k: int = Field(5, ge=1, le=50)
+    file_id: List[int] = []
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+    page_from: int | None = Field(None, ge=1)
+    page_to: int | None = Field(None, ge=1)
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchQuery] = Field(..., min_length=1, max_length=256)
+    ef_search: int | None = Field(None, ge=1, le=1000)
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
+
+class AnswerRequest(BaseModel):
+    question: str = Field(..., min_length=2)
+    k: int = Field(5, ge=1, le=50)
+    mode: Literal["vector", "text", "hybrid"] = "vector"
+    file_id: List[int] = []
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+    page_from: int | None = Field(None, ge=1)
+    page_to: int | None = Field(None, ge=1)
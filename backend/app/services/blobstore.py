@@ -0,0 +1,196 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from typing import AsyncIterator, BinaryIO
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import SessionLocal
+from app.models import File
+from app.core.config import settings
+
+# Tamanho dos blocos lidos/enviados no download
+READ_CHUNK = 256 * 1024
+
+# BLOB_STORE=db: o PDF sobe em blocos para uma tabela temporária (sem WAL) e o
+# Postgres monta o BYTEA; o processo nunca tem o arquivo inteiro em memória
+PIECES_TABLE_SQL = "CREATE TEMP TABLE IF NOT EXISTS upload_pieces (n INT, piece BYTEA) ON COMMIT DELETE ROWS;"
+ASSEMBLE_SQL = """
+UPDATE files
+SET content = COALESCE((SELECT string_agg(piece, ''::bytea ORDER BY n) FROM upload_pieces), ''::bytea)
+WHERE id = :id;
+"""
+
+class BlobStoreNotConfigured(RuntimeError):
+    pass
+
+class BlobStore:
+    """Armazenamento externo de PDFs, endereçado pelo sha256 do conteúdo."""
+
+    async def put(self, key: str, source: BinaryIO) -> None:
+        # source: arquivo binário posicionado no início; copiado em blocos
+        raise NotImplementedError
+
+    async def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        # intervalo inclusivo [start, end], como no header Range
+        raise NotImplementedError
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _put_sync(self, key: str, source: BinaryIO) -> None:
+        path = self.path(key)
+        if os.path.exists(path):
+            return  # mesmo hash, mesmo conteúdo
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as fh:
+            shutil.copyfileobj(source, fh, READ_CHUNK)
+        os.replace(tmp, path)
+
+    async def put(self, key: str, source: BinaryIO) -> None:
+        await asyncio.to_thread(self._put_sync, key, source)
+
+    async def get(self, key: str) -> bytes:
+        def read() -> bytes:
+            with open(self.path(key), "rb") as fh:
+                return fh.read()
+        return await asyncio.to_thread(read)
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        fh = await asyncio.to_thread(open, self.path(key), "rb")
+        try:
+            await asyncio.to_thread(fh.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(fh.read, min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            fh.close()
+
+class S3BlobStore(BlobStore):
+    # Qualquer serviço compatível com S3 (MinIO, LocalStack...) via endpoint_url
+    def __init__(self, bucket: str, endpoint_url: str | None = None, region: str | None = None,
+                 access_key: str | None = None, secret_key: str | None = None):
+        try:
+            import boto3
+        except ImportError:
+            raise ImportError("BLOB_STORE=s3 requer a biblioteca 'boto3'. Instale com: pip install boto3")
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+        )
+
+    async def put(self, key: str, source: BinaryIO) -> None:
+        await asyncio.to_thread(self.client.upload_fileobj, source, self.bucket, key)
+
+    async def get(self, key: str) -> bytes:
+        obj = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key)
+        return await asyncio.to_thread(obj["Body"].read)
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        obj = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}"
+        )
+        body = obj["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, READ_CHUNK):
+                yield chunk
+        finally:
+            body.close()
+
+_store: BlobStore | None = None
+
+def get_blob_store() -> BlobStore | None:
+    """Store externo configurado; None quando o PDF fica em files.content (BYTEA)."""
+    global _store
+    if settings.blob_store == "db":
+        return None
+    if _store is None:
+        if settings.blob_store == "fs":
+            _store = LocalBlobStore(settings.blob_dir)
+        elif settings.blob_store == "s3":
+            _store = S3BlobStore(
+                settings.s3_bucket,
+                endpoint_url=settings.s3_endpoint_url,
+                region=settings.s3_region,
+                access_key=settings.s3_access_key,
+                secret_key=settings.s3_secret_key,
+            )
+        else:
+            raise RuntimeError(f"BLOB_STORE desconhecido: {settings.blob_store}")
+    return _store
+
+def store_for(blob_key: str) -> BlobStore:
+    # arquivo gravado no store externo lido com BLOB_STORE=db: erro de configuração, não AttributeError
+    store = get_blob_store()
+    if store is None:
+        raise BlobStoreNotConfigured(
+            f"Arquivo gravado no blob store externo ({blob_key}), mas BLOB_STORE=db. "
+            "Configure o BLOB_STORE usado na gravação (fs ou s3)."
+        )
+    return store
+
+async def _write_bytea(session: AsyncSession, file_id: int, source: BinaryIO) -> None:
+    await session.execute(text(PIECES_TABLE_SQL))
+    n = 0
+    while piece := await asyncio.to_thread(source.read, settings.upload_chunk_bytes):
+        await session.execute(text("INSERT INTO upload_pieces (n, piece) VALUES (:n, :piece)"), {"n": n, "piece": piece})
+        n += 1
+    await session.execute(text(ASSEMBLE_SQL), {"id": file_id})
+    await session.execute(text("DELETE FROM upload_pieces"))
+
+async def save_content(session: AsyncSession, f: File, source: BinaryIO, sha256: str, size: int) -> None:
+    """Grava o PDF (BYTEA ou store externo, conforme BLOB_STORE), adiciona `f` à sessão e faz flush."""
+    f.sha256 = sha256
+    f.size_bytes = size
+    store = get_blob_store()
+    if store is not None:
+        await store.put(sha256, source)
+        f.blob_key = sha256
+    session.add(f)
+    await session.flush()  # f.id disponível
+    if store is None:
+        # em blocos de UPLOAD_CHUNK_BYTES, como no fs/s3
+        await _write_bytea(session, f.id, source)
+
+async def load_content(session: AsyncSession, f: File) -> bytes:
+    # files.content é deferred: busca explícita, nunca lazy load
+    if f.blob_key:
+        return await store_for(f.blob_key).get(f.blob_key)
+    return await session.scalar(select(File.content).where(File.id == f.id))
+
+async def iter_content(file_id: int, blob_key: str | None, start: int, end: int) -> AsyncIterator[bytes]:
+    """Bytes [start, end] do PDF, em blocos, sem carregar o arquivo inteiro."""
+    if blob_key:
+        async for chunk in store_for(blob_key).iter_range(blob_key, start, end):
+            yield chunk
+        return
+
+    # BYTEA com STORAGE EXTERNAL: substring lê só os blocos TOAST necessários.
+    # Sessão própria porque o gerador roda depois que o handler retornou.
+    async with SessionLocal() as session:
+        pos = start
+        while pos <= end:
+            n = min(READ_CHUNK, end - pos + 1)
+            chunk = await session.scalar(
+                select(func.substring(File.content, pos + 1, n)).where(File.id == file_id)
+            )
+            if not chunk:
+                break
+            pos += len(chunk)
+            yield chunk
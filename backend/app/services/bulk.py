@@ -0,0 +1,72 @@
+import struct
+from typing import AsyncIterator, Iterable, Iterator, Sequence
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# COPY ... FROM STDIN (FORMAT binary): cabeçalho, tuplas (nº de campos + [tamanho, bytes]) e trailer.
+# https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+NULL = struct.pack("!i", -1)
+
+CHUNK_COLUMNS = (
+    "file_id", "page_number", "chunk_index", "text_cleaned", "embedding", "token_count",
+    "index_version", "embedding_model",
+)
+
+# Tamanho aproximado de cada bloco enviado ao servidor
+_FLUSH_BYTES = 1 << 20
+
+# (file_id, page_number, chunk_index, text, embedding float32, token_count, index_version, embedding_model)
+ChunkRow = tuple[int, int, int, str, np.ndarray, int | None, int, str]
+
+def _int4(value: int | None) -> bytes:
+    return NULL if value is None else struct.pack("!ii", 4, value)
+
+def _text(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack("!i", len(data)) + data
+
+def _vector(vec: np.ndarray | None) -> bytes:
+    # formato binário do pgvector: dim (int16), unused (int16), float4 big-endian
+    if vec is None:
+        return NULL
+    body = struct.pack("!hh", len(vec), 0) + np.asarray(vec, dtype=">f4").tobytes()
+    return struct.pack("!i", len(body)) + body
+
+def encode_chunk_rows(rows: Iterable[ChunkRow]) -> Iterator[bytes]:
+    buf = bytearray(COPY_HEADER)
+    field_count = struct.pack("!h", len(CHUNK_COLUMNS))
+    for file_id, page_number, chunk_index, text, vec, token_count, index_version, model in rows:
+        buf += field_count
+        buf += _int4(file_id)
+        buf += _int4(page_number)
+        buf += _int4(chunk_index)
+        buf += _text(text)
+        buf += _vector(vec)
+        buf += _int4(token_count)
+        buf += _int4(index_version)
+        buf += _text(model)
+        if len(buf) >= _FLUSH_BYTES:
+            yield bytes(buf)
+            buf.clear()
+    buf += COPY_TRAILER
+    yield bytes(buf)
+
+async def _aiter(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+async def copy_chunks(session: AsyncSession, rows: Sequence[ChunkRow]) -> int:
+    """Grava chunks via COPY binário na conexão asyncpg da sessão (mesma transação)."""
+    conn = await session.connection()
+    # garante que o adaptador asyncpg já abriu a transação da sessão antes do COPY
+    await conn.exec_driver_sql("SELECT 1")
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_to_table(
+        "chunks",
+        source=_aiter(encode_chunk_rows(rows)),
+        columns=list(CHUNK_COLUMNS),
+        format="binary",
+    )
+    return len(rows)
@@ -1,18 +1,91 @@
-from typing import List
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, Tuple
+from app.core.config import settings
+from app.services.tokenizer import Tokenizer, get_tokenizer
+from app.services.metrics import timed
+
+# Parágrafos (linha em branco) e, dentro deles, sentenças (pontuação final + espaço)
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"(?<=[.!?…;:])\s+")
+
+@dataclass
+class TextChunk:
+    page_number: int
+    chunk_index: int
+    text: str
+    token_count: int
 
 def clean_text(s: str) -> str:
     return " ".join(s.split())
 
-def chunk_text(text: str, max_chars: int = 1000, overlap: int = 150) -> List[str]:
-    text = clean_text(text)
-    chunks: List[str] = []
-    start = 0
-    n = len(text)
-    while start < n:
-        end = min(start + max_chars, n)
-        chunk = text[start:end]
-        chunks.append(chunk)
-        if end == n:
-            break
-        start = max(0, end - overlap)
-    return chunks
\ No newline at end of file
+def iter_units(text: str) -> Iterator[str]:
+    """Sentenças limpas, na ordem; parágrafos nunca são unidos numa mesma unidade."""
+    for paragraph in PARAGRAPH_RE.split(text):
+        for sentence in SENTENCE_RE.split(paragraph):
+            sentence = clean_text(sentence)
+            if sentence:
+                yield sentence
+
+def chunk_text(
+    text: str,
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+    tokenizer: Tokenizer | None = None,
+) -> Iterator[Tuple[str, int]]:
+    """Gera (texto, tokens) de até max_tokens, cortando em fronteiras de sentença.
+
+    Cada sentença é tokenizada uma vez e entra/sai da janela uma vez só: tempo
+    linear no tamanho da página. As últimas sentenças (até overlap_tokens) abrem
+    o chunk seguinte; sentenças maiores que max_tokens são cortadas por token.
+    """
+    max_tokens = max_tokens or settings.chunk_max_tokens
+    overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+    tok = tokenizer or get_tokenizer()
+
+    window: deque[tuple[str, int]] = deque()
+    tokens = 0
+    # quantas unidades do início da janela já saíram no chunk anterior
+    emitted = 0
+
+    def flush():
+        text = " ".join(u for u, _ in window)
+        return text, tok.count(text)
+
+    for sentence in iter_units(text):
+        n = tok.count(sentence)
+        pieces = [(sentence, n)] if n <= max_tokens else [(p, tok.count(p)) for p in tok.split(sentence, max_tokens)]
+        for unit, n in pieces:
+            if window and tokens + n > max_tokens:
+                yield flush()
+                # mantém só a cauda que cabe na sobreposição
+                while window and (tokens > overlap_tokens or tokens + n > max_tokens):
+                    tokens -= window.popleft()[1]
+                emitted = len(window)
+            window.append((unit, n))
+            tokens += n
+    if len(window) > emitted:
+        yield flush()
+
+def chunk_page(
+    page_no: int,
+    text: str,
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+) -> Iterator[TextChunk]:
+    # chunk_index recomeça em cada página
+    for j, (chunk, n) in enumerate(chunk_text(text, max_tokens, overlap_tokens)):
+        yield TextChunk(page_number=page_no, chunk_index=j, text=chunk, token_count=n)
+
+async def chunk_pages(
+    pages: AsyncIterator[Tuple[int, str]],
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+) -> AsyncIterator[TextChunk]:
+    """Consome as páginas à medida que chegam."""
+    async for page_no, text in pages:
+        with timed("chunk"):
+            chunks = list(chunk_page(page_no, text, max_tokens, overlap_tokens))
+        for c in chunks:
+            yield c
@@ -0,0 +1,168 @@
+import numpy as np
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models import Chunk
+from app.services.tokenizer import count_tokens, get_tokenizer
+
+# Montagem do contexto do prompt: hits -> spans (chunks vizinhos fundidos, sem a
+# sobreposição) -> MMR opcional -> empacotamento guloso no orçamento de tokens.
+
+# sobreposições menores que isso entre chunks vizinhos são tratadas como coincidência
+MIN_OVERLAP_CHARS = 8
+# um span que não cabe é truncado ao que sobra do orçamento se sobrar pelo menos isso
+MIN_TRUNCATED_TOKENS = 32
+
+@dataclass
+class Span:
+    file_id: int
+    page_number: int
+    chunk_start: int
+    chunk_end: int
+    text: str
+    score: float
+    # posição do melhor hit do span no ranking da busca
+    rank: int
+    chunk_ids: List[int] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "file_id": self.file_id,
+            "page_number": self.page_number,
+            "chunk_start": self.chunk_start,
+            "chunk_end": self.chunk_end,
+            "chunk_ids": self.chunk_ids,
+            "text": self.text,
+            "score": self.score,
+        }
+
+@dataclass
+class AssembledContext:
+    spans: List[Span]
+    tokens: int
+    # hits descartados por não caberem no orçamento
+    dropped: int = 0
+
+def overlap(a: str, b: str) -> int:
+    # maior sufixo de `a` que é prefixo de `b`
+    for n in range(min(len(a), len(b)), MIN_OVERLAP_CHARS - 1, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+def merge_hits(hits: List[Dict[str, Any]]) -> List[Span]:
+    """Funde hits com chunk_index consecutivo do mesmo arquivo/página num único span."""
+    ranked = sorted(enumerate(hits), key=lambda p: (p[1]["file_id"], p[1]["page_number"], p[1]["chunk_index"]))
+    spans: List[Span] = []
+    for rank, h in ranked:
+        last = spans[-1] if spans else None
+        if (
+            last is not None
+            and last.file_id == h["file_id"]
+            and last.page_number == h["page_number"]
+            and last.chunk_end + 1 == h["chunk_index"]
+        ):
+            n = overlap(last.text, h["text"])
+            last.text += h["text"][n:] if n else " " + h["text"]
+            last.chunk_end = h["chunk_index"]
+            last.chunk_ids.append(h["chunk_id"])
+            if rank < last.rank:
+                last.rank, last.score = rank, h["score"]
+            continue
+        spans.append(Span(
+            file_id=h["file_id"],
+            page_number=h["page_number"],
+            chunk_start=h["chunk_index"],
+            chunk_end=h["chunk_index"],
+            text=h["text"],
+            score=h["score"],
+            rank=rank,
+            chunk_ids=[h["chunk_id"]],
+        ))
+    # volta à ordem de relevância da busca
+    return sorted(spans, key=lambda s: s.rank)
+
+def mmr(query: np.ndarray, candidates: np.ndarray, lambda_: float) -> List[int]:
+    """Maximal Marginal Relevance: ordena todos os candidatos por relevância menos redundância."""
+    q = query / (np.linalg.norm(query) or 1.0)
+    norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+    c = candidates / np.where(norms == 0, 1.0, norms)
+    relevance = c @ q
+    similarity = c @ c.T
+
+    n = len(c)
+    order: List[int] = []
+    remaining = np.ones(n, dtype=bool)
+    # maior similaridade de cada candidato com algum já escolhido
+    redundancy = np.full(n, -np.inf)
+    for _ in range(n):
+        scores = lambda_ * relevance - (1 - lambda_) * np.where(np.isinf(redundancy), 0.0, redundancy)
+        scores[~remaining] = -np.inf
+        i = int(np.argmax(scores))
+        order.append(i)
+        remaining[i] = False
+        redundancy = np.maximum(redundancy, similarity[i])
+    return order
+
+def mmr_spans(spans: List[Span], query: np.ndarray, embeddings: List[np.ndarray | None], lambda_: float) -> List[Span]:
+    """Reordena por MMR os spans com embedding; os sem embedding ficam na posição original."""
+    with_vec = [i for i, e in enumerate(embeddings) if e is not None]
+    if len(with_vec) < 2:
+        return spans
+    order = mmr(query, np.stack([embeddings[i] for i in with_vec]), lambda_)
+    picked = iter([spans[with_vec[i]] for i in order])
+    return [next(picked) if embeddings[i] is not None else s for i, s in enumerate(spans)]
+
+async def _span_embeddings(session: AsyncSession, spans: List[Span]) -> List[np.ndarray | None]:
+    ids = [cid for s in spans for cid in s.chunk_ids]
+    rows = (await session.execute(
+        select(Chunk.id, Chunk.embedding).where(Chunk.id.in_(ids), Chunk.embedding.is_not(None))
+    )).all()
+    by_id = {r[0]: np.asarray(r[1], dtype=np.float32) for r in rows}
+    # span fundido: média dos embeddings dos seus chunks. Chunks apagados desde a busca
+    # (troca de versão, retry da ingestão) ou sem vetor ficam de fora; sem nenhum, None
+    out: List[np.ndarray | None] = []
+    for s in spans:
+        vecs = [by_id[cid] for cid in s.chunk_ids if cid in by_id]
+        out.append(np.mean(vecs, axis=0) if vecs else None)
+    return out
+
+def pack(spans: List[Span], budget: int, reserved: int = 0) -> AssembledContext:
+    # guloso na ordem dada. O que não cabe é truncado ao que sobra (sempre, no primeiro
+    # span: spans fundidos podem passar do orçamento sozinhos e o melhor hit não pode
+    # ficar de fora); com pouca sobra é pulado e um span menor adiante ainda pode entrar.
+    chosen: List[Span] = []
+    used = reserved
+    for s in spans:
+        cost = count_tokens(s.text)
+        if used + cost > budget:
+            remaining = budget - used
+            if remaining <= 0 or (chosen and remaining < MIN_TRUNCATED_TOKENS):
+                continue
+            s = replace(s, text=get_tokenizer().split(s.text, remaining)[0])
+            cost = count_tokens(s.text)
+            if used + cost > budget:
+                continue
+        chosen.append(s)
+        used += cost
+    return AssembledContext(spans=chosen, tokens=used - reserved, dropped=len(spans) - len(chosen))
+
+async def assemble_context(
+    session: AsyncSession,
+    hits: List[Dict[str, Any]],
+    qvec: List[float] | None = None,
+    budget: int | None = None,
+    reserved: int = 0,
+) -> AssembledContext:
+    """hits (em ordem de relevância) -> spans que cabem em `budget` tokens.
+
+    `reserved` desconta do orçamento os tokens já usados pelo resto do prompt.
+    MMR só roda com CONTEXT_MMR ligado e com o vetor da pergunta (modos vector/hybrid).
+    """
+    spans = merge_hits(hits)
+    if settings.context_mmr and qvec is not None and len(spans) > 1:
+        emb = await _span_embeddings(session, spans)
+        spans = mmr_spans(spans, np.asarray(qvec, dtype=np.float32), emb, settings.context_mmr_lambda)
+    return pack(spans, budget or settings.context_token_budget, reserved)
@@ -1,26 +1,318 @@
-import httpx
+import asyncio
+import random
+import re
+import zlib
+from functools import lru_cache
 from typing import List
+import httpx
+import numpy as np
 from app.core.config import settings
+from app.services.tokenizer import count_tokens
+from app.services.metrics import EMBED_BATCH_INPUTS, EMBED_BATCH_TOKENS, EMBED_RETRIES, timed
+
+# Status que valem nova tentativa (rate limit e falhas transitórias do provedor)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+def normalize_rows(vecs) -> np.ndarray:
+    # norma L2 = 1: cosine e produto interno passam a ordenar igual
+    m = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    np.divide(m, norms, out=m, where=norms > 0)
+    return m
+
+def supports_dimensions(model: str) -> bool:
+    # só a família text-embedding-3 aceita o parâmetro "dimensions"
+    return model.startswith("text-embedding-3")
 
 class Embedder:
-    async def embed(self, texts: List[str]) -> List[List[float]]:
+    async def embed(self, texts: List[str], token_counts: List[int] | None = None) -> List[List[float]]:
+        # token_counts: tokens de cada texto, quando quem chama já os tem (chunks); evita recontar
         raise NotImplementedError
 
+    async def aclose(self) -> None:
+        pass
+
 class OpenAIEmbedder(Embedder):
-    def __init__(self, api_key: str, model: str):
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str = "https://api.openai.com/v1",
+        max_retries: int = 5,
+        max_connections: int = 8,
+        dimensions: int | None = None,
+        normalize: bool = False,
+        max_retry_after: float = 60.0,
+    ):
         self.api_key = api_key
         self.model = model
+        self.dimensions = dimensions
+        self.normalize = normalize
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        # teto para o Retry-After do provedor: um valor absurdo não prende o worker
+        self.max_retry_after = max_retry_after
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # cliente único e de longa duração: reaproveita conexões (sem novo handshake TLS por chamada)
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=60,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    def _backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(max(0.0, float(retry_after)), self.max_retry_after)
+            except ValueError:
+                pass
+        return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def embed(self, texts: List[str], token_counts: List[int] | None = None) -> List[List[float]]:
+        payload = {"model": self.model, "input": texts}
+        if self.dimensions:
+            # text-embedding-3-*: truncamento Matryoshka feito pelo provedor
+            payload["dimensions"] = self.dimensions
+        EMBED_BATCH_INPUTS.labels(self.model).observe(len(texts))
+        for attempt in range(self.max_retries + 1):
+            r = None
+            try:
+                # micro-lotes juntam perguntas de várias requisições: só histograma, sem Server-Timing
+                with timed("embed_request", server_timing=False):
+                    r = await self.client.post("/embeddings", json=payload)
+            except httpx.TransportError:
+                EMBED_RETRIES.labels("transport").inc()
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if r.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    r.raise_for_status()
+                    data = r.json()["data"]
+                    vecs = [d["embedding"] for d in sorted(data, key=lambda d: d["index"])]
+                    return normalize_rows(vecs).tolist() if self.normalize else vecs
+                EMBED_RETRIES.labels(str(r.status_code)).inc()
+            await asyncio.sleep(self._backoff(attempt, r))
+        raise AssertionError("unreachable")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+@lru_cache(maxsize=200_000)
+def _feature_hash(feature: str) -> int:
+    # hash estável entre processos (hash() do Python é aleatório por processo)
+    return zlib.crc32(feature.encode("utf-8"))
+
+class LocalHashEmbedder(Embedder):
+    """Embedder local, só CPU e sem rede (feature hashing com NumPy).
+
+    Palavras e trigramas de caracteres são espalhados em `dim` posições com sinal
+    (hashing trick) e o vetor é normalizado (L2). Não tem a qualidade semântica de
+    um modelo treinado, mas é determinístico e instantâneo: serve para ambientes
+    sem rede, testes de carga e CI.
+    """
+
+    model = "local-hash-v1"
+
+    def __init__(self, dim: int, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+
+    def _features(self, text: str) -> List[str]:
+        feats: List[str] = []
+        for word in _WORD_RE.findall(text.lower()):
+            feats.append(word)
+            padded = f"<{word}>"
+            feats.extend("#" + padded[i:i + self.ngram] for i in range(len(padded) - self.ngram + 1))
+        return feats
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        rows: List[int] = []
+        hashes: List[int] = []
+        for i, text in enumerate(texts):
+            feats = self._features(text)
+            rows.extend([i] * len(feats))
+            hashes.extend(_feature_hash(f) for f in feats)
 
-    async def embed(self, texts: List[str]) -> List[List[float]]:
-        url = "https://api.openai.com/v1/embeddings"
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(url, headers=headers, json={"model": self.model, "input": texts})
-            r.raise_for_status()
-            data = r.json()
-        return [d["embedding"] for d in data["data"]]
+        h = np.asarray(hashes, dtype=np.uint32)
+        cols = (h % self.dim).astype(np.intp)
+        signs = np.where(h >> 31, -1.0, 1.0).astype(np.float32)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(out, (np.asarray(rows, dtype=np.intp), cols), signs)
 
-def get_embedder() -> Embedder:
+        return normalize_rows(out)
+
+    async def embed(self, texts: List[str], token_counts: List[int] | None = None) -> List[List[float]]:
+        if not texts:
+            return []
+        EMBED_BATCH_INPUTS.labels(self.model).observe(len(texts))
+        with timed("embed_request", server_timing=False):
+            return (await asyncio.to_thread(self.embed_sync, texts)).tolist()
+
+class EmbeddingBatcher(Embedder):
+    """Agenda chamadas a outro Embedder.
+
+    - divide entradas grandes em lotes limitados por tokens e por itens;
+    - executa os lotes com concorrência limitada;
+    - junta pedidos pequenos e simultâneos (ex.: uma pergunta do /search)
+      em micro-lotes compartilhados, esperando no máximo `micro_batch_ms`.
+    """
+
+    def __init__(
+        self,
+        inner: Embedder,
+        max_items: int = 2048,
+        max_tokens: int = 100_000,
+        max_concurrency: int = 4,
+        micro_batch_ms: float = 5,
+        micro_batch_max_inputs: int = 16,
+    ):
+        self.inner = inner
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.micro_batch_ms = micro_batch_ms
+        self.micro_batch_max_inputs = micro_batch_max_inputs
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._pending: list[tuple[List[str], asyncio.Future]] = []
+        self._pending_items = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def batches(self, texts: List[str], token_counts: List[int] | None = None) -> list[tuple[int, int]]:
+        counts = token_counts if token_counts is not None else map(count_tokens, texts)
+        ranges: list[tuple[int, int]] = []
+        start, tokens = 0, 0
+        for i, n in enumerate(counts):
+            if i > start and (i - start >= self.max_items or tokens + n > self.max_tokens):
+                ranges.append((start, i))
+                EMBED_BATCH_TOKENS.labels(self.inner_model).observe(tokens)
+                start, tokens = i, 0
+            tokens += n
+        if start < len(texts):
+            ranges.append((start, len(texts)))
+            EMBED_BATCH_TOKENS.labels(self.inner_model).observe(tokens)
+        return ranges
+
+    @property
+    def inner_model(self) -> str:
+        return getattr(self.inner, "model", "unknown")
+
+    async def _run_batch(self, texts: List[str]) -> List[List[float]]:
+        async with self._sem:
+            return await self.inner.embed(texts)
+
+    async def _embed_batches(self, texts: List[str], token_counts: List[int] | None = None) -> List[List[float]]:
+        if token_counts is None and len(texts) > self.micro_batch_max_inputs:
+            # sem contagens prontas: tokenizar muitos textos não pode travar o event loop
+            ranges = await asyncio.to_thread(self.batches, texts)
+        else:
+            ranges = self.batches(texts, token_counts)
+        parts = await asyncio.gather(*(self._run_batch(texts[s:e]) for s, e in ranges))
+        return [vec for part in parts for vec in part]
+
+    async def embed(self, texts: List[str], token_counts: List[int] | None = None) -> List[List[float]]:
+        if not texts:
+            return []
+        if self.micro_batch_ms <= 0 or len(texts) > self.micro_batch_max_inputs:
+            return await self._embed_batches(texts, token_counts)
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((texts, fut))
+        self._pending_items += len(texts)
+        if self._pending_items >= self.max_items:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.micro_batch_ms / 1000, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending, self._pending_items = self._pending, [], 0
+        if pending:
+            task = asyncio.create_task(self._dispatch(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, pending: list[tuple[List[str], asyncio.Future]]) -> None:
+        texts = [t for ts, _ in pending for t in ts]
+        try:
+            vecs = await self._embed_batches(texts)
+        except Exception as e:
+            for _, fut in pending:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        i = 0
+        for ts, fut in pending:
+            if not fut.done():
+                fut.set_result(vecs[i:i + len(ts)])
+            i += len(ts)
+
+    async def aclose(self) -> None:
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.inner.aclose()
+
+# um embedder por modelo: durante uma reindexação a busca ainda embeda com o modelo da versão ativa
+_embedders: dict[str, Embedder] = {}
+
+def embedding_model_id() -> str:
+    # modelo configurado; identifica o espaço vetorial (entra na chave do cache de embeddings)
+    if settings.embeddings_provider == "local":
+        return LocalHashEmbedder.model
+    return settings.openai_embedding_model
+
+def _build_embedder(model: str) -> Embedder:
+    if model == LocalHashEmbedder.model:
+        return LocalHashEmbedder(settings.embedding_dim)
+    if settings.embeddings_provider not in ("openai", "local"):
+        raise RuntimeError(f"EMBEDDINGS_PROVIDER desconhecido: {settings.embeddings_provider}")
     if not settings.openai_api_key:
         raise RuntimeError("OPENAI_API_KEY não configurada")
-    return OpenAIEmbedder(settings.openai_api_key, settings.openai_embedding_model)
\ No newline at end of file
+    return EmbeddingBatcher(
+        OpenAIEmbedder(
+            settings.openai_api_key,
+            model,
+            base_url=settings.openai_base_url,
+            max_retries=settings.embed_max_retries,
+            max_connections=settings.embed_max_concurrency,
+            dimensions=settings.embedding_dim if supports_dimensions(model) else None,
+            normalize=settings.normalize_embeddings,
+            max_retry_after=settings.embed_max_retry_after_s,
+        ),
+        max_items=settings.embed_batch_max_items,
+        max_tokens=settings.embed_batch_max_tokens,
+        max_concurrency=settings.embed_max_concurrency,
+        micro_batch_ms=settings.embed_micro_batch_ms,
+        micro_batch_max_inputs=settings.embed_micro_batch_max_inputs,
+    )
+
+def get_embedder(model: str | None = None) -> Embedder:
+    model = model or embedding_model_id()
+    if model not in _embedders:
+        _embedders[model] = _build_embedder(model)
+    return _embedders[model]
+
+async def close_embedder() -> None:
+    embedders = list(_embedders.values())
+    _embedders.clear()
+    for e in embedders:
+        await e.aclose()
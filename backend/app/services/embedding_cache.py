@@ -0,0 +1,108 @@
+import hashlib
+import unicodedata
+from array import array
+from dataclasses import dataclass, asdict
+from typing import List
+from sqlalchemy import Text, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import SessionLocal
+from app.models import EmbeddingCacheEntry
+from app.core.config import settings
+from app.services.embedder import embedding_model_id, get_embedder
+from app.services.lru import LRUCache
+from app.services.metrics import timed
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+stats = CacheStats()
+# array('f'): float32 compacto (~6KB por vetor de 1536 dims, contra ~50KB de list[float])
+_memory = LRUCache(settings.embedding_cache_memory_size)
+# asyncpg aceita no máximo 32767 parâmetros por statement
+_INSERT_BATCH = 1000
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+def cache_key(text: str, model: str | None = None) -> str:
+    raw = f"{model or embedding_model_id()}\x00{settings.embedding_dim}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+async def _store(entries: dict[str, List[float]], model: str) -> None:
+    # sessão própria: o cache sobrevive a rollback da ingestão e funciona em sessões só de leitura
+    rows = [
+        {
+            "key": key,
+            "model": model,
+            "dimensions": settings.embedding_dim,
+            "embedding": vec,
+        }
+        for key, vec in entries.items()
+    ]
+    async with SessionLocal() as session:
+        for i in range(0, len(rows), _INSERT_BATCH):
+            stmt = pg_insert(EmbeddingCacheEntry).values(rows[i:i + _INSERT_BATCH])
+            await session.execute(stmt.on_conflict_do_nothing(index_elements=["key"]))
+        await session.commit()
+
+async def embed_cached(
+    session: AsyncSession,
+    texts: List[str],
+    model: str | None = None,
+    token_counts: List[int] | None = None,
+) -> List[List[float]]:
+    """Embeddings com cache endereçado por conteúdo: memória -> tabela embedding_cache -> provedor.
+
+    `model` = None usa o modelo configurado (EMBEDDINGS_PROVIDER / OPENAI_EMBEDDING_MODEL).
+    `token_counts` (tokens de cada texto, se já conhecidos) poupa o embedder de recontá-los.
+    """
+    model = model or embedding_model_id()
+    if not settings.embedding_cache_enabled:
+        with timed("embed"):
+            return await get_embedder(model).embed(texts, token_counts)
+
+    keys = [cache_key(t, model) for t in texts]
+    found: dict[str, array] = {}
+    for key in dict.fromkeys(keys):
+        vec = _memory.get(key)
+        if vec is not None:
+            found[key] = vec
+    stats.memory_hits += len(found)
+
+    missing = [key for key in dict.fromkeys(keys) if key not in found]
+    if missing:
+        with timed("embed_cache_lookup"):
+            rows = (await session.execute(
+                select(EmbeddingCacheEntry.key, EmbeddingCacheEntry.embedding)
+                .where(EmbeddingCacheEntry.key == any_(bindparam("keys", missing, type_=ARRAY(Text))))
+            )).all()
+        for key, vec in rows:
+            found[key] = array("f", vec)
+            _memory.put(key, found[key])
+            stats.db_hits += 1
+
+    # um texto por chave ainda ausente (repetições no mesmo lote são embedadas uma vez)
+    pending = {key: text for key, text in zip(keys, texts) if key not in found}
+    if pending:
+        stats.misses += len(pending)
+        counts = None
+        if token_counts is not None:
+            by_key = dict(zip(keys, token_counts))
+            counts = [by_key[key] for key in pending]
+        with timed("embed"):
+            vecs = await get_embedder(model).embed(list(pending.values()), counts)
+        new = dict(zip(pending.keys(), vecs))
+        with timed("embed_cache_store"):
+            await _store(new, model)
+        for key, vec in new.items():
+            found[key] = array("f", vec)
+            _memory.put(key, found[key])
+
+    return [found[key].tolist() for key in keys]
@@ -1,49 +1,239 @@
-import io
-from typing import List
-from pypdf import PdfReader
+from typing import Awaitable, Callable, Dict, List
+import numpy as np
+from sqlalchemy import delete, insert, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.services.embedder import get_embedder
-from app.models import File, Chunk
+from app.services.embedding_cache import embed_cached
+from app.services.pdf import iter_pages
+from app.services.chunker import TextChunk, chunk_page, chunk_pages
+from app.services.query_cache import bump_generation
+from app.services.bulk import copy_chunks
+from app.services.blobstore import load_content, save_content
+from app.services.uploads import HashedUpload, hash_bytes
+from app.services.metrics import timed
+from app.models import File, Chunk, IndexVersion, Page
 from app.core.config import settings
 
-def chunk_text(text: str, max_chars: int = 1000, overlap: int = 200):
-    i, n = 0, len(text)
-    while i < n:
-        yield text[i:i+max_chars]
-        i += max_chars - overlap
+# Recebe contadores de progresso por etapa (pages_parsed, chunks_embedded, rows_written)
+ProgressCallback = Callable[..., Awaitable[None]]
 
-async def ingest_pdf(session: AsyncSession, filename: str, mime_type: str, data: bytes) -> File:
-    f = File(filename=filename, mime_type=mime_type, content=data)  # se você salva o PDF bruto na tabela
-    session.add(f)
-    await session.flush()  # f.id disponível
-
-    reader = PdfReader(io.BytesIO(data))
-    chunk_payload: List[tuple[int,int,str]] = []
-    for page_no, page in enumerate(reader.pages, start=1):
-        text = page.extract_text() or ""
-        for j, ch in enumerate(chunk_text(text)):
-            chunk_payload.append((page_no, j, ch))
-
-    if not chunk_payload:
-        await session.commit()
-        return f
+# Páginas: (page_number, texto extraído)
+PageText = tuple[int, str]
+
+# Namespace dos advisory locks por arquivo (ingestão e reindexação nunca gravam o mesmo arquivo juntas)
+FILE_LOCK_NS = 7301
+
+async def _noop_progress(**counts) -> None:
+    pass
+
+async def lock_file(session: AsyncSession, file_id: int) -> None:
+    await session.execute(text("SELECT pg_advisory_xact_lock(:ns, :id)"), {"ns": FILE_LOCK_NS, "id": file_id})
+
+async def live_versions(session: AsyncSession) -> List[IndexVersion]:
+    # versão ativa e, durante uma reindexação, a que está em construção
+    stmt = select(IndexVersion).where(IndexVersion.status.in_(("active", "building"))).order_by(IndexVersion.id)
+    return list((await session.scalars(stmt)).all())
+
+async def find_duplicate(session: AsyncSession, sha256: str) -> File | None:
+    # serializa uploads concorrentes do mesmo conteúdo até o commit da transação
+    await session.execute(text("SELECT pg_advisory_xact_lock(hashtextextended(:sha, 0))"), {"sha": sha256})
+    return await session.scalar(select(File).where(File.sha256 == sha256).order_by(File.id).limit(1))
+
+async def store_pdf(session: AsyncSession, filename: str, mime_type: str, upload: HashedUpload) -> File:
+    f = File(filename=filename, mime_type=mime_type)
+    await save_content(session, f, upload.file, upload.sha256, upload.size)  # BYTEA ou blob store externo, conforme BLOB_STORE
+    return f
+
+async def store_pages(session: AsyncSession, file_id: int, pages: List[PageText]) -> None:
+    with timed("db_write"):
+        await session.execute(delete(Page).where(Page.file_id == file_id))
+        if pages:
+            await session.execute(insert(Page), [{"file_id": file_id, "page_number": n, "text": t} for n, t in pages])
+        await session.execute(update(File).where(File.id == file_id).values(page_count=len(pages)))
+
+async def load_pages(session: AsyncSession, file_ids: List[int]) -> Dict[int, List[PageText]]:
+    rows = await session.execute(
+        select(Page.file_id, Page.page_number, Page.text)
+        .where(Page.file_id.in_(file_ids))
+        .order_by(Page.file_id, Page.page_number)
+    )
+    pages: Dict[int, List[PageText]] = {}
+    for file_id, page_no, txt in rows:
+        pages.setdefault(file_id, []).append((page_no, txt))
+    return pages
+
+def chunk_for_version(pages: List[PageText], version: IndexVersion) -> List[TextChunk]:
+    with timed("chunk"):
+        return [
+            c
+            for page_no, txt in pages
+            for c in chunk_page(page_no, txt, version.chunk_max_tokens, version.chunk_overlap_tokens)
+        ]
 
-    embedder = get_embedder()
-    # batch embeddings
-    texts = [c[2] for c in chunk_payload]
-    embeds = await embedder.embed(texts)
+async def write_chunks(
+    session: AsyncSession,
+    file_id: int,
+    chunk_payload: List[TextChunk],
+    embeds: List[List[float]],
+    version: IndexVersion,
+) -> int:
+    if settings.bulk_insert:
+        # COPY binário com vetores float32 compactos
+        matrix = np.asarray(embeds, dtype=np.float32)
+        rows = [
+            (file_id, c.page_number, c.chunk_index, c.text, matrix[i], c.token_count, version.id, version.embedding_model)
+            for i, c in enumerate(chunk_payload)
+        ]
+        return await copy_chunks(session, rows)
 
+    # fallback: ORM (unit of work + INSERTs)
     chunks = [
         Chunk(
-            file_id=f.id,
-            page_number=page_no,
-            chunk_index=idx,
-            text_cleaned=txt,
-            embedding=vec,        # list[float] – OK se sua coluna é VECTOR(1536/3072) com pgvector
-            token_count=len(txt),
+            file_id=file_id,
+            page_number=c.page_number,
+            chunk_index=c.chunk_index,
+            text_cleaned=c.text,
+            embedding=vec,        # list[float] com EMBEDDING_DIM posições
+            token_count=c.token_count,
+            index_version=version.id,
+            embedding_model=version.embedding_model,
         )
-        for (page_no, idx, txt), vec in zip(chunk_payload, embeds)
+        for c, vec in zip(chunk_payload, embeds)
     ]
     session.add_all(chunks)
+    await session.flush()
+    return len(chunks)
+
+async def embed_chunks(
+    session: AsyncSession,
+    version: IndexVersion,
+    chunks_by_file: Dict[int, List[TextChunk]],
+) -> List[List[float]]:
+    # uma chamada para todos os arquivos; a sessão só lê o cache (sem locks de escrita)
+    flat = [c for chunks in chunks_by_file.values() for c in chunks]
+    if not flat:
+        return []
+    return await embed_cached(
+        session, [c.text for c in flat], model=version.embedding_model, token_counts=[c.token_count for c in flat],
+    )
+
+async def write_embedded(
+    session: AsyncSession,
+    version: IndexVersion,
+    chunks_by_file: Dict[int, List[TextChunk]],
+    embeds: List[List[float]],
+) -> int:
+    written, i = 0, 0
+    with timed("db_write"):
+        for file_id, chunks in chunks_by_file.items():
+            if chunks:
+                written += await write_chunks(session, file_id, chunks, embeds[i:i + len(chunks)], version)
+                i += len(chunks)
+    return written
+
+async def index_chunks(
+    session: AsyncSession,
+    version: IndexVersion,
+    chunks_by_file: Dict[int, List[TextChunk]],
+) -> tuple[int, int]:
+    """Embeda (uma chamada para todos os arquivos) e grava os chunks de uma versão.
+
+    Devolve (chunks embedados, linhas gravadas).
+    """
+    embeds = await embed_chunks(session, version, chunks_by_file)
+    if not embeds:
+        return 0, 0
+    return len(embeds), await write_embedded(session, version, chunks_by_file, embeds)
+
+async def settle_versions(
+    session: AsyncSession,
+    pages_by_file: Dict[int, List[PageText]],
+    chunks: Dict[int, Dict[int, List[TextChunk]]],
+) -> int:
+    """Fecha a ingestão de um conjunto de arquivos depois de bump_generation.
+
+    Com a linha de corpus_state travada (FOR SHARE) até o commit, versões criadas ou trocadas
+    durante a ingestão são acertadas aqui: as que faltam em `chunks` (versão ->
+    arquivo -> chunks) são gravadas, as que saíram são apagadas e files.chunk_count
+    passa a refletir a versão ativa. Devolve as linhas gravadas.
+    """
+    if not pages_by_file:
+        return 0
+    written = 0
+    current = await live_versions(session)
+    for v in current:
+        if v.id not in chunks:
+            chunks[v.id] = {file_id: chunk_for_version(pages, v) for file_id, pages in pages_by_file.items()}
+            _, w = await index_chunks(session, v, chunks[v.id])
+            written += w
+    file_ids = list(pages_by_file)
+    await session.execute(
+        delete(Chunk).where(Chunk.file_id.in_(file_ids), Chunk.index_version.not_in([v.id for v in current]))
+    )
+    # agregado da listagem: chunks da versão ativa
+    active = next(v for v in current if v.status == "active")
+    await session.execute(
+        update(File), [{"id": file_id, "chunk_count": len(c)} for file_id, c in chunks[active.id].items()]
+    )
+    return written
+
+async def process_file(session: AsyncSession, f: File, progress: ProgressCallback | None = None) -> None:
+    """Parse, chunking e embeddings fora de qualquer transação de escrita; depois grava numa transação curta.
+
+    Nenhum lock (advisory lock do arquivo, linhas apagadas, corpus_state) nem conexão
+    fica preso durante o parse e as chamadas ao provedor de embeddings.
+    """
+    progress = progress or _noop_progress
+    file_id = f.id
+
+    versions = await live_versions(session)
+    active = next(v for v in versions if v.status == "active")
+    data = await load_content(session, f)
+    # encerra a transação de leitura: a conexão volta ao pool durante o parse
+    await session.commit()
+
+    # páginas chegam em ordem, à medida que o pool de processos conclui cada faixa,
+    # e são fatiadas pelo chunker (parâmetros da versão ativa) sem esperar o documento inteiro
+    pages: List[PageText] = []
+
+    async def parsed_pages():
+        async for page_no, txt in iter_pages(data):
+            pages.append((page_no, txt))
+            if page_no % settings.pdf_pages_per_task == 0:
+                await progress(pages_parsed=page_no)
+            yield page_no, txt
+
+    first = [c async for c in chunk_pages(parsed_pages(), active.chunk_max_tokens, active.chunk_overlap_tokens)]
+    del data
+    await progress(pages_parsed=len(pages))
+
+    # versão -> arquivo -> chunks, e os embeddings de cada versão
+    chunks: Dict[int, Dict[int, List[TextChunk]]] = {}
+    embeds: Dict[int, List[List[float]]] = {}
+    for v in versions:
+        chunks[v.id] = {file_id: first if v.id == active.id else chunk_for_version(pages, v)}
+        embeds[v.id] = await embed_chunks(session, v, chunks[v.id])
+        await session.commit()
+    await progress(chunks_embedded=sum(len(e) for e in embeds.values()))
+
+    # transação curta: reprocessamento (retry de job) não pode duplicar chunks
+    await lock_file(session, file_id)
+    await session.execute(delete(Chunk).where(Chunk.file_id == file_id))
+    # texto extraído guardado uma vez: reindexações não reabrem o PDF
+    await store_pages(session, file_id, pages)
+    written = 0
+    for v in versions:
+        written += await write_embedded(session, v, chunks[v.id], embeds[v.id])
+
+    # versões criadas ou trocadas desde o início são acertadas aqui (raro: embeda dentro da transação)
+    await bump_generation(session)
+    written += await settle_versions(session, {file_id: pages}, chunks)
+    with timed("db_commit"):
+        await session.commit()
+    await progress(rows_written=written)
+
+async def ingest_pdf(session: AsyncSession, filename: str, mime_type: str, data: bytes) -> File:
+    # como pela API: o arquivo é gravado primeiro e a ingestão roda em seguida
+    f = await store_pdf(session, filename, mime_type, hash_bytes(data))
     await session.commit()
+    await process_file(session, f)
     return f
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from concurrent.futures.process import BrokenProcessPool
+import httpx
+from sqlalchemy import text, update, func
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import SessionLocal
+from app.models import File, IngestionJob
+from app.core.config import settings
+from app.services.embedder import RETRY_STATUS
+from app.services.ingestion import process_file
+
+logger = logging.getLogger(__name__)
+
+# Pega o próximo job pendente sem bloquear os outros workers. Jobs "running"
+# sem heartbeat recente (worker morto no meio) voltam a ser elegíveis.
+CLAIM_SQL = """
+UPDATE ingestion_jobs
+SET status = 'running', started_at = NOW(), heartbeat_at = NOW(), attempts = attempts + 1
+WHERE id = (
+  SELECT j.id
+  FROM ingestion_jobs j
+  WHERE j.status IN ('queued', 'running')
+    AND (j.status = 'queued' OR j.heartbeat_at < NOW() - make_interval(secs => :timeout))
+    AND j.attempts < :max_attempts
+  ORDER BY j.id
+  FOR UPDATE SKIP LOCKED
+  LIMIT 1
+)
+RETURNING id, file_id, attempts;
+"""
+
+# Jobs "running" abandonados que já gastaram todas as tentativas: estado final
+EXHAUSTED_SQL = """
+UPDATE ingestion_jobs
+SET status = 'failed', finished_at = NOW(),
+    error = COALESCE(error, 'Worker interrompido') || ' (tentativas esgotadas)'
+WHERE status = 'running'
+  AND heartbeat_at < NOW() - make_interval(secs => :timeout)
+  AND attempts >= :max_attempts;
+"""
+
+# SQLSTATE de falhas transitórias: conexão (08), serialização/deadlock (40),
+# recursos (53), servidor reiniciando (57P) e lock indisponível (55P03)
+TRANSIENT_SQLSTATES = ("08", "40", "53", "57P", "55P03")
+
+_wakeup = asyncio.Event()
+_workers: list[asyncio.Task] = []
+
+async def enqueue_job(session: AsyncSession, file_id: int) -> IngestionJob:
+    job = IngestionJob(file_id=file_id)
+    session.add(job)
+    await session.flush()
+    return job
+
+def notify_workers() -> None:
+    # acorda os workers sem esperar o próximo poll
+    _wakeup.set()
+
+async def _claim_job() -> tuple[int, int, int] | None:
+    params = {"timeout": settings.ingest_heartbeat_timeout_s, "max_attempts": settings.ingest_max_attempts}
+    async with SessionLocal() as session:
+        await session.execute(text(EXHAUSTED_SQL), params)
+        row = (await session.execute(text(CLAIM_SQL), params)).first()
+        await session.commit()
+    return (row.id, row.file_id, row.attempts) if row else None
+
+async def _update_job(job_id: int, **values) -> None:
+    # sessão própria: o progresso fica visível antes do commit da ingestão
+    async with SessionLocal() as session:
+        await session.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(**values))
+        await session.commit()
+
+async def _heartbeat(job_id: int) -> None:
+    # mantém o job como "vivo" durante etapas longas (um embed grande não passa pelo progresso)
+    while True:
+        await asyncio.sleep(settings.ingest_heartbeat_s)
+        try:
+            await _update_job(job_id, heartbeat_at=func.now())
+        except Exception:
+            logger.warning("Job %s: falha ao gravar heartbeat", job_id, exc_info=True)
+
+def _is_transient(e: BaseException) -> bool:
+    """Erro que pode passar numa nova tentativa (rede, banco, rate limit, 5xx).
+
+    O resto (PDF corrompido ou criptografado, 4xx do provedor, configuração) falharia
+    igual: repetir só refaz o parse e os embeddings.
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in RETRY_STATUS
+    if isinstance(e, (httpx.TransportError, ConnectionError, TimeoutError, BrokenProcessPool)):
+        return True
+    if isinstance(e, DBAPIError):
+        if e.connection_invalidated or isinstance(e, (OperationalError, InterfaceError)):
+            return True
+        sqlstate = getattr(e.orig, "sqlstate", None) or ""
+        return sqlstate.startswith(TRANSIENT_SQLSTATES)
+    return False
+
+async def run_job(job_id: int, file_id: int, attempts: int = 1) -> None:
+    async def progress(**counts) -> None:
+        await _update_job(job_id, heartbeat_at=func.now(), **counts)
+
+    heartbeat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        async with SessionLocal() as session:
+            f = await session.get(File, file_id)
+            if f is None:
+                raise ValueError(f"Arquivo {file_id} não encontrado.")
+            await process_file(session, f, progress)
+    except Exception as e:
+        logger.exception("Job de ingestão %s falhou (tentativa %s)", job_id, attempts)
+        error = f"{type(e).__name__}: {e}"
+        if _is_transient(e) and attempts < settings.ingest_max_attempts:
+            # volta para a fila, mantendo o erro para diagnóstico
+            await _update_job(job_id, status="queued", error=error, heartbeat_at=None)
+            notify_workers()
+        else:
+            await _update_job(job_id, status="failed", error=error, finished_at=func.now())
+    else:
+        await _update_job(job_id, status="done", error=None, finished_at=func.now())
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+
+async def _worker(n: int) -> None:
+    while True:
+        _wakeup.clear()
+        try:
+            claimed = await _claim_job()
+        except Exception:
+            logger.exception("Worker %s: falha ao buscar job", n)
+            claimed = None
+        if claimed is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.ingest_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await run_job(*claimed)
+
+def start_workers(n: int | None = None) -> None:
+    n = settings.ingest_workers if n is None else n
+    for i in range(n):
+        _workers.append(asyncio.create_task(_worker(i), name=f"ingest-worker-{i}"))
+
+async def stop_workers() -> None:
+    for t in _workers:
+        t.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
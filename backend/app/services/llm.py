@@ -0,0 +1,103 @@
+import asyncio
+import json
+import httpx
+from typing import AsyncIterator
+from app.core.config import settings
+
+class LLM:
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+class OpenAILLM(LLM):
+    # Qualquer servidor compatível com /chat/completions (OpenAI, vLLM, Ollama, stand-in de teste)
+    def __init__(self, api_key: str, model: str, base_url: str = "https://api.openai.com/v1", max_connections: int = 16):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # cliente único: conexões reaproveitadas entre respostas
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(120, connect=10),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+        }
+        async with self.client.stream("POST", "/chat/completions", json=payload) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class LocalLLM(LLM):
+    """Stand-in local (sem rede): devolve o contexto recebido, palavra por palavra."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        _, _, context = prompt.partition("CONTEXTO:\n")
+        context, _, _ = context.partition("\n\nRESPOSTA:")
+        text = "Trechos mais relevantes:\n" + (context.strip() or "nenhum trecho encontrado.")
+        for i, word in enumerate(text.split(" ")):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word if i == 0 else " " + word
+
+_llm: LLM | None = None
+
+def _build_llm() -> LLM:
+    if settings.llm_provider == "local":
+        return LocalLLM()
+    if settings.llm_provider != "openai":
+        raise RuntimeError(f"LLM_PROVIDER desconhecido: {settings.llm_provider}")
+    if not settings.openai_api_key:
+        raise RuntimeError("OPENAI_API_KEY não configurada")
+    return OpenAILLM(
+        settings.openai_api_key,
+        settings.openai_model,
+        base_url=settings.llm_base_url or settings.openai_base_url,
+        max_connections=settings.llm_max_connections,
+    )
+
+def get_llm() -> LLM:
+    global _llm
+    if _llm is None:
+        _llm = _build_llm()
+    return _llm
+
+async def close_llm() -> None:
+    global _llm
+    if _llm is not None:
+        await _llm.aclose()
+        _llm = None
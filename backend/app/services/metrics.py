@@ -0,0 +1,102 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Etapas: extração do PDF, chunking, embedding, consultas ao banco, hidratação de linhas...
+# Cada etapa vai para o histograma e, dentro de uma requisição, para o header Server-Timing.
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Duração por etapa do pipeline", ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+REQUEST_SECONDS = Histogram(
+    "rag_http_request_seconds", "Duração das requisições HTTP (até o início da resposta)",
+    ["method", "route", "status"],
+)
+EMBED_BATCH_INPUTS = Histogram(
+    "rag_embedding_batch_inputs", "Textos por chamada ao provedor de embeddings", ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+EMBED_BATCH_TOKENS = Histogram(
+    "rag_embedding_batch_tokens", "Tokens por chamada ao provedor de embeddings", ["model"],
+    buckets=(16, 64, 256, 1024, 4096, 16384, 65536, 262144),
+)
+EMBED_RETRIES = Counter("rag_embedding_retries_total", "Novas tentativas contra o provedor de embeddings", ["status"])
+
+# (etapa -> [duração acumulada em segundos, ocorrências]) da requisição atual
+_timings: ContextVar[Dict[str, List[float]] | None] = ContextVar("rag_timings", default=None)
+
+def observe(stage: str, seconds: float, server_timing: bool = True) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _timings.get()
+    if server_timing and timings is not None:
+        entry = timings.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+@contextmanager
+def timed(stage: str, server_timing: bool = True) -> Iterator[None]:
+    """Cronometra um bloco (síncrono ou com awaits dentro)."""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - t, server_timing)
+
+def start_request_timings() -> Tuple[Dict[str, List[float]], object]:
+    # o dict é compartilhado: tasks filhas (asyncio.gather) e threads copiam o contexto, não o dict
+    timings: Dict[str, List[float]] = {}
+    return timings, _timings.set(timings)
+
+def reset_request_timings(token) -> None:
+    _timings.reset(token)
+
+def server_timing_header(timings: Dict[str, List[float]], total: float) -> str:
+    parts = [
+        f'{stage};dur={seconds * 1000:.2f}' + (f';desc="x{count}"' if count > 1 else "")
+        for stage, (seconds, count) in timings.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+class _StateCollector:
+    """Métricas lidas na hora do scrape: pool de conexões e caches."""
+
+    def describe(self):
+        # evita que o registro chame collect() na importação (ciclo com os módulos de cache)
+        yield GaugeMetricFamily("rag_db_pool_connections", "Conexões do pool do SQLAlchemy", labels=["pool", "state"])
+        yield CounterMetricFamily("rag_embedding_cache", "Consultas ao cache de embeddings", labels=["result"])
+        yield CounterMetricFamily("rag_query_cache", "Consultas aos caches da busca", labels=["cache", "result"])
+
+    def collect(self):
+        from app.db import pool_stats
+        from app.services import embedding_cache, query_cache
+
+        g = GaugeMetricFamily("rag_db_pool_connections", "Conexões do pool do SQLAlchemy", labels=["pool", "state"])
+        for name, states in pool_stats().items():
+            for state, value in states.items():
+                g.add_metric([name, state], value)
+        yield g
+
+        c = CounterMetricFamily("rag_embedding_cache", "Consultas ao cache de embeddings", labels=["result"])
+        s = embedding_cache.stats
+        c.add_metric(["memory_hit"], s.memory_hits)
+        c.add_metric(["db_hit"], s.db_hits)
+        c.add_metric(["miss"], s.misses)
+        yield c
+
+        q = CounterMetricFamily("rag_query_cache", "Consultas aos caches da busca", labels=["cache", "result"])
+        qs = query_cache.stats
+        q.add_metric(["embedding", "hit"], qs.embedding_hits)
+        q.add_metric(["embedding", "miss"], qs.embedding_misses)
+        q.add_metric(["results", "hit"], qs.result_hits)
+        q.add_metric(["results", "miss"], qs.result_misses)
+        yield q
+
+REGISTRY.register(_StateCollector())
+
+def render() -> Tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List
+from app.core.config import settings
+from app.services.metrics import timed
+
+_executor: ProcessPoolExecutor | None = None
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: o processo do uvicorn tem threads e um event loop ativo, fork não é seguro
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.pdf_workers or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+def shutdown_pdf_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+# As funções abaixo rodam nos processos do pool (precisam ser picklable).
+# O pypdf é importado só nos processos de extração: a API não paga a importação na subida.
+# As faixas recebem o caminho de um arquivo temporário (não os bytes do PDF) e cada
+# processo mantém aberto o último documento: faixas seguidas do mesmo PDF não o reabrem.
+_reader: tuple[str, object] | None = None
+
+def _open(path: str):
+    global _reader
+    if _reader is None or _reader[0] != path:
+        from pypdf import PdfReader
+        _reader = (path, PdfReader(path))
+    return _reader[1]
+
+def _count_pages(path: str) -> int:
+    return len(_open(path).pages)
+
+def _extract_range(path: str, start: int, end: int) -> List[str]:
+    reader = _open(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def _write_temp(data: bytes) -> str:
+    fd, path = tempfile.mkstemp(prefix="rag-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    return path
+
+def extract_file(path: str) -> tuple[str, int, List[str], float]:
+    """Carga em massa: lê o PDF do disco e devolve (sha256, tamanho, textos das páginas, segundos de extração)."""
+    from pypdf import PdfReader
+    with open(path, "rb") as fh:
+        data = fh.read()
+    t = time.perf_counter()
+    reader = PdfReader(io.BytesIO(data))
+    texts = [page.extract_text() or "" for page in reader.pages]
+    return hashlib.sha256(data).hexdigest(), len(data), texts, time.perf_counter() - t
+
+async def iter_pages(data: bytes) -> AsyncIterator[tuple[int, str]]:
+    """Extrai o texto das páginas fora do event loop, em faixas paralelas.
+
+    As faixas são submetidas todas de uma vez ao pool; as páginas são entregues
+    na ordem original (page_no a partir de 1) assim que cada faixa termina.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_pdf_executor()
+    path = await asyncio.to_thread(_write_temp, data)
+    futures = []
+    try:
+        with timed("pdf_parse"):
+            n = await loop.run_in_executor(executor, _count_pages, path)
+        step = max(1, settings.pdf_pages_per_task)
+        futures = [
+            loop.run_in_executor(executor, _extract_range, path, start, min(start + step, n))
+            for start in range(0, n, step)
+        ]
+        page_no = 1
+        for fut in futures:
+            with timed("pdf_parse"):
+                texts = await fut
+            for text in texts:
+                yield page_no, text
+                page_no += 1
+    finally:
+        for fut in futures:
+            fut.cancel()
+        # faixas ainda em execução já abriram o arquivo (o pypdf lê tudo na abertura)
+        os.unlink(path)
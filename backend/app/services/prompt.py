@@ -0,0 +1,13 @@
+from typing import Any, Dict, List
+
+def to_line(h: Dict[str, Any]) -> str:
+    return f"[file:{h['file_id']} pág:{h['page_number']} score:{h['score']}] {h['text']}"
+
+def build_prompt(question: str, hits: List[Dict[str, Any]]) -> str:
+    context = "\n\n".join(to_line(h) for h in hits)
+    return (
+        "Você é um assistente que responde apenas com base no CONTEXTO fornecido.\n"
+        "Responda em português, de forma direta e cite os tópicos-chave.\n"
+        "Se a resposta não estiver no contexto, diga que não sabe.\n\n"
+        f"PERGUNTA:\n{question}\n\nCONTEXTO:\n{context}\n\nRESPOSTA:"
+    )
@@ -0,0 +1,97 @@
+import hashlib
+from array import array
+from dataclasses import dataclass, asdict
+from typing import Any, List
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.services.embedding_cache import normalize_text
+from app.services.lru import LRUCache
+
+# Nível 1: (modelo, texto da pergunta) -> vetor (LRU + TTL)
+# Nível 2: (hash do vetor, geração do corpus, parâmetros da busca) -> hits
+# A geração é incrementada pela ingestão e pela troca de versão do índice;
+# resultados de gerações antigas nunca mais casam.
+
+@dataclass
+class QueryCacheStats:
+    embedding_hits: int = 0
+    embedding_misses: int = 0
+    result_hits: int = 0
+    result_misses: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+stats = QueryCacheStats()
+_embeddings = LRUCache(settings.query_embedding_cache_size, ttl=settings.query_embedding_cache_ttl)
+_results = LRUCache(settings.search_result_cache_size)
+
+# geração = valor de corpus_state (trocas de versão) + contador 'corpus_generation'
+# (um delta por ingestão, consolidado em row_counts como o contador de arquivos)
+STATE_SQL = """
+SELECT s.generation
+         + COALESCE((SELECT r.n FROM row_counts r WHERE r.table_name = 'corpus_generation'), 0)
+         + COALESCE((SELECT sum(d.delta) FROM row_count_deltas d WHERE d.table_name = 'corpus_generation'), 0)
+         AS generation,
+       s.active_version, v.embedding_model,
+       EXISTS (
+         SELECT 1 FROM index_versions o
+         WHERE o.id <> s.active_version
+           AND EXISTS (SELECT 1 FROM chunks c WHERE c.index_version = o.id)
+       ) AS mixed
+FROM corpus_state s
+JOIN index_versions v ON v.id = s.active_version
+WHERE s.id = 1;
+"""
+# FOR SHARE: ingestões concorrentes não se bloqueiam entre si, mas a criação e a
+# troca de versão (FOR UPDATE) esperam as ingestões em curso terminarem
+LOCK_SHARE_SQL = "SELECT active_version FROM corpus_state WHERE id = 1 FOR SHARE;"
+# um delta por transação em vez de UPDATE na linha única: sem hotspot no commit
+BUMP_SQL = "INSERT INTO row_count_deltas (table_name, delta) VALUES ('corpus_generation', 1);"
+
+@dataclass(frozen=True)
+class CorpusState:
+    generation: int
+    # versão do índice que a busca lê e o modelo que embeda as perguntas
+    active_version: int
+    embedding_model: str
+    # há chunks de outra versão no índice: em construção, aposentada ou falha ainda não apagada
+    mixed: bool
+
+async def corpus_state(session: AsyncSession) -> CorpusState:
+    row = (await session.execute(text(STATE_SQL))).one()
+    return CorpusState(int(row.generation), row.active_version, row.embedding_model, row.mixed)
+
+async def bump_generation(session: AsyncSession) -> int:
+    # roda na transação de quem alterou o corpus: a nova geração só aparece junto com os chunks
+    active_version = await session.scalar(text(LOCK_SHARE_SQL))
+    await session.execute(text(BUMP_SQL))
+    return active_version
+
+def get_query_embedding(query: str, model: str) -> List[float] | None:
+    vec = _embeddings.get((model, normalize_text(query)))
+    if vec is None:
+        stats.embedding_misses += 1
+        return None
+    stats.embedding_hits += 1
+    return vec.tolist()
+
+def put_query_embedding(query: str, model: str, vec: List[float]) -> None:
+    _embeddings.put((model, normalize_text(query)), array("f", vec))
+
+def result_key(qvec: List[float] | None, generation: int, **params: Any) -> tuple:
+    # busca só full-text não tem vetor: o texto normalizado vai em params
+    digest = hashlib.sha1(array("f", qvec).tobytes()).hexdigest() if qvec is not None else ""
+    return (digest, generation, tuple(sorted(params.items())))
+
+def get_results(key: tuple) -> Any:
+    value = _results.get(key)
+    if value is None:
+        stats.result_misses += 1
+        return None
+    stats.result_hits += 1
+    return value
+
+def put_results(key: tuple, value: Any) -> None:
+    _results.put(key, value)
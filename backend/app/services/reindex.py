@@ -0,0 +1,258 @@
+import asyncio
+import logging
+from typing import Dict, List
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import SessionLocal
+from app.models import Chunk, File, IndexVersion
+from app.core.config import settings
+from app.services.blobstore import load_content
+from app.services.chunker import TextChunk
+from app.services.ingestion import (
+    PageText, chunk_for_version, index_chunks, load_pages, lock_file, store_pages,
+)
+from app.services.pdf import iter_pages
+
+logger = logging.getLogger(__name__)
+
+# Reindexação sem downtime: a versão nova é construída ao lado da ativa (a busca
+# continua lendo só a ativa), em lotes de arquivos com checkpoint (last_file_id)
+# gravado na mesma transação dos chunks. No fim, active_version troca numa
+# transação e os chunks da versão antiga são apagados em lotes.
+
+# Mesma regra da fila de ingestão: versão sem heartbeat recente (runner morto) volta a ser elegível
+CLAIM_SQL = """
+UPDATE index_versions
+SET heartbeat_at = NOW(), attempts = attempts + 1, error = NULL
+WHERE id = (
+  SELECT v.id
+  FROM index_versions v
+  WHERE v.status = 'building'
+    AND (v.heartbeat_at IS NULL OR v.heartbeat_at < NOW() - make_interval(secs => :timeout))
+    AND v.attempts < :max_attempts
+  FOR UPDATE SKIP LOCKED
+)
+RETURNING id;
+"""
+
+# Arquivos a reindexar: com texto extraído ou com chunks na versão ativa (legado, antes da tabela pages)
+FILES_SQL = """
+SELECT f.id
+FROM files f
+WHERE f.id > :after
+  AND (EXISTS (SELECT 1 FROM pages p WHERE p.file_id = f.id)
+       OR EXISTS (SELECT 1 FROM chunks c WHERE c.index_version = :active AND c.file_id = f.id))
+ORDER BY f.id
+LIMIT :n;
+"""
+
+# Arquivos da versão ativa ainda sem chunks na nova (conferido com corpus_state travada)
+MISSING_SQL = """
+SELECT DISTINCT c.file_id
+FROM chunks c
+WHERE c.index_version = :active
+  AND NOT EXISTS (SELECT 1 FROM chunks n WHERE n.index_version = :version AND n.file_id = c.file_id)
+ORDER BY c.file_id;
+"""
+
+LOCK_STATE_SQL = "SELECT active_version FROM corpus_state WHERE id = 1 FOR UPDATE;"
+
+class ReindexConflict(ValueError):
+    pass
+
+_wakeup = asyncio.Event()
+_runner: asyncio.Task | None = None
+
+async def create_version(
+    session: AsyncSession,
+    embedding_model: str,
+    chunk_max_tokens: int,
+    chunk_overlap_tokens: int,
+) -> IndexVersion:
+    # trava corpus_state: ingestões em curso terminam antes e as seguintes já enxergam a versão nova
+    await session.execute(text(LOCK_STATE_SQL))
+    building = await session.scalar(select(IndexVersion.id).where(IndexVersion.status == "building"))
+    if building is not None:
+        raise ReindexConflict(f"Reindexação {building} ainda em andamento.")
+    v = IndexVersion(
+        embedding_model=embedding_model,
+        chunk_max_tokens=chunk_max_tokens,
+        chunk_overlap_tokens=chunk_overlap_tokens,
+    )
+    session.add(v)
+    await session.flush()
+    return v
+
+def notify_reindexer() -> None:
+    _wakeup.set()
+
+async def _active_version(session: AsyncSession) -> IndexVersion:
+    active_id = await session.scalar(text("SELECT active_version FROM corpus_state WHERE id = 1"))
+    return await session.get(IndexVersion, active_id)
+
+async def _existing_chunks(session: AsyncSession, version_id: int, file_ids: List[int]) -> Dict[int, List[TextChunk]]:
+    # mesmos parâmetros de chunking: reaproveita os textos e só troca o embedding
+    rows = await session.execute(
+        select(Chunk.file_id, Chunk.page_number, Chunk.chunk_index, Chunk.text_cleaned, Chunk.token_count)
+        .where(Chunk.index_version == version_id, Chunk.file_id.in_(file_ids))
+        .order_by(Chunk.file_id, Chunk.page_number, Chunk.chunk_index)
+    )
+    chunks: Dict[int, List[TextChunk]] = {fid: [] for fid in file_ids}
+    for file_id, page_no, idx, txt, n in rows:
+        chunks[file_id].append(TextChunk(page_number=page_no, chunk_index=idx, text=txt, token_count=n))
+    return chunks
+
+async def _pages(session: AsyncSession, file_ids: List[int]) -> Dict[int, List[PageText]]:
+    pages = await load_pages(session, file_ids)
+    for fid in file_ids:
+        if fid in pages:
+            continue
+        # arquivo anterior à tabela pages: extrai uma única vez e guarda
+        f = await session.get(File, fid)
+        extracted = [p async for p in iter_pages(await load_content(session, f))]
+        await store_pages(session, fid, extracted)
+        pages[fid] = extracted
+    return pages
+
+async def _reindex_files(version_id: int, file_ids: List[int], checkpoint: bool = True) -> None:
+    async with SessionLocal() as session:
+        v = await session.get(IndexVersion, version_id)
+        active = await _active_version(session)
+        for fid in file_ids:
+            await lock_file(session, fid)
+        # retomada depois de falha: o lote é refeito do zero
+        await session.execute(delete(Chunk).where(Chunk.file_id.in_(file_ids), Chunk.index_version == v.id))
+
+        if (v.chunk_max_tokens, v.chunk_overlap_tokens) == (active.chunk_max_tokens, active.chunk_overlap_tokens):
+            chunks = await _existing_chunks(session, active.id, file_ids)
+        else:
+            pages = await _pages(session, file_ids)
+            chunks = {fid: chunk_for_version(pages[fid], v) for fid in file_ids}
+        await index_chunks(session, v, chunks)
+
+        # na passada dos faltantes, arquivos até o checkpoint já foram contados na varredura
+        counted = file_ids if checkpoint else [fid for fid in file_ids if fid > v.last_file_id]
+        values = {"files_done": IndexVersion.files_done + len(counted), "heartbeat_at": func.now()}
+        if checkpoint:
+            values["last_file_id"] = max(file_ids)
+        await session.execute(update(IndexVersion).where(IndexVersion.id == v.id).values(**values))
+        await session.commit()
+
+async def _switch(version_id: int) -> List[int]:
+    """Ativa a versão; se ainda faltar algum arquivo, não troca e devolve os ids."""
+    async with SessionLocal() as session:
+        active_id = await session.scalar(text(LOCK_STATE_SQL))
+        missing = list((await session.scalars(text(MISSING_SQL), {"active": active_id, "version": version_id})).all())
+        if missing:
+            await session.rollback()
+            return missing
+        await session.execute(
+            text("UPDATE corpus_state SET active_version = :v, generation = generation + 1 WHERE id = 1"),
+            {"v": version_id},
+        )
+        # agregado da listagem passa a contar os chunks da nova versão
+        await session.execute(
+            text("""
+                UPDATE files f
+                SET chunk_count = (SELECT count(*) FROM chunks c WHERE c.index_version = :v AND c.file_id = f.id)
+                WHERE f.chunk_count IS NOT NULL
+            """),
+            {"v": version_id},
+        )
+        await session.execute(update(IndexVersion).where(IndexVersion.id == active_id).values(status="retired"))
+        await session.execute(
+            update(IndexVersion).where(IndexVersion.id == version_id).values(status="active", finished_at=func.now())
+        )
+        await session.commit()
+    return []
+
+async def drop_inactive_chunks(batch: int = 5000) -> None:
+    # chunks de versões aposentadas e de reindexações que falharam: a busca não os
+    # lê, mas ocupam o índice HNSW. DELETE em lotes curtos: não segura locks nem
+    # gera uma transação gigante
+    async with SessionLocal() as session:
+        inactive = (await session.scalars(
+            select(IndexVersion.id).where(IndexVersion.status.in_(("retired", "failed")))
+        )).all()
+    for version_id in inactive:
+        while True:
+            async with SessionLocal() as session:
+                result = await session.execute(
+                    text("DELETE FROM chunks WHERE id IN (SELECT id FROM chunks WHERE index_version = :v LIMIT :n)"),
+                    {"v": version_id, "n": batch},
+                )
+                await session.commit()
+            if result.rowcount == 0:
+                break
+
+async def run_reindex(version_id: int) -> None:
+    try:
+        while True:
+            async with SessionLocal() as session:
+                v = await session.get(IndexVersion, version_id)
+                active = await _active_version(session)
+                batch = list((await session.scalars(
+                    text(FILES_SQL),
+                    {"after": v.last_file_id, "active": active.id, "n": settings.reindex_batch_files},
+                )).all())
+            if batch:
+                await _reindex_files(version_id, batch)
+                continue
+            # fim da varredura: troca (ou reindexa o que a ingestão gravou só na versão antiga)
+            missing = await _switch(version_id)
+            if not missing:
+                break
+            for i in range(0, len(missing), settings.reindex_batch_files):
+                await _reindex_files(version_id, missing[i:i + settings.reindex_batch_files], checkpoint=False)
+    except Exception as e:
+        logger.exception("Reindexação %s falhou", version_id)
+        async with SessionLocal() as session:
+            await session.execute(
+                update(IndexVersion)
+                .where(IndexVersion.id == version_id)
+                .values(status="failed", error=str(e), finished_at=func.now())
+            )
+            await session.commit()
+    await drop_inactive_chunks()
+
+async def _claim_version() -> int | None:
+    async with SessionLocal() as session:
+        version_id = await session.scalar(
+            text(CLAIM_SQL),
+            {"timeout": settings.ingest_job_timeout_s, "max_attempts": settings.ingest_max_attempts},
+        )
+        await session.commit()
+    return version_id
+
+async def _reindexer() -> None:
+    # sobras de uma troca (ou falha) interrompida antes da limpeza
+    try:
+        await drop_inactive_chunks()
+    except Exception:
+        logger.exception("Falha ao apagar chunks de versões inativas")
+    while True:
+        _wakeup.clear()
+        try:
+            version_id = await _claim_version()
+        except Exception:
+            logger.exception("Reindexação: falha ao buscar versão pendente")
+            version_id = None
+        if version_id is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.ingest_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await run_reindex(version_id)
+
+def start_reindexer() -> None:
+    global _runner
+    if _runner is None:
+        _runner = asyncio.create_task(_reindexer(), name="reindexer")
+
+async def stop_reindexer() -> None:
+    global _runner
+    if _runner is not None:
+        _runner.cancel()
+        await asyncio.gather(_runner, return_exceptions=True)
+        _runner = None
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import SessionLocal
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Total = valor consolidado + deltas ainda não consolidados (inseridos pelos triggers)
+COUNT_SQL = """
+SELECT r.n + COALESCE((SELECT sum(d.delta) FROM row_count_deltas d WHERE d.table_name = r.table_name), 0)
+FROM row_counts r
+WHERE r.table_name = :table
+"""
+
+# Um statement só: cada delta apagado entra na soma exatamente uma vez, mesmo com
+# dois processos consolidando ao mesmo tempo; deltas de transações abertas ficam para depois
+COMPACT_SQL = """
+WITH d AS (DELETE FROM row_count_deltas RETURNING table_name, delta)
+UPDATE row_counts r SET n = r.n + s.total
+FROM (SELECT table_name, sum(delta) AS total FROM d GROUP BY table_name) s
+WHERE r.table_name = s.table_name
+"""
+
+async def row_count(session: AsyncSession, table: str) -> int:
+    return int(await session.scalar(text(COUNT_SQL), {"table": table}) or 0)
+
+async def compact() -> None:
+    async with SessionLocal() as session:
+        await session.execute(text(COMPACT_SQL))
+        await session.commit()
+
+_task: asyncio.Task | None = None
+
+async def _compactor() -> None:
+    while True:
+        try:
+            await compact()
+        except Exception:
+            logger.exception("Falha ao consolidar row_count_deltas")
+        await asyncio.sleep(settings.row_counts_compact_s)
+
+def start_compactor() -> None:
+    global _task
+    _task = asyncio.create_task(_compactor(), name="row-counts-compactor")
+
+async def stop_compactor() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
@@ -1,9 +1,30 @@
+import asyncio
+import json
+from dataclasses import dataclass, field, replace
+from datetime import datetime
 from typing import List, Dict, Any
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.embedder import get_embedder
+from app.db import ReadSessionLocal
+from app.core.config import settings
+from app.services.embedding_cache import embed_cached, normalize_text
+from app.services import query_cache, vector_index
+from app.services.metrics import timed
 
+SEARCH_MODES = ("vector", "text", "hybrid")
+
+# Planos da busca vetorial:
+#   hnsw            sem filtros, índice HNSW direto
+#   hnsw_iterative  filtro pouco seletivo: HNSW com iterative scan (pgvector >= 0.8)
+#   exact           filtro seletivo: varredura exata só das linhas filtradas
+# Com VECTOR_INDEX=halfvec|binary os planos hnsw* usam o índice quantizado e reordenam
+# RERANK_CANDIDATES candidatos pela distância completa.
+PLANS = ("hnsw", "hnsw_iterative", "exact")
+
+# {op}: operador da métrica (EMBEDDING_METRIC): <-> l2, <=> cosine, <#> ip (produto interno negativo)
+# embedding IS NOT NULL: vetores de outra dimensão viram NULL na troca de EMBEDDING_DIM
+# (vector_index.schema_sql) e ficam fora da busca vetorial até a reindexação
 SQL = """
 SELECT
   c.id           AS chunk_id,
@@ -11,36 +32,454 @@ SELECT
   c.page_number  AS page_number,
   c.chunk_index  AS chunk_index,
   c.text_cleaned AS content,
-  (c.embedding <-> (:qvec)::float4[]::vector) AS l2_dist
+  (c.embedding {op} (:qvec)::float4[]::vector) AS dist
+FROM chunks c
+WHERE c.embedding IS NOT NULL {where}
+ORDER BY c.embedding {op} (:qvec)::float4[]::vector
+LIMIT :k;
+"""
+
+# Busca em duas fases: candidatos pelo índice (quantizado ou com iterative scan,
+# que devolve ordem aproximada) e ordenação final pela distância exata do vetor completo
+RERANK_SQL = """
+WITH candidates AS MATERIALIZED (
+  SELECT
+    c.id           AS chunk_id,
+    c.file_id      AS file_id,
+    c.page_number  AS page_number,
+    c.chunk_index  AS chunk_index,
+    c.text_cleaned AS content,
+    c.embedding    AS embedding
+  FROM chunks c
+  WHERE c.embedding IS NOT NULL {where}
+  ORDER BY {order_by}
+  LIMIT :candidates
+)
+SELECT
+  chunk_id, file_id, page_number, chunk_index, content,
+  (embedding {op} (:qvec)::float4[]::vector) AS dist
+FROM candidates
+ORDER BY dist
+LIMIT :k;
+"""
+
+# "+ 0" impede o planner de usar o HNSW: filtra pelos índices btree e ordena tudo
+EXACT_SQL = """
+SELECT
+  c.id           AS chunk_id,
+  c.file_id      AS file_id,
+  c.page_number  AS page_number,
+  c.chunk_index  AS chunk_index,
+  c.text_cleaned AS content,
+  (c.embedding {op} (:qvec)::float4[]::vector) AS dist
 FROM chunks c
-ORDER BY c.embedding <-> (:qvec)::float4[]::vector
+WHERE c.embedding IS NOT NULL {where}
+ORDER BY (c.embedding {op} (:qvec)::float4[]::vector) + 0
 LIMIT :k;
 """
 
-_embedder = None
-
-async def semantic_search(session: AsyncSession, query: str, k: int = 5) -> List[Dict[str, Any]]:
-    global _embedder
-    if _embedder is None:
-        _embedder = get_embedder()
-
-    # 1) embedding da pergunta (list[float])
-    qvec = (await _embedder.embed([query]))[0]
-
-    # 2) consulta com CAST do parâmetro para vector
-    rows = (
-        await session.execute(text(SQL), {"qvec": qvec, "k": k})
-    ).mappings().all()
-
-    # 3) saída normalizada
-    return [
-        {
-            "chunk_id": r["chunk_id"],
-            "file_id": r["file_id"],
-            "page_number": r["page_number"],
-            "chunk_index": r["chunk_index"],
-            "text": r["content"],
-            "score": float(r["l2_dist"]),
-        }
-        for r in rows
-    ]
+# Várias perguntas num único statement: cada linha de q (vetor como texto, k, posição)
+# roda a busca {inner} via LATERAL, que usa o HNSW com o vetor da própria linha
+BATCH_SQL = """
+SELECT q.ord AS ord, h.*
+FROM unnest(CAST(:qvecs AS text[]), CAST(:ks AS int[])) WITH ORDINALITY AS q(qvec, k, ord)
+CROSS JOIN LATERAL (
+{inner}
+) h
+ORDER BY q.ord, h.dist;
+"""
+
+BATCH_INNER_SQL = """
+  SELECT
+    c.id           AS chunk_id,
+    c.file_id      AS file_id,
+    c.page_number  AS page_number,
+    c.chunk_index  AS chunk_index,
+    c.text_cleaned AS content,
+    (c.embedding {op} q.qvec::vector) AS dist
+  FROM chunks c
+  WHERE c.embedding IS NOT NULL {where}
+  ORDER BY {order_by}
+  LIMIT q.k
+"""
+
+BATCH_RERANK_SQL = """
+  SELECT chunk_id, file_id, page_number, chunk_index, content, (embedding {op} q.qvec::vector) AS dist
+  FROM (
+    SELECT
+      c.id           AS chunk_id,
+      c.file_id      AS file_id,
+      c.page_number  AS page_number,
+      c.chunk_index  AS chunk_index,
+      c.text_cleaned AS content,
+      c.embedding    AS embedding
+    FROM chunks c
+    WHERE c.embedding IS NOT NULL {where}
+    ORDER BY {order_by}
+    LIMIT GREATEST(q.k, :candidates)
+  ) cand
+  ORDER BY dist
+  LIMIT q.k
+"""
+
+TEXT_SQL = """
+SELECT
+  c.id           AS chunk_id,
+  c.file_id      AS file_id,
+  c.page_number  AS page_number,
+  c.chunk_index  AS chunk_index,
+  c.text_cleaned AS content,
+  ts_rank_cd(c.text_tsv, tsq) AS rank
+FROM chunks c, websearch_to_tsquery(CAST(:cfg AS regconfig), :q) AS tsq
+WHERE c.text_tsv @@ tsq {where}
+ORDER BY rank DESC
+LIMIT :k;
+"""
+
+@dataclass(frozen=True)
+class SearchFilters:
+    file_ids: tuple[int, ...] = ()
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+    page_from: int | None = None
+    page_to: int | None = None
+    # versão ativa do índice; preenchida pela busca, não conta como filtro do usuário
+    index_version: int | None = None
+
+    def is_empty(self) -> bool:
+        return not self.file_ids and all(
+            v is None for v in (self.created_from, self.created_to, self.page_from, self.page_to)
+        )
+
+    def _clauses(self, literal: bool) -> tuple[str, Dict[str, Any]]:
+        # literal=True só para o EXPLAIN da estimativa (valores já validados: int e datetime)
+        def ref(name: str, value: Any) -> str:
+            if not literal:
+                return f":{name}"
+            if isinstance(value, datetime):
+                return f"'{value.isoformat()}'::timestamp"
+            if isinstance(value, tuple):
+                return "ARRAY[" + ",".join(str(int(v)) for v in value) + "]::int[]"
+            return str(int(value))
+
+        parts: List[str] = []
+        params: Dict[str, Any] = {}
+        if self.index_version is not None:
+            parts.append(f"c.index_version = {ref('f_index_version', self.index_version)}")
+            params["f_index_version"] = self.index_version
+        if self.file_ids:
+            parts.append(f"c.file_id = ANY({ref('f_file_ids', self.file_ids)})")
+            params["f_file_ids"] = list(self.file_ids)
+        if self.page_from is not None:
+            parts.append(f"c.page_number >= {ref('f_page_from', self.page_from)}")
+            params["f_page_from"] = self.page_from
+        if self.page_to is not None:
+            parts.append(f"c.page_number <= {ref('f_page_to', self.page_to)}")
+            params["f_page_to"] = self.page_to
+        created = []
+        if self.created_from is not None:
+            created.append(f"f.created_at >= {ref('f_created_from', self.created_from)}")
+            params["f_created_from"] = self.created_from
+        if self.created_to is not None:
+            created.append(f"f.created_at <= {ref('f_created_to', self.created_to)}")
+            params["f_created_to"] = self.created_to
+        if created:
+            parts.append(f"c.file_id IN (SELECT f.id FROM files f WHERE {' AND '.join(created)})")
+        return "".join(f" AND {p}" for p in parts), params
+
+    def where(self) -> tuple[str, Dict[str, Any]]:
+        return self._clauses(literal=False)
+
+    def where_literal(self) -> str:
+        return self._clauses(literal=True)[0]
+
+    def cache_params(self) -> tuple:
+        return (
+            self.file_ids, self.created_from, self.created_to, self.page_from, self.page_to, self.index_version,
+        )
+
+NO_FILTERS = SearchFilters()
+
+@dataclass
+class SearchResult:
+    hits: List[Dict[str, Any]]
+    mode: str = "vector"
+    # plano da busca vetorial (None no modo text)
+    plan: str | None = None
+    # status dos caches: {"embedding": "hit" | "miss", "results": "hit" | "miss"}
+    cache: Dict[str, str] = field(default_factory=dict)
+    # vetor da pergunta (None no modo text), reaproveitado pela montagem de contexto
+    qvec: List[float] | None = None
+
+def _hit(r, score: float) -> Dict[str, Any]:
+    return {
+        "chunk_id": r["chunk_id"],
+        "file_id": r["file_id"],
+        "page_number": r["page_number"],
+        "chunk_index": r["chunk_index"],
+        "text": r["content"],
+        "score": score,
+    }
+
+async def estimate_rows(session: AsyncSession, filters: SearchFilters) -> float:
+    # estimativa do planner (sem executar a consulta)
+    plan = await session.scalar(
+        text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM chunks c WHERE TRUE {filters.where_literal()}")
+    )
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]["Plan"]["Plan Rows"])
+
+async def choose_plan(session: AsyncSession, filters: SearchFilters, mixed: bool = False) -> str:
+    # com chunks de outra versão no índice (reindexação em curso, versão aposentada
+    # ou falha ainda não apagada) o filtro de versão descarta candidatos do HNSW e
+    # precisa do iterative scan para não devolver menos que k
+    if filters.is_empty() and not mixed:
+        return "hnsw"
+    if await estimate_rows(session, filters) <= settings.exact_scan_max_rows:
+        return "exact"
+    return "hnsw_iterative"
+
+# pgvector: padrão e teto de hnsw.ef_search
+HNSW_DEFAULT_EF_SEARCH = 40
+HNSW_MAX_EF_SEARCH = 1000
+
+async def _configure_scan(session: AsyncSession, plan: str, ef_search: int | None, rows: int = 0) -> None:
+    """SET LOCAL via set_config: vale só para a transação desta sessão.
+
+    Um scan HNSW sem iterative scan devolve no máximo ef_search linhas; `rows` é
+    quantas a consulta pede (k ou os candidatos do rerank), e o ef_search sobe até
+    ela para o LIMIT não ser cortado em silêncio.
+    """
+    if plan == "exact":
+        return
+    ef_search = ef_search or settings.hnsw_ef_search
+    if rows > (ef_search or HNSW_DEFAULT_EF_SEARCH):
+        ef_search = min(rows, HNSW_MAX_EF_SEARCH)
+    if ef_search:
+        await session.execute(text("SELECT set_config('hnsw.ef_search', :v, true)"), {"v": str(ef_search)})
+    # acima do teto do ef_search só o iterative scan devolve todas as linhas pedidas
+    if plan == "hnsw_iterative" or rows > HNSW_MAX_EF_SEARCH:
+        await session.execute(text("SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true)"))
+        await session.execute(
+            text("SELECT set_config('hnsw.max_scan_tuples', :v, true)"),
+            {"v": str(settings.hnsw_max_scan_tuples)},
+        )
+
+async def _vector_leg(
+    session: AsyncSession,
+    qvec: List[float],
+    k: int,
+    filters: SearchFilters,
+    plan: str,
+    ef_search: int | None,
+) -> List[Dict[str, Any]]:
+    where, params = filters.where()
+    params.update({"qvec": qvec, "k": k})
+    mode = settings.vector_index
+    op = vector_index.operator("full", settings.embedding_metric)
+    # linhas que o scan do índice precisa devolver: k, ou os candidatos do rerank quantizado.
+    # No modo hybrid o k desta perna é max(k, HYBRID_CANDIDATES), com o mesmo teto do ef_search.
+    rows = k
+    if plan == "exact":
+        sql = EXACT_SQL.format(where=where, op=op)
+    elif mode == "full" and plan == "hnsw":
+        sql = SQL.format(where=where, op=op)
+    else:
+        order_by = vector_index.order_by(mode, settings.embedding_dim, settings.embedding_metric)
+        sql = RERANK_SQL.format(where=where, op=op, order_by=order_by)
+        rows = params["candidates"] = max(k, settings.rerank_candidates) if mode != "full" else k
+    await _configure_scan(session, plan, ef_search, rows)
+
+    # consulta com CAST do parâmetro para vector
+    with timed("vector_query"):
+        result = await session.execute(text(sql), params)
+    with timed("hydrate"):
+        return [_hit(r, float(r["dist"])) for r in result.mappings().all()]
+
+async def _text_leg(session: AsyncSession, query: str, k: int, filters: SearchFilters) -> List[Dict[str, Any]]:
+    where, params = filters.where()
+    params.update({"cfg": settings.fts_config, "q": query, "k": k})
+    with timed("text_query"):
+        result = await session.execute(text(TEXT_SQL.format(where=where)), params)
+    with timed("hydrate"):
+        return [_hit(r, float(r["rank"])) for r in result.mappings().all()]
+
+async def _text_leg_own_session(query: str, k: int, filters: SearchFilters) -> List[Dict[str, Any]]:
+    # uma AsyncSession não executa duas consultas ao mesmo tempo
+    async with ReadSessionLocal() as session:
+        return await _text_leg(session, query, k, filters)
+
+def reciprocal_rank_fusion(legs: List[List[Dict[str, Any]]], k: int, rrf_k: int) -> List[Dict[str, Any]]:
+    # score = soma de 1 / (rrf_k + posição) em cada lista onde o chunk aparece
+    fused: Dict[int, Dict[str, Any]] = {}
+    for hits in legs:
+        for rank, h in enumerate(hits, start=1):
+            entry = fused.setdefault(h["chunk_id"], {**h, "score": 0.0})
+            entry["score"] += 1.0 / (rrf_k + rank)
+    return sorted(fused.values(), key=lambda h: h["score"], reverse=True)[:k]
+
+def _result_key(
+    qvec: List[float] | None,
+    generation: int,
+    query: str,
+    k: int,
+    mode: str,
+    vector_k: int | None,
+    text_k: int | None,
+    filters: SearchFilters,
+    ef_search: int | None,
+) -> tuple:
+    params = {
+        "k": k, "mode": mode, "vector_k": vector_k, "text_k": text_k,
+        "filters": filters.cache_params(), "ef_search": ef_search,
+    }
+    if mode != "vector":
+        params["q"] = normalize_text(query)
+    return query_cache.result_key(qvec, generation, **params)
+
+async def semantic_search(
+    session: AsyncSession,
+    query: str,
+    k: int = 5,
+    mode: str = "vector",
+    vector_k: int | None = None,
+    text_k: int | None = None,
+    filters: SearchFilters = NO_FILTERS,
+    ef_search: int | None = None,
+) -> SearchResult:
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Modo de busca inválido: {mode}")
+    if mode == "hybrid":
+        # o padrão (50) já passa do ef_search padrão do pgvector (40): _configure_scan sobe o ef_search
+        vector_k = vector_k or max(k, settings.hybrid_candidates)
+        text_k = text_k or max(k, settings.hybrid_candidates)
+    cache: Dict[str, str] = {}
+    # só a versão ativa do índice é lida; a pergunta é embedada com o modelo dela
+    state = await query_cache.corpus_state(session)
+    filters = replace(filters, index_version=state.active_version)
+
+    # 1) embedding da pergunta (list[float]): cache por texto, cache persistente, provedor
+    qvec = None
+    if mode != "text":
+        qvec = query_cache.get_query_embedding(query, state.embedding_model)
+        cache["embedding"] = "hit" if qvec is not None else "miss"
+        if qvec is None:
+            with timed("query_embed"):
+                qvec = (await embed_cached(session, [query], model=state.embedding_model))[0]
+            query_cache.put_query_embedding(query, state.embedding_model, qvec)
+
+    # 2) resultados já calculados para esta geração do corpus
+    key = _result_key(qvec, state.generation, query, k, mode, vector_k, text_k, filters, ef_search)
+    cached = query_cache.get_results(key)
+    cache["results"] = "hit" if cached is not None else "miss"
+    if cached is not None:
+        hits, plan = cached
+        return SearchResult(hits=hits, mode=mode, plan=plan, cache=cache, qvec=qvec)
+
+    # 3) consulta: HNSW, full-text ou as duas em paralelo + RRF
+    with timed("plan"):
+        plan = await choose_plan(session, filters, state.mixed) if mode != "text" else None
+    if mode == "vector":
+        hits = await _vector_leg(session, qvec, vector_k or k, filters, plan, ef_search)
+    elif mode == "text":
+        hits = await _text_leg(session, query, text_k or k, filters)
+    else:
+        vector_hits, text_hits = await asyncio.gather(
+            _vector_leg(session, qvec, vector_k, filters, plan, ef_search),
+            _text_leg_own_session(query, text_k, filters),
+        )
+        with timed("fusion"):
+            hits = reciprocal_rank_fusion([vector_hits, text_hits], k, settings.rrf_k)
+    hits = hits[:k]
+
+    query_cache.put_results(key, (hits, plan))
+    return SearchResult(hits=hits, mode=mode, plan=plan, cache=cache, qvec=qvec)
+
+@dataclass
+class BatchQuery:
+    query: str
+    k: int = 5
+    filters: SearchFilters = NO_FILTERS
+
+def _vector_literal(vec: List[float]) -> str:
+    return "[" + ",".join(map(str, vec)) + "]"
+
+def _batch_sql(plan: str, where: str) -> str:
+    mode = settings.vector_index
+    metric = settings.embedding_metric
+    op = vector_index.operator("full", metric)
+    if plan == "exact":
+        inner = BATCH_INNER_SQL.format(op=op, where=where, order_by=f"(c.embedding {op} q.qvec::vector) + 0")
+    elif mode == "full" and plan == "hnsw":
+        inner = BATCH_INNER_SQL.format(op=op, where=where, order_by=f"c.embedding {op} q.qvec::vector")
+    else:
+        order_by = vector_index.order_by(mode, settings.embedding_dim, metric, vec="q.qvec::vector")
+        inner = BATCH_RERANK_SQL.format(op=op, where=where, order_by=order_by)
+    return BATCH_SQL.format(inner=inner)
+
+async def batch_search(
+    session: AsyncSession,
+    queries: List[BatchQuery],
+    ef_search: int | None = None,
+) -> List[SearchResult]:
+    """Busca vetorial de várias perguntas: um embed em lote e um statement por conjunto de filtros."""
+    results: List[SearchResult | None] = [None] * len(queries)
+    caches: List[Dict[str, str]] = [{} for _ in queries]
+    state = await query_cache.corpus_state(session)
+    model = state.embedding_model
+
+    # 1) embeddings: cache por texto; o resto numa única chamada ao embedder
+    qvecs: List[List[float] | None] = []
+    for i, bq in enumerate(queries):
+        qvec = query_cache.get_query_embedding(bq.query, model)
+        caches[i]["embedding"] = "hit" if qvec is not None else "miss"
+        qvecs.append(qvec)
+    missing = [i for i, v in enumerate(qvecs) if v is None]
+    if missing:
+        with timed("query_embed"):
+            vecs = await embed_cached(session, [queries[i].query for i in missing], model=model)
+        for i, vec in zip(missing, vecs):
+            qvecs[i] = vec
+            query_cache.put_query_embedding(queries[i].query, model, vec)
+
+    # 2) cache de resultados; o que falta é agrupado por filtros
+    keys: List[tuple] = []
+    groups: Dict[SearchFilters, List[int]] = {}
+    for i, bq in enumerate(queries):
+        filters = replace(bq.filters, index_version=state.active_version)
+        key = _result_key(qvecs[i], state.generation, bq.query, bq.k, "vector", None, None, filters, ef_search)
+        keys.append(key)
+        cached = query_cache.get_results(key)
+        caches[i]["results"] = "hit" if cached is not None else "miss"
+        if cached is not None:
+            hits, plan = cached
+            results[i] = SearchResult(hits=hits, mode="vector", plan=plan, cache=caches[i])
+        else:
+            groups.setdefault(filters, []).append(i)
+
+    # 3) um statement (unnest + LATERAL) por grupo; sem filtros é uma ida só ao banco.
+    # Grupos com iterative scan por último: o set_config vale até o fim da transação.
+    planned = [(await choose_plan(session, filters, state.mixed), filters, idxs) for filters, idxs in groups.items()]
+    planned.sort(key=lambda p: p[0] == "hnsw_iterative")
+    for plan, filters, idxs in planned:
+        where, params = filters.where()
+        params.update({
+            "qvecs": [_vector_literal(qvecs[i]) for i in idxs],
+            "ks": [queries[i].k for i in idxs],
+            "candidates": settings.rerank_candidates if settings.vector_index != "full" else 0,
+        })
+        # cada LATERAL é um scan HNSW: ef_search cobre o maior LIMIT do grupo (k ou candidatos)
+        await _configure_scan(session, plan, ef_search, max(params["ks"] + [params["candidates"]]))
+        with timed("vector_query"):
+            result = await session.execute(text(_batch_sql(plan, where)), params)
+        hits_by_ord: Dict[int, List[Dict[str, Any]]] = {n: [] for n in range(1, len(idxs) + 1)}
+        with timed("hydrate"):
+            for r in result.mappings().all():
+                hits_by_ord[r["ord"]].append(_hit(r, float(r["dist"])))
+        for n, i in enumerate(idxs, start=1):
+            hits = hits_by_ord[n]
+            query_cache.put_results(keys[i], (hits, plan))
+            results[i] = SearchResult(hits=hits, mode="vector", plan=plan, cache=caches[i])
+
+    return results
@@ -0,0 +1,75 @@
+import logging
+from functools import lru_cache
+from typing import List
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def estimate_tokens(text: str) -> int:
+    # aproximação barata (~4 caracteres por token), usada quando não há tokenizer real
+    return len(text) // 4 + 1
+
+class Tokenizer:
+    """Fallback sem dependências: contagem estimada por caracteres."""
+
+    name = "estimate"
+
+    def count(self, text: str) -> int:
+        return estimate_tokens(text)
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        # corta um texto longo demais em pedaços de até max_tokens (em tempo linear);
+        # estimate_tokens soma 1, então o pedaço tem no máximo 4 * max_tokens - 1 caracteres
+        step = max(1, max_tokens * 4 - 1)
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+class TiktokenTokenizer(Tokenizer):
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = encoding.name
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def _decode(self, ids: List[int]) -> str | None:
+        # None quando a fatia corta um caractere multibyte (acentos viram U+FFFD no decode comum)
+        try:
+            return self.encoding.decode_bytes(ids).decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        # fatias de até max_tokens que terminam numa fronteira de caractere e que,
+        # recontadas (o BPE do pedaço pode diferir do da fatia), continuam no limite
+        ids = self.encoding.encode_ordinary(text)
+        pieces: List[str] = []
+        start = 0
+        while start < len(ids):
+            end = min(start + max_tokens, len(ids))
+            while end > start + 1:
+                piece = self._decode(ids[start:end])
+                if piece is not None and self.count(piece) <= max_tokens:
+                    break
+                end -= 1
+            # caractere que sozinho passa de max_tokens tokens: vai inteiro
+            while end < len(ids) and self._decode(ids[start:end]) is None:
+                end += 1
+            pieces.append(self.encoding.decode(ids[start:end]))
+            start = end
+        return pieces
+
+@lru_cache(maxsize=1)
+def get_tokenizer() -> Tokenizer:
+    """Tokenizer do processo, carregado uma vez (o lifespan chama na subida)."""
+    if not settings.tokenizer_encoding:
+        return Tokenizer()
+    try:
+        import tiktoken
+        return TiktokenTokenizer(tiktoken.get_encoding(settings.tokenizer_encoding))
+    except Exception:
+        # sem o pacote ou sem acesso ao arquivo da codificação (ambiente isolado)
+        logger.warning("Tokenizer %s indisponível; usando estimativa por caracteres", settings.tokenizer_encoding)
+        return Tokenizer()
+
+def count_tokens(text: str) -> int:
+    return get_tokenizer().count(text)
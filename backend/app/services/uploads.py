@@ -0,0 +1,58 @@
+import hashlib
+import io
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO
+from fastapi import UploadFile
+from app.core.config import settings
+
+class UploadTooLarge(ValueError):
+    pass
+
+@dataclass
+class HashedUpload:
+    file: BinaryIO
+    sha256: str
+    size: int
+
+async def hash_upload(upload: UploadFile, max_bytes: int) -> HashedUpload:
+    """Lê o upload em blocos calculando sha256 e tamanho, sem materializar o arquivo.
+
+    upload.file já é um SpooledTemporaryFile (memória até 1MB, depois disco);
+    ao final ele volta ao início para ser copiado para o armazenamento.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := await upload.read(settings.upload_chunk_bytes):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"Arquivo acima de {settings.max_upload_mb}MB.")
+        digest.update(chunk)
+    await upload.seek(0)
+    return HashedUpload(file=upload.file, sha256=digest.hexdigest(), size=size)
+
+async def spool_upload(upload: UploadFile, max_bytes: int) -> HashedUpload:
+    """Como hash_upload, mas copia o conteúdo para um arquivo temporário próprio.
+
+    Para quem usa o arquivo depois de devolver a resposta (upload em lote com
+    streaming): o formulário multipart pode ser fechado antes disso. Quem chama
+    fecha `file` ao terminar.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.upload_chunk_bytes)
+    try:
+        while chunk := await upload.read(settings.upload_chunk_bytes):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Arquivo acima de {settings.max_upload_mb}MB.")
+            digest.update(chunk)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return HashedUpload(file=spool, sha256=digest.hexdigest(), size=size)
+
+def hash_bytes(data: bytes) -> HashedUpload:
+    return HashedUpload(file=io.BytesIO(data), sha256=hashlib.sha256(data).hexdigest(), size=len(data))
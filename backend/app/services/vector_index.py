@@ -0,0 +1,76 @@
+# Expressões SQL do índice vetorial conforme o modo de armazenamento (VECTOR_INDEX):
+#   full     HNSW sobre embedding (vector, float4)
+#   halfvec  HNSW sobre embedding::halfvec (float2, metade da memória)
+#   binary   HNSW sobre binary_quantize(embedding)::bit (1 bit por dimensão, 32x menor)
+# Nos modos quantizados o índice só escolhe candidatos; a ordem final usa o vetor completo.
+# A métrica (EMBEDDING_METRIC: l2, cosine, ip) define operador e opclass.
+# Usado pela busca e pelas revisões do Alembic, para que índice e consulta casem sempre.
+
+VECTOR_INDEX_MODES = ("full", "halfvec", "binary")
+METRICS = ("l2", "cosine", "ip")
+
+INDEX_NAMES = {
+    "full": "idx_chunks_emb_hnsw",
+    "halfvec": "idx_chunks_emb_halfvec",
+    "binary": "idx_chunks_emb_bit",
+}
+
+QUERY_VECTOR = "(:qvec)::float4[]::vector"
+
+_OPERATORS = {"l2": "<->", "cosine": "<=>", "ip": "<#>"}
+
+def index_expr(mode: str, dim: int, column: str = "embedding") -> str:
+    if mode == "halfvec":
+        return f"({column}::halfvec({dim}))"
+    if mode == "binary":
+        return f"(binary_quantize({column})::bit({dim}))"
+    return column
+
+def query_expr(mode: str, dim: int, vec: str = QUERY_VECTOR) -> str:
+    if mode == "halfvec":
+        return f"{vec}::halfvec({dim})"
+    if mode == "binary":
+        return f"binary_quantize({vec})::bit({dim})"
+    return vec
+
+def operator(mode: str, metric: str = "l2") -> str:
+    # o sinal de cada dimensão não depende da métrica: bits sempre por Hamming
+    if mode == "binary":
+        return "<~>"
+    return _OPERATORS[metric]
+
+def opclass(mode: str, metric: str = "l2") -> str:
+    if mode == "binary":
+        return "bit_hamming_ops"
+    prefix = "halfvec" if mode == "halfvec" else "vector"
+    return f"{prefix}_{metric}_ops"
+
+def order_by(mode: str, dim: int, metric: str = "l2", alias: str = "c", vec: str = QUERY_VECTOR) -> str:
+    # precisa ser idêntica à expressão do índice para o planner usar o HNSW
+    return f"{index_expr(mode, dim, f'{alias}.embedding')} {operator(mode, metric)} {query_expr(mode, dim, vec)}"
+
+def create_index_sql(mode: str, dim: int, metric: str = "l2") -> str:
+    return (
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAMES[mode]} "
+        f"ON chunks USING hnsw ({index_expr(mode, dim)} {opclass(mode, metric)});"
+    )
+
+def drop_index_sql(mode: str) -> str:
+    return f"DROP INDEX IF EXISTS {INDEX_NAMES[mode]};"
+
+def schema_sql(dim: int, metric: str, mode: str) -> list[str]:
+    """DDL que deixa chunks.embedding e o índice HNSW de acordo com as configurações.
+
+    Vetores com outra dimensão não são convertíveis: viram NULL e precisam ser
+    gerados de novo (reindexação).
+    """
+    if metric not in METRICS:
+        raise ValueError(f"EMBEDDING_METRIC inválida: {metric}")
+    if mode not in VECTOR_INDEX_MODES:
+        raise ValueError(f"VECTOR_INDEX inválido: {mode}")
+    return [
+        *(drop_index_sql(m) for m in VECTOR_INDEX_MODES),
+        f"UPDATE chunks SET embedding = NULL WHERE vector_dims(embedding) <> {int(dim)};",
+        f"ALTER TABLE chunks ALTER COLUMN embedding TYPE vector({int(dim)}) USING embedding::vector({int(dim)});",
+        create_index_sql(mode, int(dim), metric),
+    ]
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.core.config import settings
+from app.db import ReadSessionLocal, engine, read_engine
+from app.services import vector_index
+from app.services.embedder import get_embedder
+from app.services.llm import get_llm
+from app.services.search import semantic_search
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class WarmupState:
+    ready: bool = False
+    # etapa -> segundos (ou a mensagem de erro, nas etapas que falharam)
+    steps: Dict[str, float | str] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {"status": "ready" if self.ready else "warming", "steps": dict(self.steps)}
+
+state = WarmupState()
+
+async def _fill_pool(eng: AsyncEngine, n: int) -> None:
+    # conexões abertas ao mesmo tempo: cada uma é um connect distinto que volta para o pool
+    async def one() -> None:
+        async with eng.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    await asyncio.gather(*(one() for _ in range(n)))
+
+async def warm_pools() -> None:
+    await _fill_pool(engine, settings.db_pool_size)
+    await _fill_pool(read_engine, settings.db_read_pool_size)
+
+async def prewarm_index() -> None:
+    # carrega o índice vetorial no shared_buffers de quem atende a busca (réplica, se houver);
+    # requer CREATE EXTENSION pg_prewarm
+    index = vector_index.INDEX_NAMES[settings.vector_index]
+    async with read_engine.connect() as conn:
+        await conn.execute(text("SELECT pg_prewarm(:idx)"), {"idx": index})
+
+async def warm_search() -> None:
+    # de ponta a ponta: cliente HTTP do embedder, planos das consultas e páginas do índice
+    get_embedder()
+    get_llm()
+    async with ReadSessionLocal() as session:
+        await semantic_search(session, settings.warmup_query, k=5, mode="hybrid")
+
+async def _step(name: str, fn, required: bool = False) -> None:
+    delay = 1.0
+    while True:
+        t = time.perf_counter()
+        try:
+            await fn()
+            state.steps[name] = round(time.perf_counter() - t, 3)
+            return
+        except Exception as e:
+            state.steps[name] = f"{type(e).__name__}: {e}"
+            if not required:
+                logger.warning("Aquecimento: etapa %s falhou: %s", name, e)
+                return
+            # sem banco não há o que servir: /ready segue 503 até conectar
+            logger.warning("Aquecimento: etapa %s falhou, tentando de novo em %.0fs: %s", name, delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+async def run_warmup() -> None:
+    """Pools, índice vetorial (opcional) e uma busca de aquecimento; marca o serviço como pronto no fim.
+
+    Só a conexão com o banco é obrigatória; as demais etapas são de melhor esforço.
+    """
+    await _step("db_pools", warm_pools, required=True)
+    if settings.warmup_prewarm_index:
+        await _step("pg_prewarm", prewarm_index)
+    await _step("search", warm_search)
+    state.ready = True
+    logger.info("Aquecimento concluído: %s", state.steps)
+
+_task: asyncio.Task | None = None
+
+def start_warmup() -> None:
+    global _task
+    if not settings.warmup_enabled:
+        state.ready = True
+        return
+    _task = asyncio.create_task(run_warmup(), name="warmup")
+
+async def stop_warmup() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
@@ -0,0 +1,61 @@
+import asyncio
+from app.services.chunker import chunk_pages, chunk_text, iter_units
+from app.services.tokenizer import Tokenizer
+
+TOK = Tokenizer()
+SENTENCES = [f"Frase número {i} com algumas palavras de recheio." for i in range(40)]
+TEXT = " ".join(SENTENCES)
+
+def _chunks(text, max_tokens, overlap_tokens):
+    return list(chunk_text(text, max_tokens, overlap_tokens, tokenizer=TOK))
+
+def test_iter_units_splits_sentences_and_paragraphs():
+    text = "Primeira frase. Segunda   frase!\n\nOutro parágrafo sem ponto\nna mesma linha"
+    assert list(iter_units(text)) == [
+        "Primeira frase.", "Segunda frase!", "Outro parágrafo sem ponto na mesma linha",
+    ]
+
+def test_chunks_respect_max_tokens_and_report_real_counts():
+    for text, n in _chunks(TEXT, 40, 10):
+        assert n == TOK.count(text)
+        assert n <= 40
+
+def test_without_overlap_every_sentence_appears_once_in_order():
+    chunks = _chunks(TEXT, 40, 0)
+    assert len(chunks) > 1
+    units = [u for text, _ in chunks for u in iter_units(text)]
+    assert units == SENTENCES
+
+def test_overlap_repeats_the_tail_of_the_previous_chunk():
+    chunks = _chunks(TEXT, 40, 15)
+    for (prev, _), (cur, _) in zip(chunks, chunks[1:]):
+        prev_units, cur_units = list(iter_units(prev)), list(iter_units(cur))
+        shared = [u for u in cur_units if u in prev_units]
+        assert shared, "chunk seguinte deveria abrir com a cauda do anterior"
+        assert prev_units[-len(shared):] == shared == cur_units[:len(shared)]
+        assert sum(TOK.count(u) for u in shared) <= 15
+    # todas as sentenças continuam cobertas
+    covered = {u for text, _ in chunks for u in iter_units(text)}
+    assert covered == set(SENTENCES)
+
+def test_sentence_longer_than_limit_is_split_by_tokens():
+    long_sentence = "palavra" * 100
+    chunks = _chunks(long_sentence, 20, 0)
+    assert len(chunks) > 1
+    assert all(n <= 20 for _, n in chunks)
+    assert "".join(text for text, _ in chunks) == long_sentence
+
+def test_empty_text_yields_nothing():
+    assert _chunks("   \n\n  ", 40, 10) == []
+
+def test_chunk_pages_numbers_chunks_per_page():
+    async def pages():
+        yield 1, TEXT
+        yield 2, "Uma frase curta."
+
+    async def run():
+        return [c async for c in chunk_pages(pages(), 40, 0)]
+
+    chunks = asyncio.run(run())
+    assert [c.chunk_index for c in chunks if c.page_number == 1] == list(range(sum(c.page_number == 1 for c in chunks)))
+    assert [(c.page_number, c.chunk_index, c.text) for c in chunks if c.page_number == 2] == [(2, 0, "Uma frase curta.")]
@@ -0,0 +1,84 @@
+import asyncio
+import numpy as np
+from app.services import context
+from app.services.context import MIN_TRUNCATED_TOKENS, Span, merge_hits, mmr, mmr_spans, overlap, pack
+from app.services.tokenizer import count_tokens
+
+def _hit(chunk_id, chunk_index, text, score=1.0, file_id=1, page=1):
+    return {
+        "chunk_id": chunk_id, "file_id": file_id, "page_number": page,
+        "chunk_index": chunk_index, "text": text, "score": score,
+    }
+
+def _span(text, rank=0):
+    return Span(file_id=1, page_number=1, chunk_start=rank, chunk_end=rank, text=text, score=1.0, rank=rank)
+
+def test_overlap_ignores_short_coincidences():
+    assert overlap("abc def ghijklmno", "ghijklmno pqr") == len("ghijklmno")
+    assert overlap("fim da frase", "frase nova") == 0
+
+def test_merge_hits_joins_consecutive_chunks_without_repeating_overlap():
+    hits = [
+        _hit(11, 1, "continua o texto do primeiro. Depois mais."),
+        _hit(10, 0, "Início do documento e continua o texto do primeiro."),
+        _hit(20, 0, "Outra página.", page=2),
+    ]
+    spans = merge_hits(hits)
+    assert len(spans) == 2
+    first = spans[0]
+    assert (first.chunk_start, first.chunk_end, first.chunk_ids) == (0, 1, [10, 11])
+    assert first.text == "Início do documento e continua o texto do primeiro. Depois mais."
+    # score e posição do melhor hit do span
+    assert first.rank == 0 and spans[1].rank == 2
+
+def test_merge_hits_keeps_gaps_apart():
+    spans = merge_hits([_hit(1, 0, "a"), _hit(3, 2, "c")])
+    assert [s.chunk_ids for s in spans] == [[1], [3]]
+
+def test_pack_fits_budget_and_counts_dropped():
+    spans = [_span("palavra " * 20, 0), _span("outra " * 200, 1), _span("curta", 2)]
+    budget = count_tokens(spans[0].text) + MIN_TRUNCATED_TOKENS - 1
+    ctx = pack(spans, budget)
+    # o segundo não cabe e a sobra é pequena demais para truncar: pula e o terceiro entra
+    assert [s.text for s in ctx.spans] == [spans[0].text, "curta"]
+    assert ctx.dropped == 1
+    assert ctx.tokens <= budget
+
+def test_pack_truncates_first_span_and_respects_reserved():
+    span = _span("texto longo " * 200)
+    ctx = pack([span], budget=60, reserved=10)
+    assert len(ctx.spans) == 1
+    assert span.text.startswith(ctx.spans[0].text)
+    assert 0 < ctx.tokens <= 50
+
+def test_mmr_prefers_diversity():
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    candidates = np.array([[1.0, 0.1], [1.0, 0.11], [0.7, 0.7]], dtype=np.float32)
+    assert mmr(query, candidates, 1.0) == [0, 1, 2]
+    # com redundância penalizada, o quase-duplicado cai para o fim
+    assert mmr(query, candidates, 0.3) == [0, 2, 1]
+
+def test_mmr_spans_keeps_spans_without_embedding_in_place():
+    spans = [_span("a", 0), _span("b", 1), _span("c", 2), _span("d", 3)]
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    emb = [np.array([1.0, 0.1]), None, np.array([1.0, 0.11]), np.array([0.7, 0.7])]
+    assert [s.text for s in mmr_spans(spans, query, emb, 0.3)] == ["a", "b", "d", "c"]
+    # menos de dois vetores: sem MMR
+    assert mmr_spans(spans, query, [None, None, emb[0], None], 0.5) == spans
+
+def test_span_embeddings_skips_missing_chunks():
+    class Result:
+        def all(self):
+            # chunk 2 foi apagado entre a busca e a montagem
+            return [(1, [1.0, 0.0]), (3, [0.0, 1.0])]
+
+    class Session:
+        async def execute(self, stmt):
+            return Result()
+
+    spans = [_span("a"), _span("b"), _span("c")]
+    spans[0].chunk_ids, spans[1].chunk_ids, spans[2].chunk_ids = [1, 2], [2], [3]
+    emb = asyncio.run(context._span_embeddings(Session(), spans))
+    assert np.allclose(emb[0], [1.0, 0.0])
+    assert emb[1] is None
+    assert np.allclose(emb[2], [0.0, 1.0])
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import httpx
+import numpy as np
+import pytest
+from app.services import embedder as embedder_mod
+from app.services.embedder import EmbeddingBatcher, OpenAIEmbedder
+
+BASE_URL = "http://embeddings.test/v1"
+
+def _vector(text: str) -> list[float]:
+    # vetor determinístico e não normalizado: o tamanho do texto vira a norma
+    return [float(len(text)), 1.0, 0.0]
+
+def _ok(texts: list[str], reverse: bool = False) -> httpx.Response:
+    data = [{"index": i, "embedding": _vector(t)} for i, t in enumerate(texts)]
+    if reverse:
+        data.reverse()
+    return httpx.Response(200, json={"data": data})
+
+def _embedder(handler, **kwargs) -> tuple[OpenAIEmbedder, list[dict]]:
+    requests: list[dict] = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        return handler(body, len(requests))
+
+    emb = OpenAIEmbedder("sk-test", "text-embedding-3-small", base_url=BASE_URL, **kwargs)
+    emb._client = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(record))
+    return emb, requests
+
+async def _embed(emb, texts):
+    try:
+        return await emb.embed(texts)
+    finally:
+        await emb.aclose()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # registra as esperas do backoff sem dormir de verdade
+    calls: list[float] = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        calls.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(embedder_mod.asyncio, "sleep", fake_sleep)
+    return calls
+
+def test_orders_by_index():
+    emb, _ = _embedder(lambda body, n: _ok(body["input"], reverse=True))
+    texts = ["a", "bb", "ccc"]
+    assert asyncio.run(_embed(emb, texts)) == [_vector(t) for t in texts]
+
+def test_sends_dimensions():
+    emb, requests = _embedder(lambda body, n: _ok(body["input"]), dimensions=256)
+    asyncio.run(_embed(emb, ["a"]))
+    assert requests[0]["dimensions"] == 256
+    assert requests[0]["model"] == "text-embedding-3-small"
+
+def test_normalize():
+    emb, _ = _embedder(lambda body, n: _ok(body["input"]), normalize=True)
+    vecs = np.asarray(asyncio.run(_embed(emb, ["abc", "abcdefgh"])))
+    assert np.allclose(np.linalg.norm(vecs, axis=1), 1.0, atol=1e-6)
+
+def test_without_normalize_keeps_raw_vectors():
+    emb, _ = _embedder(lambda body, n: _ok(body["input"]))
+    assert asyncio.run(_embed(emb, ["abc"])) == [_vector("abc")]
+
+def test_retry_after_on_429(sleeps):
+    def handler(body, n):
+        if n == 1:
+            return httpx.Response(429, headers={"Retry-After": "2"}, json={"error": "rate limit"})
+        return _ok(body["input"])
+
+    emb, requests = _embedder(handler, max_retries=3)
+    assert asyncio.run(_embed(emb, ["a"])) == [_vector("a")]
+    assert len(requests) == 2
+    assert sleeps == [2.0]
+
+def test_gives_up_after_max_retries(sleeps):
+    emb, requests = _embedder(lambda body, n: httpx.Response(503), max_retries=2)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(_embed(emb, ["a"]))
+    assert len(requests) == 3
+    assert len(sleeps) == 2
+
+def test_client_error_is_not_retried(sleeps):
+    emb, requests = _embedder(lambda body, n: httpx.Response(400), max_retries=3)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(_embed(emb, ["a"]))
+    assert len(requests) == 1
+    assert sleeps == []
+
+def test_batcher_splits_by_items():
+    emb, requests = _embedder(lambda body, n: _ok(body["input"]))
+    batcher = EmbeddingBatcher(emb, max_items=2, micro_batch_ms=0)
+    texts = [f"texto {i}" for i in range(5)]
+    assert asyncio.run(_embed(batcher, texts)) == [_vector(t) for t in texts]
+    assert sorted(len(r["input"]) for r in requests) == [1, 2, 2]
+
+def test_batcher_splits_by_tokens():
+    batcher = EmbeddingBatcher(OpenAIEmbedder("sk-test", "m"), max_tokens=10, micro_batch_ms=0)
+    texts = ["palavra " * 3] * 4
+    ranges = batcher.batches(texts)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(texts)
+    assert len(ranges) > 1
+    # um texto maior que o limite ainda vai sozinho num lote
+    assert batcher.batches(["palavra " * 50]) == [(0, 1)]
+
+def test_batcher_merges_concurrent_requests():
+    emb, requests = _embedder(lambda body, n: _ok(body["input"]))
+    batcher = EmbeddingBatcher(emb, micro_batch_ms=20)
+
+    async def run():
+        try:
+            return await asyncio.gather(batcher.embed(["a"]), batcher.embed(["bb", "ccc"]))
+        finally:
+            await batcher.aclose()
+
+    first, second = asyncio.run(run())
+    assert first == [_vector("a")]
+    assert second == [_vector("bb"), _vector("ccc")]
+    assert len(requests) == 1
+
+def test_retry_after_is_capped(sleeps):
+    def handler(body, n):
+        if n == 1:
+            return httpx.Response(429, headers={"Retry-After": "86400"})
+        return _ok(body["input"])
+
+    emb, _ = _embedder(handler, max_retries=3, max_retry_after=5)
+    asyncio.run(_embed(emb, ["a"]))
+    assert sleeps == [5]
+
+def test_batcher_uses_precomputed_token_counts(monkeypatch):
+    def fail(text):
+        raise AssertionError("count_tokens não deveria ser chamado")
+
+    monkeypatch.setattr(embedder_mod, "count_tokens", fail)
+    batcher = EmbeddingBatcher(OpenAIEmbedder("sk-test", "m"), max_tokens=10, micro_batch_ms=0)
+    assert batcher.batches(["a", "b", "c", "d"], [4, 4, 4, 4]) == [(0, 2), (2, 4)]
+
+    emb, requests = _embedder(lambda body, n: _ok(body["input"]))
+    batcher = EmbeddingBatcher(emb, max_tokens=10, micro_batch_ms=0)
+    texts = ["a", "b", "c", "d"]
+
+    async def run():
+        try:
+            return await batcher.embed(texts, [6, 6, 6, 6])
+        finally:
+            await batcher.aclose()
+
+    assert asyncio.run(run()) == [_vector(t) for t in texts]
+    assert len(requests) == 4
@@ -0,0 +1,39 @@
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from app.routers.files import _decode_cursor, _encode_cursor, _parse_range
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),     # sufixo maior que o arquivo: o arquivo inteiro
+    ("bytes=900-5000", (900, 999)),  # fim além do arquivo é limitado
+    ("bytes=999-999", (999, 999)),
+])
+def test_parse_range(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header", [None, "", "items=0-1", "bytes=0-1,5-6", "bytes=a-b"])
+def test_parse_range_ignores_unsupported(header):
+    # sem Range válido: resposta 200 com o arquivo inteiro
+    assert _parse_range(header, 1000) is None
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=50-10"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(HTTPException) as e:
+        _parse_range(header, 1000)
+    assert e.value.status_code == 416
+    assert e.value.headers["Content-Range"] == "bytes */1000"
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 9, 8, 14, 30, 15, 123456)
+    cursor = _encode_cursor(created_at, 42)
+    assert "=" not in cursor  # seguro em query string, sem padding
+    assert _decode_cursor(cursor) == (created_at, 42)
+
+@pytest.mark.parametrize("cursor", ["", "nao-e-base64!", "bGl4bw"])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        _decode_cursor(cursor)
+    assert e.value.status_code == 400
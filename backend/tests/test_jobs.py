@@ -0,0 +1,31 @@
+import httpx
+from pypdf.errors import PdfReadError
+from sqlalchemy.exc import DBAPIError, OperationalError
+from app.services.jobs import _is_transient
+
+class _PgError(Exception):
+    def __init__(self, sqlstate: str):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+def _status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://embeddings.test/v1/embeddings")
+    return httpx.HTTPStatusError("erro", request=request, response=httpx.Response(status, request=request))
+
+def test_provider_errors():
+    assert _is_transient(_status_error(429))
+    assert _is_transient(_status_error(503))
+    assert not _is_transient(_status_error(400))
+    assert not _is_transient(_status_error(401))
+    assert _is_transient(httpx.ConnectError("recusada"))
+
+def test_database_errors():
+    assert _is_transient(OperationalError("SELECT 1", {}, Exception("conexão perdida")))
+    assert _is_transient(DBAPIError("UPDATE", {}, _PgError("40P01")))  # deadlock
+    assert _is_transient(DBAPIError("UPDATE", {}, _PgError("40001")))  # serialização
+    assert not _is_transient(DBAPIError("INSERT", {}, _PgError("23505")))  # unique violation
+
+def test_permanent_errors():
+    assert not _is_transient(PdfReadError("EOF marker not found"))
+    assert not _is_transient(ValueError("Arquivo 1 não encontrado."))
+    assert _is_transient(TimeoutError())
@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime
+import pytest
+from app.core.config import settings
+from app.services.search import (
+    HNSW_MAX_EF_SEARCH, SearchFilters, _configure_scan, choose_plan, reciprocal_rank_fusion,
+)
+
+class FakeSession:
+    """Registra os statements; scalar devolve o plano do EXPLAIN com `rows` linhas estimadas."""
+
+    def __init__(self, rows: float = 0):
+        self.rows = rows
+        self.executed: list[tuple[str, dict]] = []
+
+    async def execute(self, stmt, params=None):
+        self.executed.append((str(stmt), params or {}))
+
+    async def scalar(self, stmt, params=None):
+        self.executed.append((str(stmt), params or {}))
+        return [{"Plan": {"Plan Rows": self.rows}}]
+
+    def settings(self) -> dict:
+        out = {}
+        for sql, params in self.executed:
+            if "hnsw.ef_search" in sql:
+                out["ef_search"] = int(params["v"])
+            if "hnsw.iterative_scan" in sql:
+                out["iterative_scan"] = True
+        return out
+
+def _hit(chunk_id):
+    return {"chunk_id": chunk_id, "file_id": 1, "page_number": 1, "chunk_index": chunk_id, "text": "", "score": 0.0}
+
+def test_rrf_sums_reciprocal_ranks():
+    vector = [_hit(1), _hit(2), _hit(3)]
+    text = [_hit(3), _hit(1), _hit(4)]
+    fused = reciprocal_rank_fusion([vector, text], k=10, rrf_k=60)
+    assert [h["chunk_id"] for h in fused] == [1, 3, 2, 4]
+    assert fused[0]["score"] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[-1]["score"] == pytest.approx(1 / 63)
+
+def test_rrf_truncates_to_k_and_keeps_hit_fields():
+    fused = reciprocal_rank_fusion([[_hit(1), _hit(2)], []], k=1, rrf_k=60)
+    assert len(fused) == 1
+    assert fused[0]["chunk_index"] == 1
+
+def test_filters_where_clause():
+    filters = SearchFilters(file_ids=(1, 2), page_from=3, created_from=datetime(2025, 1, 1), index_version=7)
+    where, params = filters.where()
+    assert "c.index_version = :f_index_version" in where
+    assert "c.file_id = ANY(:f_file_ids)" in where
+    assert "f.created_at >= :f_created_from" in where
+    assert params["f_file_ids"] == [1, 2] and params["f_page_from"] == 3
+    literal = filters.where_literal()
+    assert "ARRAY[1,2]::int[]" in literal and "'2025-01-01T00:00:00'::timestamp" in literal
+    assert SearchFilters(index_version=7).is_empty()
+
+def test_choose_plan():
+    # sem filtros e só a versão ativa no índice: HNSW direto, sem EXPLAIN
+    session = FakeSession()
+    assert asyncio.run(choose_plan(session, SearchFilters())) == "hnsw"
+    assert session.executed == []
+    # chunks de outra versão no índice: o filtro de versão pede iterative scan
+    many = settings.exact_scan_max_rows + 1
+    assert asyncio.run(choose_plan(FakeSession(many), SearchFilters(), mixed=True)) == "hnsw_iterative"
+    # filtro seletivo: varredura exata
+    assert asyncio.run(choose_plan(FakeSession(10), SearchFilters(file_ids=(1,)))) == "exact"
+
+def test_configure_scan_raises_ef_search_to_rows():
+    session = FakeSession()
+    asyncio.run(_configure_scan(session, "hnsw", None, rows=100))
+    assert session.settings() == {"ef_search": 100}
+
+    session = FakeSession()
+    asyncio.run(_configure_scan(session, "hnsw", 200, rows=100))
+    assert session.settings() == {"ef_search": 200}
+
+def test_configure_scan_iterative_above_ef_search_cap():
+    session = FakeSession()
+    asyncio.run(_configure_scan(session, "hnsw", None, rows=HNSW_MAX_EF_SEARCH + 500))
+    assert session.settings() == {"ef_search": HNSW_MAX_EF_SEARCH, "iterative_scan": True}
+
+    session = FakeSession()
+    asyncio.run(_configure_scan(session, "exact", None, rows=5000))
+    assert session.executed == []
@@ -0,0 +1,31 @@
+import pytest
+import tiktoken
+from app.services.tokenizer import Tokenizer, TiktokenTokenizer
+
+TEXT = "A informação sobre a ação de revisão não está disponível. Coração, exceção e atenção. " * 20
+
+@pytest.fixture
+def byte_tokenizer() -> TiktokenTokenizer:
+    # um token por byte, sem merges: todo caractere acentuado ocupa dois tokens
+    ranks = {bytes([i]): i for i in range(256)}
+    return TiktokenTokenizer(tiktoken.Encoding("bytes", pat_str=r"\S+|\s+", mergeable_ranks=ranks, special_tokens={}))
+
+@pytest.mark.parametrize("max_tokens", [2, 3, 7, 16, 50])
+def test_tiktoken_split_keeps_characters_whole(byte_tokenizer, max_tokens):
+    pieces = byte_tokenizer.split(TEXT, max_tokens)
+    assert "".join(pieces) == TEXT
+    assert all("�" not in p for p in pieces)
+    assert all(byte_tokenizer.count(p) <= max_tokens for p in pieces)
+
+def test_tiktoken_split_character_larger_than_limit(byte_tokenizer):
+    # emoji: 4 bytes; com limite menor ele vai inteiro num pedaço
+    pieces = byte_tokenizer.split("a😀b", 2)
+    assert "".join(pieces) == "a😀b"
+    assert "😀" in pieces
+
+@pytest.mark.parametrize("max_tokens", [1, 5, 30])
+def test_estimate_split_respects_limit(max_tokens):
+    tok = Tokenizer()
+    pieces = tok.split(TEXT, max_tokens)
+    assert "".join(pieces) == TEXT
+    assert all(tok.count(p) <= max_tokens for p in pieces)
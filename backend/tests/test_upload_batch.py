@@ -0,0 +1,51 @@
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import files
+from app.schemas import JobOut
+
+def _client(monkeypatch) -> tuple[TestClient, dict]:
+    received: dict = {}
+
+    async def fake_accept(session, filename, content_type, hashed):
+        # roda depois que o handler devolveu a resposta: o conteúdo precisa seguir legível
+        received[filename] = (hashed.file.read(), hashed.sha256, hashed.size)
+        job = JobOut(
+            id=len(received), file_id=len(received), status="queued", attempts=0,
+            pages_parsed=0, chunks_embedded=0, rows_written=0, created_at="2026-01-01",
+        )
+        return job, True
+
+    monkeypatch.setattr(files, "_accept_hashed", fake_accept)
+    app = FastAPI()
+    app.include_router(files.router)
+    return TestClient(app), received
+
+def test_batch_reads_uploads_after_response_starts(monkeypatch):
+    client, received = _client(monkeypatch)
+    r = client.post(
+        "/files/upload/batch",
+        files=[
+            ("uploads", ("a.pdf", b"%PDF-a" * 1000, "application/pdf")),
+            ("uploads", ("b.pdf", b"%PDF-b", "application/pdf")),
+        ],
+    )
+    assert r.status_code == 200
+    lines = sorted((json.loads(l) for l in r.text.splitlines()), key=lambda l: l["index"])
+    assert [l["status"] for l in lines] == [202, 202]
+    assert received["a.pdf"][0] == b"%PDF-a" * 1000
+    assert received["a.pdf"][2] == 6000
+    assert received["b.pdf"][0] == b"%PDF-b"
+
+def test_batch_rejects_per_file(monkeypatch):
+    client, received = _client(monkeypatch)
+    r = client.post(
+        "/files/upload/batch",
+        files=[
+            ("uploads", ("a.txt", b"texto", "text/plain")),
+            ("uploads", ("b.pdf", b"%PDF-b", "application/pdf")),
+        ],
+    )
+    lines = sorted((json.loads(l) for l in r.text.splitlines()), key=lambda l: l["index"])
+    assert [l["status"] for l in lines] == [400, 202]
+    assert list(received) == ["b.pdf"]
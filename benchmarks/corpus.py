@@ -0,0 +1,87 @@
+"""Corpus sintético determinístico: vocabulário Zipf, páginas, PDFs e perguntas."""
+import itertools
+import random
+from typing import Iterator, List
+
+SYLLABLES = [
+    "ba", "be", "ca", "co", "da", "de", "fa", "ga", "la", "le", "li", "ma", "me", "mo",
+    "na", "ne", "pa", "pe", "ra", "re", "sa", "se", "ta", "te", "ti", "va", "ve", "za",
+]
+
+class Corpus:
+    def __init__(self, seed: int = 42, vocab_size: int = 20_000):
+        self.rng = random.Random(seed)
+        words = set()
+        while len(words) < vocab_size:
+            words.add("".join(self.rng.choices(SYLLABLES, k=self.rng.randint(2, 4))))
+        self.vocab = sorted(words)
+        self.rng.shuffle(self.vocab)
+        # distribuição de Zipf: poucas palavras muito frequentes, cauda longa
+        self.cum_weights = list(itertools.accumulate(1 / r for r in range(1, vocab_size + 1)))
+
+    def words(self, n: int) -> List[str]:
+        return self.rng.choices(self.vocab, cum_weights=self.cum_weights, k=n)
+
+    def sentence(self) -> str:
+        w = self.words(self.rng.randint(6, 24))
+        return " ".join(w).capitalize() + "."
+
+    def page(self, words: int = 400) -> str:
+        paragraphs, count = [], 0
+        while count < words:
+            sentences = [self.sentence() for _ in range(self.rng.randint(2, 6))]
+            count += sum(len(s.split()) for s in sentences)
+            paragraphs.append(" ".join(sentences))
+        return "\n\n".join(paragraphs)
+
+    def pages(self, n: int, words: int = 400) -> Iterator[str]:
+        for _ in range(n):
+            yield self.page(words)
+
+    def queries(self, n: int) -> List[str]:
+        return [" ".join(self.words(self.rng.randint(3, 8))) for _ in range(n)]
+
+def _pdf_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _wrap(text: str, width: int = 95) -> Iterator[str]:
+    for paragraph in text.split("\n\n"):
+        line: List[str] = []
+        size = 0
+        for w in paragraph.split():
+            if size + len(w) > width and line:
+                yield " ".join(line)
+                line, size = [], 0
+            line.append(w)
+            size += len(w) + 1
+        if line:
+            yield " ".join(line)
+        yield ""
+
+def make_pdf(pages: List[str]) -> bytes:
+    """PDF mínimo (Helvetica, texto ASCII) que o pypdf extrai de volta."""
+    objects: List[bytes] = []
+    n = len(pages)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(n))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {n} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, text in enumerate(pages):
+        lines = "".join(f"({_pdf_escape(line)}) Tj T*\n" for line in _wrap(text))
+        stream = f"BT /F1 8 Tf 10 TL 30 810 Td\n{lines}ET".encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -0,0 +1,151 @@
+"""Ingestão: vazão por etapa, ponta a ponta (ingest_pdf) e carga direta de corpus grande."""
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict
+from sqlalchemy import delete
+from app.db import SessionLocal
+from app.models import File
+from app.services.chunker import chunk_page
+from app.services.embedding_cache import embed_cached
+from app.services.ingestion import ingest_pdf, live_versions, store_pages, store_pdf, write_chunks
+from app.services.pdf import iter_pages
+from app.services.query_cache import bump_generation
+from app.services.uploads import hash_bytes
+from benchmarks.corpus import Corpus, make_pdf
+
+# Arquivos criados pelos benchmarks (removidos por cleanup)
+BENCH_PREFIX = "bench-"
+MIME = "application/pdf"
+
+class Stopwatch:
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name: str):
+        t = perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += perf_counter() - t
+
+def rate(count: float, seconds: float) -> float | None:
+    return round(count / seconds, 2) if seconds > 0 else None
+
+async def _warm_up_pdf_pool() -> None:
+    # o pool de processos (spawn) sobe na primeira extração: fora da medição
+    async for _ in iter_pages(make_pdf(["aquecimento"])):
+        pass
+
+async def bench_stages(corpus: Corpus, docs: int, pages_per_doc: int, words_per_page: int) -> Dict[str, Any]:
+    """Mesmas etapas de process_file, cronometradas uma a uma."""
+    pdfs = [make_pdf(list(corpus.pages(pages_per_doc, words_per_page))) for _ in range(docs)]
+    await _warm_up_pdf_pool()
+    sw = Stopwatch()
+    pages_total = chunks_total = tokens_total = rows_total = 0
+
+    async with SessionLocal() as session:
+        version = (await live_versions(session))[0]
+        for i, pdf in enumerate(pdfs):
+            with sw.stage("store"):
+                f = await store_pdf(session, f"{BENCH_PREFIX}stages-{i}.pdf", MIME, hash_bytes(pdf))
+            with sw.stage("parse"):
+                pages = [p async for p in iter_pages(pdf)]
+            with sw.stage("chunk"):
+                chunks = [
+                    c
+                    for page_no, txt in pages
+                    for c in chunk_page(page_no, txt, version.chunk_max_tokens, version.chunk_overlap_tokens)
+                ]
+            with sw.stage("embed"):
+                embeds = await embed_cached(session, [c.text for c in chunks], model=version.embedding_model)
+            with sw.stage("write"):
+                await store_pages(session, f.id, pages)
+                rows_total += await write_chunks(session, f.id, chunks, embeds, version)
+                await bump_generation(session)
+                await session.commit()
+            pages_total += len(pages)
+            chunks_total += len(chunks)
+            tokens_total += sum(c.token_count for c in chunks)
+
+    units = {"store": docs, "parse": pages_total, "chunk": pages_total, "embed": chunks_total, "write": rows_total}
+    unit_names = {"store": "docs", "parse": "pages", "chunk": "pages", "embed": "chunks", "write": "rows"}
+    total = sum(sw.seconds.values())
+    return {
+        "docs": docs,
+        "pages": pages_total,
+        "chunks": chunks_total,
+        "tokens": tokens_total,
+        "bytes": sum(len(p) for p in pdfs),
+        "stages": {
+            name: {
+                "seconds": round(seconds, 4),
+                "share": round(seconds / total, 4) if total else None,
+                f"{unit_names[name]}_per_s": rate(units[name], seconds),
+            }
+            for name, seconds in sw.seconds.items()
+        },
+        "total_seconds": round(total, 4),
+    }
+
+async def bench_end_to_end(
+    corpus: Corpus, docs: int, pages_per_doc: int, words_per_page: int, concurrency: int = 1,
+) -> Dict[str, Any]:
+    """ingest_pdf completo, com `concurrency` documentos em paralelo (como os workers da fila)."""
+    pdfs = [make_pdf(list(corpus.pages(pages_per_doc, words_per_page))) for _ in range(docs)]
+    await _warm_up_pdf_pool()
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int, pdf: bytes) -> None:
+        async with sem, SessionLocal() as session:
+            await ingest_pdf(session, f"{BENCH_PREFIX}e2e-{i}.pdf", MIME, pdf)
+
+    t = perf_counter()
+    await asyncio.gather(*(one(i, pdf) for i, pdf in enumerate(pdfs)))
+    seconds = perf_counter() - t
+    return {
+        "docs": docs,
+        "pages": docs * pages_per_doc,
+        "concurrency": concurrency,
+        "seconds": round(seconds, 4),
+        "docs_per_s": rate(docs, seconds),
+        "pages_per_s": rate(docs * pages_per_doc, seconds),
+    }
+
+async def load_corpus(
+    corpus: Corpus, target_chunks: int, words_per_page: int = 400, pages_per_file: int = 50,
+) -> Dict[str, Any]:
+    """Popula pages/chunks sem gerar PDFs (escalas de 1k a 1M chunks para os benchmarks de busca)."""
+    total = files = 0
+    t = perf_counter()
+    while total < target_chunks:
+        async with SessionLocal() as session:
+            version = (await live_versions(session))[0]
+            f = File(filename=f"{BENCH_PREFIX}synthetic-{files}.pdf", mime_type=MIME)
+            session.add(f)
+            await session.flush()
+            pages = [(n, txt) for n, txt in enumerate(corpus.pages(pages_per_file, words_per_page), start=1)]
+            chunks = [
+                c
+                for page_no, txt in pages
+                for c in chunk_page(page_no, txt, version.chunk_max_tokens, version.chunk_overlap_tokens)
+            ][:target_chunks - total]
+            embeds = await embed_cached(session, [c.text for c in chunks], model=version.embedding_model)
+            await store_pages(session, f.id, pages)
+            await write_chunks(session, f.id, chunks, embeds, version)
+            await bump_generation(session)
+            await session.commit()
+        total += len(chunks)
+        files += 1
+    seconds = perf_counter() - t
+    return {"chunks": total, "files": files, "seconds": round(seconds, 4), "chunks_per_s": rate(total, seconds)}
+
+async def cleanup() -> int:
+    async with SessionLocal() as session:
+        # chunks, pages e jobs saem junto (ON DELETE CASCADE)
+        result = await session.execute(delete(File).where(File.filename.like(f"{BENCH_PREFIX}%")))
+        await bump_generation(session)
+        await session.commit()
+    return result.rowcount
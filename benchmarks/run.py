@@ -0,0 +1,131 @@
+"""Benchmarks do RAG. Resultados em JSON, para comparar execuções entre commits.
+
+    python -m benchmarks.run load --chunks 100000
+    python -m benchmarks.run ingest --docs 20 --pages 50
+    python -m benchmarks.run search --requests 2000 --concurrency 32
+    python -m benchmarks.run recall --queries 200 --ef-search 40,100,200
+    python -m benchmarks.run all --chunks 10000 --out resultados/$(git rev-parse --short HEAD).json
+    python -m benchmarks.run cleanup
+
+Usa o banco do .env (rode contra uma base dedicada) e o embedder local (sem rede).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+def _configure(args: argparse.Namespace) -> None:
+    # precisa acontecer antes de importar app.* (Settings e caches são criados na importação)
+    os.environ["EMBEDDINGS_PROVIDER"] = "local"
+    if not args.embedding_cache:
+        os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+    if not args.query_cache:
+        os.environ["QUERY_EMBEDDING_CACHE_SIZE"] = "0"
+        os.environ["SEARCH_RESULT_CACHE_SIZE"] = "0"
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _ef_values(raw: str | None) -> list[int | None]:
+    return [int(v) for v in raw.split(",")] if raw else [None]
+
+async def _run(args: argparse.Namespace) -> dict:
+    from app.core.config import settings
+    from app.db import engine
+    from app.services.pdf import shutdown_pdf_executor
+    from benchmarks.corpus import Corpus
+    from benchmarks import ingest, search
+
+    corpus = Corpus(seed=args.seed)
+    results: dict = {}
+    cmd = args.command
+    try:
+        if cmd in ("load", "all"):
+            results["load"] = await ingest.load_corpus(corpus, args.chunks, args.words)
+        if cmd in ("ingest", "all"):
+            results["ingest_stages"] = await ingest.bench_stages(corpus, args.docs, args.pages, args.words)
+            results["ingest_end_to_end"] = await ingest.bench_end_to_end(
+                corpus, args.docs, args.pages, args.words, args.ingest_concurrency,
+            )
+        if cmd in ("search", "all"):
+            queries = corpus.queries(args.queries)
+            results["search"] = [
+                await search.bench_latency(queries, args.requests, args.concurrency, args.k, mode, args.url)
+                for mode in args.modes.split(",")
+            ]
+        if cmd in ("recall", "all"):
+            results["recall"] = await search.bench_recall(
+                corpus.queries(args.queries), args.recall_k, _ef_values(args.ef_search),
+            )
+        if cmd == "cleanup" or (cmd == "all" and args.cleanup):
+            results["cleanup"] = {"files_deleted": await ingest.cleanup()}
+    finally:
+        shutdown_pdf_executor()
+        await engine.dispose()
+
+    return {
+        "command": cmd,
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "embedding_dim": settings.embedding_dim,
+            "embedding_metric": settings.embedding_metric,
+            "vector_index": settings.vector_index,
+            "hnsw_ef_search": settings.hnsw_ef_search,
+            "chunk_max_tokens": settings.chunk_max_tokens,
+            "chunk_overlap_tokens": settings.chunk_overlap_tokens,
+            "bulk_insert": settings.bulk_insert,
+            "pdf_workers": settings.pdf_workers,
+        },
+        "args": vars(args),
+        "results": results,
+    }
+
+def main() -> None:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n")[0])
+    p.add_argument("command", choices=["load", "ingest", "search", "recall", "all", "cleanup"])
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="arquivo JSON de saída (padrão: stdout)")
+    # corpus
+    p.add_argument("--chunks", type=int, default=10_000, help="chunks carregados por 'load' (1k a 1M)")
+    p.add_argument("--docs", type=int, default=10)
+    p.add_argument("--pages", type=int, default=20, help="páginas por PDF")
+    p.add_argument("--words", type=int, default=400, help="palavras por página")
+    p.add_argument("--ingest-concurrency", type=int, default=2)
+    # busca
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--requests", type=int, default=1000)
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--modes", default="vector", help="ex.: vector,text,hybrid")
+    p.add_argument("--url", help="servidor já rodando (padrão: app no próprio processo)")
+    p.add_argument("--recall-k", type=int, default=10)
+    p.add_argument("--ef-search", help="valores de hnsw.ef_search para o recall, ex.: 40,100,200")
+    # caches (desligados por padrão: medem o caminho frio)
+    p.add_argument("--embedding-cache", action="store_true")
+    p.add_argument("--query-cache", action="store_true")
+    p.add_argument("--cleanup", action="store_true", help="com 'all': remove os arquivos bench-* no fim")
+    args = p.parse_args()
+
+    _configure(args)
+    report = json.dumps(asyncio.run(_run(args)), indent=2, ensure_ascii=False)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(report + "\n")
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Busca: latência sob carga concorrente (/search) e recall@k do HNSW contra varredura exata."""
+import asyncio
+from time import perf_counter
+from typing import Any, Dict, List
+import httpx
+import numpy as np
+from sqlalchemy import text
+from app.db import SessionLocal
+from app.core.config import settings
+from app.services import query_cache, vector_index
+from app.services.embedding_cache import embed_cached
+from app.services.search import EXACT_SQL, SearchFilters, semantic_search
+
+def percentiles(values: List[float]) -> Dict[str, float | None]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(np.mean(values)), 3),
+        "max": round(float(np.max(values)), 3),
+    }
+
+def _client(url: str | None) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+    # sem servidor: a aplicação roda no próprio processo (sem os workers do lifespan)
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+async def bench_latency(
+    queries: List[str],
+    requests: int,
+    concurrency: int,
+    k: int = 5,
+    mode: str = "vector",
+    url: str | None = None,
+    warmup: int = 10,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async with _client(url) as client:
+        async def get(i: int) -> httpx.Response:
+            return await client.get("/search", params={"q": queries[i % len(queries)], "k": k, "mode": mode})
+
+        for i in range(warmup):
+            await get(requests + i)
+
+        async def worker() -> None:
+            nonlocal errors
+            for i in counter:
+                t = perf_counter()
+                try:
+                    r = await get(i)
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append((perf_counter() - t) * 1000)
+                else:
+                    errors += 1
+
+        t = perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = perf_counter() - t
+
+    return {
+        "mode": mode,
+        "k": k,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "latency_ms": percentiles(latencies),
+    }
+
+async def _ground_truth(queries: List[str], k: int) -> List[set[int]]:
+    # varredura exata (sem índice) na versão ativa, com a métrica configurada
+    async with SessionLocal() as session:
+        state = await query_cache.corpus_state(session)
+        where, params = SearchFilters(index_version=state.active_version).where()
+        op = vector_index.operator("full", settings.embedding_metric)
+        sql = text(EXACT_SQL.format(where=where, op=op))
+        qvecs = await embed_cached(session, queries, model=state.embedding_model)
+        truth = []
+        for qvec in qvecs:
+            rows = await session.execute(sql, {**params, "qvec": qvec, "k": k})
+            truth.append({r.chunk_id for r in rows})
+    return truth
+
+async def bench_recall(queries: List[str], k: int = 10, ef_values: List[int | None] | None = None) -> List[Dict[str, Any]]:
+    ef_values = ef_values or [None]
+    truth = await _ground_truth(queries, k)
+    results = []
+    for ef in ef_values:
+        recalls: List[float] = []
+        latencies: List[float] = []
+        plans = set()
+        for q, expected in zip(queries, truth):
+            async with SessionLocal() as session:
+                t = perf_counter()
+                res = await semantic_search(session, q, k=k, ef_search=ef)
+                latencies.append((perf_counter() - t) * 1000)
+            plans.add(res.plan)
+            got = {h["chunk_id"] for h in res.hits}
+            recalls.append(len(got & expected) / len(expected) if expected else 1.0)
+        results.append({
+            "ef_search": ef or settings.hnsw_ef_search,
+            "k": k,
+            "queries": len(queries),
+            "recall_at_k": round(float(np.mean(recalls)), 4),
+            "recall_min": round(float(np.min(recalls)), 4),
+            "plans": sorted(p for p in plans if p),
+            "latency_ms": percentiles(latencies),
+        })
+    return results
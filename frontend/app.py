@@ -1,9 +1,12 @@
 # app_streamlit.py
 # Streamlit UI para RAG com backend FastAPI
-# Lê configurações da OpenAI a partir do .env automaticamente
+# A geração de respostas (OpenAI) roda no backend, via /answer (SSE)
 
 import os
 import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pandas as pd
@@ -19,62 +22,99 @@ except Exception:
 st.set_page_config(page_title="RAG • Documentos", page_icon="📄", layout="wide")
 
 BACKEND_DEFAULT = os.getenv("BACKEND_URL", "http://localhost:8000")
-OPENAI_API_KEY_ENV = os.getenv("OPENAI_API_KEY")
-OPENAI_MODEL_ENV = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# arquivos por requisição de /files/upload/batch e requisições simultâneas
+UPLOAD_BATCH_FILES = int(os.getenv("UPLOAD_BATCH_FILES", "10"))
+UPLOAD_PARALLEL = int(os.getenv("UPLOAD_PARALLEL", "4"))
 
 if "backend_url" not in st.session_state:
     st.session_state.backend_url = BACKEND_DEFAULT
 if "chat" not in st.session_state:
     st.session_state.chat = []
-if "offset" not in st.session_state:
-    st.session_state.offset = 0
+if "cursors" not in st.session_state:
+    # pilha de cursores: [None] é a primeira página; o topo é a página atual
+    st.session_state.cursors = [None]
 
 def api_url(path: str) -> str:
     return st.session_state.backend_url.rstrip("/") + path
 
-def upload_pdf(file) -> dict:
-    files = {"upload": (file.name, file.getvalue(), "application/pdf")}
-    r = requests.post(api_url("/files/upload"), files=files, timeout=120)
+@st.cache_resource
+def http() -> requests.Session:
+    # conexões keep-alive reaproveitadas entre reruns e threads de upload
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(16, UPLOAD_PARALLEL * 2))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def upload_batch(files, offset: int, out: queue.Queue) -> None:
+    """Envia um lote para /files/upload/batch e repassa cada linha NDJSON (índice global) para `out`.
+
+    Sempre termina com None na fila, mesmo se o stream acabar antes de responder por todos os arquivos.
+    """
+    reported = set()
+    error = "resposta incompleta do servidor"
+    try:
+        parts = [("uploads", (f.name, f.getvalue(), "application/pdf")) for f in files]
+        with http().post(api_url("/files/upload/batch"), files=parts, stream=True, timeout=(10, 600)) as r:
+            r.raise_for_status()
+            for line in r.iter_lines(decode_unicode=True):
+                if line:
+                    item = json.loads(line)
+                    reported.add(item["index"])
+                    out.put({**item, "index": offset + item["index"]})
+    except Exception as e:
+        if isinstance(e, requests.HTTPError):
+            try:
+                e = e.response.json().get("detail", e)
+            except Exception:
+                pass
+        error = str(e)
+    finally:
+        # só os arquivos que ainda não tiveram resposta
+        for i, f in enumerate(files):
+            if i not in reported:
+                out.put({"index": offset + i, "filename": f.name, "status": 0, "error": error})
+        out.put(None)
+
+def get_job(job_id: int) -> dict:
+    r = http().get(api_url(f"/jobs/{job_id}"), timeout=30)
     r.raise_for_status()
     return r.json()
 
-def list_files(limit=20, offset=0) -> dict:
-    r = requests.get(api_url("/files"), params={"limit": limit, "offset": offset}, timeout=30)
+def list_files(limit=20, cursor=None) -> dict:
+    params = {"limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    r = http().get(api_url("/files"), params=params, timeout=30)
     r.raise_for_status()
     return r.json()
 
 def search(q: str, k: int = 5) -> dict:
-    r = requests.get(api_url("/search"), params={"q": q, "k": k}, timeout=60)
+    r = http().get(api_url("/search"), params={"q": q, "k": k}, timeout=60)
     r.raise_for_status()
     return r.json()
 
-def get_openai_client():
-    api_key = OPENAI_API_KEY_ENV
-    if not api_key:
-        return None
-
-    try:
-        from openai import OpenAI
-    except ImportError:
-        raise ImportError("A biblioteca 'openai' não está instalada. Instale com: pip install openai>=1.0.0")
-
-    return OpenAI(api_key=api_key)
+def answer_events(q: str, k: int = 5):
+    """Consome o SSE de /answer, produzindo (evento, dados) à medida que chegam."""
+    with http().post(api_url("/answer"), json={"question": q, "k": k}, stream=True, timeout=(10, 300)) as r:
+        r.raise_for_status()
+        event = "message"
+        for line in r.iter_lines(decode_unicode=True):
+            if not line:
+                event = "message"
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):])
 
 st.sidebar.header("Configuração")
 st.sidebar.text_input("Backend URL", key="backend_url", help="Ex.: http://localhost:8000")
 
 st.sidebar.divider()
-key_detected = bool(OPENAI_API_KEY_ENV)
-st.sidebar.write(
-    f"**OpenAI (.env):** {'✅ detectado' if key_detected else '❌ não encontrado'}"
-)
-use_openai = st.sidebar.toggle(
-    "Gerar resposta com OpenAI (cliente)", value=key_detected,
-    help="Se ativado, o resumo em linguagem natural será gerado no cliente usando as variáveis OPENAI_* do .env."
-)
-openai_model = st.sidebar.text_input(
-    "Modelo (OPENAI_MODEL)", value=OPENAI_MODEL_ENV,
-    help="Padrão vindo do .env. Ex.: gpt-4o-mini"
+use_llm = st.sidebar.toggle(
+    "Gerar resposta (backend)", value=True,
+    help="Se ativado, a resposta é gerada no backend (/answer) e exibida à medida que é produzida. "
+         "Modelo e chave vêm do .env do backend (OPENAI_MODEL, OPENAI_API_KEY)."
 )
 
 tab_up, tab_list, tab_chat = st.tabs([
@@ -83,33 +123,60 @@ tab_up, tab_list, tab_chat = st.tabs([
 
 with tab_up:
     st.subheader("Anexar Documento (PDF)")
-    st.caption("Envie PDFs; o backend armazena o arquivo bruto e gera chunks + embeddings.")
+    st.caption("Envie PDFs; o backend armazena o arquivo bruto e enfileira a geração de chunks + embeddings.")
 
     files_upl = st.file_uploader(
         "Selecione PDFs",
         type=["pdf"],
         accept_multiple_files=True,
-        help="Envia para /files/upload (campo 'upload').",
+        help="Envia em lotes para /files/upload/batch (campo 'uploads').",
     )
 
     if st.button("Enviar", type="primary", disabled=not files_upl):
-        results = []
-        for f in files_upl or []:
-            try:
-                with st.spinner(f"Enviando {f.name}…"):
-                    res = upload_pdf(f)
-                st.success(f"{f.name}: OK ({res.get('id')})")
-                results.append({"arquivo": f.name, **res})
-            except requests.HTTPError as e:
-                try:
-                    detail = e.response.json().get("detail")
-                except Exception:
-                    detail = str(e)
-                st.error(f"{f.name}: {detail}")
-            except Exception as e:
-                st.error(f"{f.name}: {e}")
-        if results:
-            st.dataframe(pd.DataFrame(results), use_container_width=True)
+        files = list(files_upl or [])
+        rows = [{"arquivo": f.name, "status": "enviando", "job": None, "páginas": 0, "chunks": 0, "erro": None}
+                for f in files]
+        table = st.empty()
+        bar = st.progress(0.0, text="Enviando…")
+
+        # lotes enviados em paralelo; cada linha da resposta chega pela fila assim que o arquivo é aceito
+        lines: queue.Queue = queue.Queue()
+        batches = [files[i:i + UPLOAD_BATCH_FILES] for i in range(0, len(files), UPLOAD_BATCH_FILES)]
+        with ThreadPoolExecutor(max_workers=UPLOAD_PARALLEL) as pool:
+            for n, batch in enumerate(batches):
+                pool.submit(upload_batch, batch, n * UPLOAD_BATCH_FILES, lines)
+            received, running = 0, len(batches)
+            while running:
+                item = lines.get()
+                if item is None:
+                    # fim de um lote
+                    running -= 1
+                    continue
+                received += 1
+                row = rows[item["index"]]
+                if "job" in item:
+                    row.update(status=item["job"]["status"], job=item["job"]["id"])
+                else:
+                    row.update(status="recusado", erro=item.get("error"))
+                table.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+                bar.progress(received / len(files), text=f"Enviados {received}/{len(files)}")
+
+        # progresso da ingestão: consulta os jobs pendentes em paralelo até todos terminarem
+        pending = [row for row in rows if row["job"] and row["status"] not in ("done", "failed")]
+        try:
+            with ThreadPoolExecutor(max_workers=UPLOAD_PARALLEL) as pool:
+                while pending:
+                    time.sleep(1)
+                    for row, job in zip(pending, pool.map(lambda r: get_job(r["job"]), pending)):
+                        row.update(status=job["status"], páginas=job["pages_parsed"],
+                                   chunks=job["chunks_embedded"], erro=job.get("error"))
+                    pending = [row for row in pending if row["status"] not in ("done", "failed")]
+                    finished = sum(row["status"] in ("done", "failed", "recusado") for row in rows)
+                    table.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+                    bar.progress(finished / len(files), text=f"Indexados {finished}/{len(files)}")
+            bar.progress(1.0, text="Concluído")
+        except Exception as e:
+            st.error(f"Falha ao acompanhar os jobs: {e}")
 
 with tab_list:
     st.subheader("Arquivos cadastrados")
@@ -119,10 +186,10 @@ with tab_list:
         page_size = st.selectbox("Por página", [10, 20, 50], index=1)
     with col_b:
         if st.button("🔄 Atualizar"):
-            st.session_state.offset = 0
+            st.session_state.cursors = [None]
 
     try:
-        data = list_files(limit=page_size, offset=st.session_state.offset)
+        data = list_files(limit=page_size, cursor=st.session_state.cursors[-1])
         items = data.get("items", [])
         total = int(data.get("total", 0))
 
@@ -143,90 +210,75 @@ with tab_list:
             st.info("Nenhum arquivo encontrado.")
 
         col_p1, col_p2, col_p3 = st.columns([1, 1, 5])
+        page_no = len(st.session_state.cursors)
         with col_p1:
-            prev_disabled = st.session_state.offset <= 0
-            if st.button("⬅️ Anterior", disabled=prev_disabled):
-                st.session_state.offset = max(0, st.session_state.offset - page_size)
-                st.experimental_rerun()
+            if st.button("⬅️ Anterior", disabled=page_no <= 1):
+                st.session_state.cursors.pop()
+                st.rerun()
         with col_p2:
-            next_disabled = st.session_state.offset + page_size >= total
-            if st.button("Próxima ➡️", disabled=next_disabled):
-                st.session_state.offset = st.session_state.offset + page_size
-                st.experimental_rerun()
+            next_cursor = data.get("next_cursor")
+            if st.button("Próxima ➡️", disabled=not next_cursor):
+                st.session_state.cursors.append(next_cursor)
+                st.rerun()
         with col_p3:
-            st.caption(f"Total: {total} • Exibindo {len(items)} (offset {st.session_state.offset})")
+            st.caption(f"Total: {total} • Exibindo {len(items)} (página {page_no})")
 
     except Exception as e:
         st.error(f"Falha ao listar: {e}")
 
 with tab_chat:
     st.subheader("Consultar Documentos")
-    st.caption("Consulta semântica via /search. Se ativado na barra lateral, gera um resumo com OpenAI usando OPENAI_* do .env.")
+    st.caption("Consulta semântica via /search. Se ativado na barra lateral, a resposta é gerada no backend via /answer.")
 
     top_k = st.slider("Resultados (top-k)", 1, 20, 5)
 
+    def show_hits(hits: list) -> None:
+        with st.expander("Trechos recuperados"):
+            for h in hits:
+                st.code(json.dumps(h, ensure_ascii=False, indent=2), language="json")
+
     for msg in st.session_state.chat:
         with st.chat_message("user" if msg["role"] == "user" else "assistant"):
             st.markdown(msg["content"])
             if msg["role"] == "assistant" and msg.get("hits"):
-                with st.expander("Trechos recuperados"):
-                    for h in msg["hits"]:
-                        st.code(json.dumps(h, ensure_ascii=False, indent=2), language="json")
+                show_hits(msg["hits"])
 
     question = st.chat_input("Digite sua pergunta…")
     if question:
         st.session_state.chat.append({"role": "user", "content": question})
-
-        try:
-            with st.spinner("Buscando…"):
-                res = search(question, k=top_k)
-                hits = res.get("hits", [])
-        except Exception as e:
-            hits = []
-            answer = f"Erro na busca: {e}"
-            st.session_state.chat.append({"role": "assistant", "content": answer, "hits": []})
-            st.rerun()
-
-        def to_line(h: dict) -> str:
-            content = h.get("content") or h.get("text") or h.get("chunk") or ""
-            file_id = h.get("file_id") or h.get("fileId") or ""
-            page = h.get("page") or h.get("page_number") or ""
-            score = h.get("score") or h.get("dist") or h.get("distance") or ""
-            return f"[file:{file_id} pág:{page} score:{score}] {content}"
-
-        context_lines = [to_line(h) for h in hits[:top_k]]
-        answer = (
-            "Encontrei os trechos abaixo relacionados à sua pergunta. "
-            "Ative a opção de OpenAI para gerar um resumo em linguagem natural."
-        )
-
-        if use_openai and OPENAI_API_KEY_ENV:
-            try:
-                client = get_openai_client()
-                if client is None:
-                    raise RuntimeError("OPENAI_API_KEY não encontrado no .env")
-                context = "\n\n".join(context_lines)
-                prompt = (
-                    "Você é um assistente que responde apenas com base no CONTEXTO fornecido.\n"
-                    "Responda em português, de forma direta e cite os tópicos-chave.\n"
-                    "Se a resposta não estiver no contexto, diga que não sabe.\n\n"
-                    f"PERGUNTA:\n{question}\n\nCONTEXTO:\n{context}\n\nRESPOSTA:"
-                )
-                print(f"Prompt enviado para OpenAI:\n{prompt}\n")
-                with st.spinner("Gerando resposta…"):
-                    resp = client.responses.create(model=openai_model, input=prompt)
-                    answer = (resp.output_text or "").strip() or answer
-                    print(f"Resposta recebida:\n{answer}\n")
-            except Exception as e:
-                print(f"Erro ao chamar OpenAI: {e}")
-                answer = f"Falha ao gerar resposta com OpenAI: {e}"
+        hits: list = []
 
         with st.chat_message("assistant"):
-            st.markdown(answer)
-            if context_lines:
-                with st.expander("Trechos recuperados"):
-                    for h in hits:
-                        st.code(json.dumps(h, ensure_ascii=False, indent=2), language="json")
+            if use_llm:
+                hits_box = st.empty()
+
+                def tokens():
+                    # os trechos chegam primeiro; os tokens vão sendo exibidos conforme chegam
+                    for event, data in answer_events(question, k=top_k):
+                        if event == "hits":
+                            hits.extend(data.get("hits", []))
+                            with hits_box.container():
+                                show_hits(hits)
+                        elif event == "token":
+                            yield data.get("text", "")
+                        elif event == "error":
+                            raise RuntimeError(data.get("detail"))
+
+                try:
+                    answer = st.write_stream(tokens()) or ""
+                except Exception as e:
+                    answer = f"Falha ao gerar resposta: {e}"
+                    st.markdown(answer)
+            else:
+                try:
+                    with st.spinner("Buscando…"):
+                        hits = search(question, k=top_k).get("hits", [])
+                    answer = "Encontrei os trechos abaixo relacionados à sua pergunta."
+                except Exception as e:
+                    answer = f"Erro na busca: {e}"
+                st.markdown(answer)
+                if hits:
+                    show_hits(hits)
 
         st.session_state.chat.append({"role": "assistant", "content": answer, "hits": hits})
         st.rerun()